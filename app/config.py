@@ -1,4 +1,5 @@
 # File type preferences and caps
+import os
 
 ALLOWED_EXTS = {
     ".py", ".ts", ".tsx", ".js", ".jsx", ".go", ".rs", ".java", ".kt",
@@ -17,3 +18,114 @@ MAX_FILES = 50                 # max files per run
 PREVIEW_LINES = 80             # first N lines per file
 DEFAULT_REF = "HEAD"
 
+# GitHub fetch engine
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "8"))   # parallel file downloads
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "30"))        # seconds per GitHub request
+
+# GitHub rate limits: tokens are rotated by remaining budget; requests wait instead of failing
+GITHUB_TOKENS = [t.strip() for t in os.getenv("GITHUB_TOKENS", os.getenv("GITHUB_TOKEN", "")).split(",") if t.strip()]
+GITHUB_RATE_LIMIT_MAX_WAIT = float(os.getenv("GITHUB_RATE_LIMIT_MAX_WAIT", "300"))  # seconds queued before a 429
+GITHUB_RATE_LIMIT_RETRIES = int(os.getenv("GITHUB_RATE_LIMIT_RETRIES", "3"))        # retries after a rate-limited reply
+GITHUB_THROTTLE_BELOW = float(os.getenv("GITHUB_THROTTLE_BELOW", "0.1"))            # pace a token under this share left
+GITHUB_THROTTLE_MAX_DELAY = float(os.getenv("GITHUB_THROTTLE_MAX_DELAY", "1.0"))    # longest pacing pause per request
+
+# Ingestion mode: "auto" picks the repo tarball (one streamed request) for repos
+# with many eligible files that are small enough to stream; otherwise per-file Contents API.
+INGEST_MODE = os.getenv("INGEST_MODE", "auto")                              # auto | tarball | contents
+TARBALL_MIN_FILES = int(os.getenv("TARBALL_MIN_FILES", "15"))               # eligible files to prefer tarball
+TARBALL_MAX_REPO_BYTES = int(os.getenv("TARBALL_MAX_REPO_BYTES", "50000000"))  # ~50 MB of blobs in the tree
+# Contents mode with a known token budget: stream raw previews (Range requests) and fetch the rest
+# only for files the packer will send whole
+PREVIEW_FETCH = os.getenv("PREVIEW_FETCH", "1").lower() in ("1", "true", "yes")
+
+# Local ingestion for file:// URLs (working trees, bare or working git repos); off unless roots are set
+LOCAL_REPO_ROOTS = [p.strip() for p in os.getenv("LOCAL_REPO_ROOTS", "").split(",") if p.strip()]
+LOCAL_CLONE_DIR = os.getenv("LOCAL_CLONE_DIR", ".cache/clones")           # shallow checkouts by commit
+LOCAL_CLONE_MAX = int(os.getenv("LOCAL_CLONE_MAX", "32"))                 # checkouts kept before evicting
+LOCAL_GIT_TIMEOUT = float(os.getenv("LOCAL_GIT_TIMEOUT", "120"))          # seconds per git command
+
+# Static pre-analysis of fetched files (parse, complexity, risky APIs, entry points) ranks them by risk
+STATIC_ANALYSIS = os.getenv("STATIC_ANALYSIS", "1").lower() in ("1", "true", "yes")
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", str(min(4, os.cpu_count() or 1))))  # processes; 0 = a thread
+ANALYSIS_MIN_BYTES = int(os.getenv("ANALYSIS_MIN_BYTES", "200000"))       # smaller repos skip the process pool
+
+# Prompt compaction before packing: identical blobs are folded and lockfiles/minified/generated files skipped
+PROMPT_COMPACTION = os.getenv("PROMPT_COMPACTION", "1").lower() in ("1", "true", "yes")
+COMPACT_STRIP = os.getenv("COMPACT_STRIP", "1").lower() in ("1", "true", "yes")   # license banners, trailing spaces
+
+# Blob cache keyed by git blob SHA (set BLOB_CACHE_DIR="" to keep it in memory only)
+BLOB_CACHE_DIR = os.getenv("BLOB_CACHE_DIR", ".cache/blobs")
+BLOB_CACHE_MEMORY_BYTES = int(os.getenv("BLOB_CACHE_MEMORY_BYTES", "64000000"))   # ~64 MB in-process LRU
+BLOB_CACHE_DISK_BYTES = int(os.getenv("BLOB_CACHE_DISK_BYTES", "1000000000"))     # ~1 GB on disk
+
+# Conditional GitHub requests and full review-result cache
+ETAG_CACHE_ENTRIES = int(os.getenv("ETAG_CACHE_ENTRIES", "256"))          # remembered meta/commit/tree responses
+REVIEW_CACHE_TTL = int(os.getenv("REVIEW_CACHE_TTL", "86400"))            # seconds; 0 disables the cache
+REVIEW_CACHE_MAX_ENTRIES = int(os.getenv("REVIEW_CACHE_MAX_ENTRIES", "512"))
+
+# Per-file findings by blob SHA, reused for unchanged files in diff/PR reviews
+FINDINGS_STORE = os.getenv("FINDINGS_STORE", "memory")                    # "memory" or "sqlite"
+FINDINGS_MAX_ENTRIES = int(os.getenv("FINDINGS_MAX_ENTRIES", "20000"))    # in-memory (sha, context) entries
+FINDINGS_DB_PATH = os.getenv("FINDINGS_DB_PATH", "findings.sqlite3")
+
+# Instrumentation: Prometheus text at GET /metrics; per-stage Server-Timing response headers if enabled
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0").lower() in ("1", "true", "yes")
+
+# Startup and logging: FAST_STARTUP serves at once and warms clients in the background (GET /ready is 503
+# until then); otherwise startup waits for the warm-up
+FAST_STARTUP = os.getenv("FAST_STARTUP", "0").lower() in ("1", "true", "yes")
+WARMUP_CONNECT = os.getenv("WARMUP_CONNECT", "0").lower() in ("1", "true", "yes")   # also open GitHub/Mistral connections
+LOG_FILE = os.getenv("LOG_FILE", "app.log")                                          # "" logs to stderr only
+
+# Mistral client
+MISTRAL_MODEL = os.getenv("MISTRAL_MODEL", "mistral-large-latest")
+MISTRAL_SERVER_URL = os.getenv("MISTRAL_SERVER_URL") or None   # e.g. a gateway or the benchmark stand-in
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "32"))        # in-flight completions per worker
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))             # seconds per completion attempt
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))         # retries on 429/5xx/timeouts
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))   # seconds; full jitter, doubled per attempt
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "20"))
+
+# Cascade review (mode=cascade): a small model triages every file, the large model reviews the flagged ones
+CASCADE_TRIAGE_MODEL = os.getenv("CASCADE_TRIAGE_MODEL", "mistral-small-latest")
+CASCADE_REVIEW_MODEL = os.getenv("CASCADE_REVIEW_MODEL", MISTRAL_MODEL)
+CASCADE_FLAG_THRESHOLD = float(os.getenv("CASCADE_FLAG_THRESHOLD", "0.5"))      # triage risk (0-1) that flags a file
+CASCADE_MIN_FLAGGED = int(os.getenv("CASCADE_MIN_FLAGGED", "3"))                # riskiest files reviewed if none flagged
+CASCADE_MAX_FLAGGED_SHARE = float(os.getenv("CASCADE_MAX_FLAGGED_SHARE", "0.6"))  # above this, review everything
+CASCADE_FALLBACK = os.getenv("CASCADE_FALLBACK", "single")                      # single | error, when triage fails
+
+# Review jobs (POST /reviews)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))                 # concurrent jobs per process
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "100"))         # queued jobs before 503
+JOB_DEADLINE = int(os.getenv("JOB_DEADLINE", "600"))             # default seconds from submit to finish
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "1000"))              # finished jobs kept by the memory store
+JOB_STORE = os.getenv("JOB_STORE", "memory")                     # memory | sqlite
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "jobs.sqlite3")
+
+# Batch reviews (POST /review/batch)
+BATCH_MAX_REPOS = int(os.getenv("BATCH_MAX_REPOS", "100"))
+BATCH_FETCH_CONCURRENCY = int(os.getenv("BATCH_FETCH_CONCURRENCY", "2"))   # repos ingesting at once per batch
+
+# Context packing: the repo content is fitted to a token budget for the review model
+MODEL_CONTEXT_TOKENS = {
+    "mistral-large-latest": 128_000,
+    "mistral-medium-latest": 128_000,
+    "mistral-small-latest": 32_000,
+    "codestral-latest": 256_000,
+    "open-mistral-nemo": 128_000,
+}
+DEFAULT_CONTEXT_TOKENS = 32_000                                       # unknown models
+CONTEXT_BUDGET_TOKENS = int(os.getenv("CONTEXT_BUDGET_TOKENS", "32000"))  # repo content per review
+PROMPT_RESERVE_TOKENS = int(os.getenv("PROMPT_RESERVE_TOKENS", "6000"))   # instructions + model answer
+CHARS_PER_TOKEN = float(os.getenv("CHARS_PER_TOKEN", "3.5"))              # estimate for source code
+PREVIEW_MAX_CHARS = 12_000     # cap on a trimmed preview, for minified/long-line files
+
+# Map-reduce review for repos larger than one context budget
+# auto | single | map_reduce | cascade. Preview fetching only applies to single-pack reviews (auto and
+# map_reduce fetch whole files up to MAP_REDUCE_MAX_FILES), so it makes single the default
+REVIEW_MODE = os.getenv("REVIEW_MODE", "single" if PREVIEW_FETCH else "auto")
+MAP_REDUCE_MAX_SHARDS = int(os.getenv("MAP_REDUCE_MAX_SHARDS", "8"))        # per-request ceiling
+MAP_REDUCE_MAX_TOKENS = int(os.getenv("MAP_REDUCE_MAX_TOKENS", "200000"))   # repo tokens across all shards
+MAP_REDUCE_MAX_FILES = int(os.getenv("MAP_REDUCE_MAX_FILES", "400"))        # ingestion cap in map-reduce mode
+MAP_REDUCE_CONCURRENCY = int(os.getenv("MAP_REDUCE_CONCURRENCY", "4"))      # shards in flight per request
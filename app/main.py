@@ -1,16 +1,56 @@
-import logging
-from fastapi import FastAPI
+import time, queue, atexit, asyncio, logging, logging.handlers
+_import_started = time.perf_counter()
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from dotenv import load_dotenv
 
 load_dotenv()
-from app.routes import router  # noqa
+from app.routes import router, run_review  # noqa
+from app.services import github_service, ai_service, analysis, warmup  # noqa
+from app.services.jobs import job_manager  # noqa
+from app.services import metrics  # noqa
+from app.config import SERVER_TIMING, FAST_STARTUP, LOG_FILE  # noqa
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[logging.FileHandler("app.log"), logging.StreamHandler()],
-)
+# Handlers run on the listener's thread, so log calls on the event loop never wait for disk I/O.
+_log_handlers = [logging.StreamHandler()] + ([logging.FileHandler(LOG_FILE)] if LOG_FILE else [])
+for _h in _log_handlers:
+    _h.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+_log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_log_listener = logging.handlers.QueueListener(_log_queue, *_log_handlers, respect_handler_level=True)
+logging.basicConfig(level=logging.INFO, format="%(message)s", handlers=[logging.handlers.QueueHandler(_log_queue)])
+_log_listener.start()
+atexit.register(_log_listener.stop)   # flushes queued records on exit
 
-app = FastAPI(title="CodeReviewer", version="1.0.0")
+warmup.record_import(time.perf_counter() - _import_started)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await ai_service.startup()
+    await job_manager.start(run_review)
+    warming = asyncio.create_task(warmup.run())
+    if not FAST_STARTUP:
+        await warming
+    yield
+    warmup.mark_stopping()
+    warming.cancel()
+    await job_manager.stop()
+    await github_service.aclose()
+    await ai_service.aclose()
+    analysis.shutdown()
+
+app = FastAPI(title="CodeReviewer", version="1.0.0", lifespan=lifespan)
 app.include_router(router)
 
+@app.middleware("http")
+async def record_timings(request: Request, call_next):
+    timings = metrics.start_request()
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    elapsed = time.perf_counter() - start
+    metrics.HTTP_SECONDS.observe(elapsed, method=request.method,
+                                 route=getattr(route, "path", "unmatched"), status=response.status_code)
+    warmup.record_request(request.url.path, elapsed)
+    if SERVER_TIMING and timings:
+        response.headers["Server-Timing"] = metrics.server_timing(timings)
+    return response
@@ -1,10 +1,19 @@
-from typing import List, Optional, Literal
+from typing import Dict, List, Optional, Literal
 from pydantic import BaseModel, Field
 
 class ReviewRequest(BaseModel):
     assignment_description: str = Field(..., description="Assignment description")
-    github_repo_url: str = Field(..., description="GitHub repo URL")
+    github_repo_url: str = Field(..., description="GitHub repo URL, or file:// path under LOCAL_REPO_ROOTS")
     candidate_level: Literal["Junior", "Mid", "Senior"] = Field(..., description="Candidate level")
+    mode: Optional[Literal["auto", "single", "map_reduce", "cascade"]] = Field(None, description="Review mode (default from REVIEW_MODE)")
+    max_shards: Optional[int] = Field(None, ge=1, description="Map-reduce: max shards reviewed")
+    max_tokens: Optional[int] = Field(None, ge=1, description="Map-reduce: max repo tokens across shards")
+    base_ref: Optional[str] = Field(None, description="Review only the changes since this ref (diff review)")
+
+class BatchReviewRequest(BaseModel):
+    assignment_description: str = Field(..., description="Assignment description")
+    candidate_level: Literal["Junior", "Mid", "Senior"] = Field(..., description="Candidate level")
+    github_repo_urls: List[str] = Field(..., min_length=1, description="GitHub repo URLs")
 
 class Finding(BaseModel):
     file: Optional[str] = None
@@ -13,6 +22,44 @@ class Finding(BaseModel):
     issue: str
     suggestion: str
 
+class PackReport(BaseModel):
+    budget_tokens: int
+    used_tokens: int
+    included: List[str] = []
+    trimmed: List[str] = []
+    dropped: List[str] = []
+
+class CompactionReport(BaseModel):
+    duplicates: Dict[str, List[str]] = {}   # kept path -> identical files folded into it
+    skipped: Dict[str, str] = {}            # path -> lockfile | minified | generated
+    stripped_files: int = 0
+    tokens_before: int = 0
+    tokens_after: int = 0
+    tokens_saved: int = 0
+
+class DiffReport(BaseModel):
+    base_sha: str
+    head_sha: str
+    changed_files: List[str] = []
+    reused_files: List[str] = []
+    reused_findings: int = 0
+
+class ModelUsage(BaseModel):
+    tier: Literal["triage", "review"]
+    model: str
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency_ms: float = 0.0
+
+class CascadeReport(BaseModel):
+    triage_model: str
+    review_model: str
+    triaged_files: int = 0
+    flagged: List[str] = []
+    threshold: float
+    fallback: Optional[str] = None   # why the cascade reviewed everything with one model instead
+
 class ReviewResponse(BaseModel):
     files_found: List[str]
     rating_out_of_5: int
@@ -22,5 +69,39 @@ class ReviewResponse(BaseModel):
     truncated: bool = False
     included_files: int = 0
     total_bytes: int = 0
+    packing: Optional[PackReport] = None
+    compaction: Optional[CompactionReport] = None
+    shards: int = 1
+    diff: Optional[DiffReport] = None
+    cascade: Optional[CascadeReport] = None
+    models: List[ModelUsage] = []
     raw_text: Optional[str] = None
 
+
+class BatchReviewItem(BaseModel):
+    index: int
+    github_repo_url: str
+    status: Literal["ok", "error"]
+    result: Optional[ReviewResponse] = None
+    status_code: Optional[int] = None
+    error: Optional[str] = None
+
+class ReviewJobRequest(ReviewRequest):
+    deadline_seconds: Optional[int] = Field(None, gt=0, description="Fail the job if not finished in time")
+
+class JobStage(BaseModel):
+    name: str
+    status: Literal["pending", "running", "done", "failed", "skipped"] = "pending"
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+class ReviewJob(BaseModel):
+    id: str
+    status: Literal["queued", "running", "succeeded", "failed", "cancelled"] = "queued"
+    stages: List[JobStage]
+    created_at: float
+    updated_at: float
+    deadline_at: float
+    error: Optional[str] = None
+    request: ReviewRequest
+    result: Optional[ReviewResponse] = None
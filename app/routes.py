@@ -1,9 +1,36 @@
-import json, re, logging
-from typing import Any, Tuple
+import json, re, logging, asyncio
+from contextlib import nullcontext
+from typing import Any, Callable, List, Optional, Tuple
 from fastapi import APIRouter, HTTPException
-from app.models import ReviewRequest, ReviewResponse, Finding
-from app.services.github_service import fetch_repo_and_generate_message
-from app.services.ai_service import generate_review
+from pydantic import ValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from app.config import (
+    BATCH_MAX_REPOS, BATCH_FETCH_CONCURRENCY, CHARS_PER_TOKEN, REVIEW_MODE,
+    MAP_REDUCE_MAX_SHARDS, MAP_REDUCE_MAX_TOKENS, MAP_REDUCE_MAX_FILES, MAP_REDUCE_CONCURRENCY,
+    CASCADE_TRIAGE_MODEL, CASCADE_REVIEW_MODEL, CASCADE_FLAG_THRESHOLD, CASCADE_MIN_FLAGGED,
+    CASCADE_MAX_FLAGGED_SHARE, CASCADE_FALLBACK,
+)
+from app.models import (
+    ReviewRequest, ReviewResponse, Finding, ReviewJob, ReviewJobRequest, BatchReviewRequest, BatchReviewItem,
+    PackReport, DiffReport, CascadeReport, ModelUsage, CompactionReport,
+)
+from app.services.ingest import (
+    fetch_repo_files, resolve_repo, resolve_diff, fetch_diff, is_diff_url, repo_key,
+)
+from app.services.packer import Pack, RepoFile, pack_files, shard_files, render_pack, context_budget
+from app.services.compact import compact_files
+from app.services.diff import render_patch
+from app.services.findings_store import findings_store
+from app.services.github_ratelimit import token_pool
+from app.services import metrics, warmup
+from app.services.metrics import span, PARSE_RESULTS, REVIEW_CACHE
+from app.services.reduce import merge_reviews, parse_rating
+from app.services.ai_service import generate_review, triage_files, stream_review, track_calls, MISTRAL_MODEL
+from app.services.json_stream import ReviewStreamParser
+from app.services.blob_cache import blob_cache
+from app.services.result_cache import result_cache
+from app.services.singleflight import ingest_flight, review_flight
+from app.services.jobs import job_manager
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -27,50 +54,494 @@ def _parse_ai_json(text: str) -> Tuple[bool, Any]:
     except: pass
     return False, "parse failed"
 
-@router.post("/review", response_model=ReviewResponse)
-async def review_code(request: ReviewRequest):
+def _pack_report(pack) -> PackReport:
+    return PackReport(
+        budget_tokens=pack.budget, used_tokens=pack.tokens,
+        included=[f.path for f in pack.files], trimmed=pack.trimmed, dropped=pack.dropped,
+    )
+
+def _no_progress(stage: str):
+    pass
+
+def _review_mode(request: ReviewRequest) -> Tuple[str, int, int]:
+    mode = request.mode or REVIEW_MODE
+    max_shards = min(request.max_shards or MAP_REDUCE_MAX_SHARDS, MAP_REDUCE_MAX_SHARDS)
+    max_tokens = min(request.max_tokens or MAP_REDUCE_MAX_TOKENS, MAP_REDUCE_MAX_TOKENS)
+    return mode, max_shards, max_tokens
+
+async def _generate(request: ReviewRequest, prompt: str, model: Optional[str] = None) -> str:
+    # identical prompts for the same assignment, level and model share one completion
+    key = review_flight.key(prompt, request.assignment_description, request.candidate_level, model or MISTRAL_MODEL)
+    return await review_flight.do(key, lambda: generate_review(
+        assignment_description=request.assignment_description,
+        repo_contents=prompt,
+        candidate_level=request.candidate_level,
+        **({"model": model} if model else {}),
+    ))
+
+async def _review_shards(request: ReviewRequest, shards: List[Pack], header: str = "",
+                         model: Optional[str] = None) -> List[Any]:
+    with span("prompt"):
+        if len(shards) == 1:
+            prompts = [header + render_pack(shards[0])]
+        else:
+            prompts = [f"(Part {i + 1} of {len(shards)}; the other parts are reviewed separately.)\n"
+                       + render_pack(Pack(shard.files)) for i, shard in enumerate(shards)]
+    if len(shards) == 1:
+        return [await _generate(request, prompts[0], model)]
+
+    sem = asyncio.Semaphore(MAP_REDUCE_CONCURRENCY)
+    async def review_part(prompt: str):
+        async with sem:
+            return await _generate(request, prompt, model)
+    results = await asyncio.gather(*(review_part(p) for p in prompts), return_exceptions=True)
+    if all(isinstance(r, BaseException) for r in results):
+        raise results[0]
+    return results
+
+def _findings_context(request: ReviewRequest, model: str = MISTRAL_MODEL) -> str:
+    # findings are only comparable between reviews by the same model
+    return findings_store.context(request.assignment_description, request.candidate_level, model)
+
+async def _record_findings(request: ReviewRequest, files: List[RepoFile], pack: Pack, findings: List[Finding],
+                     model: str = MISTRAL_MODEL):
+    # only files the model saw whole can vouch for their blob; trimmed previews may hide issues
+    shas = {f.path: f.sha for f in files if f.sha}
+    whole = {f.path: shas[f.path] for f in pack.files if not f.trimmed and f.path in shas}
+    by_sha = {sha: [] for sha in whole.values()}
+    for finding in findings:
+        if finding.file in whole:
+            by_sha[whole[finding.file]].append(finding.model_dump())
+    if by_sha:
+        await findings_store.aput_many(_findings_context(request, model), by_sha)
+
+async def run_diff_review(request: ReviewRequest, progress: Callable[[str], None] = _no_progress,
+                          ingest_slot: Optional[asyncio.Semaphore] = None) -> ReviewResponse:
     try:
-        repo_contents = fetch_repo_and_generate_message(request.github_repo_url)
-        ai_text = await generate_review(
-            assignment_description=request.assignment_description,
-            repo_contents=repo_contents,
-            candidate_level=request.candidate_level,
-        )
+        async with ingest_slot or nullcontext():
+            progress("resolve")
+            target = await resolve_diff(request.github_repo_url, request.base_ref)
+            cache_key = result_cache.key(target.owner, target.repo, target.head_sha, request.assignment_description,
+                                         request.candidate_level, MISTRAL_MODEL, "diff", target.base_sha)
+            cached = result_cache.get(cache_key)
+            REVIEW_CACHE.inc(result="miss" if cached is None else "hit")
+            if cached is not None:
+                return cached
+
+            progress("fetch")
+            changed, unchanged = await fetch_diff(target)
+
+        # unchanged blobs keep the findings of an earlier full review, moved to their current path
+        known = await findings_store.aget_many([f.sha for f in unchanged if f.sha], _findings_context(request))
+        reused, reused_files = [], []
+        for f in unchanged:
+            if f.sha in known:
+                reused_files.append(f.path)
+                reused.extend(Finding(**{**d, "file": f.path}) for d in known[f.sha])
+
+        hunks = [
+            RepoFile(f.path, len(f.patch), render_patch(f.patch), None, f.code)
+            for f in changed if f.patch
+        ]
+        pack = pack_files(hunks, context_budget(MISTRAL_MODEL))
+        diff = DiffReport(base_sha=target.base_sha, head_sha=target.head_sha,
+                          changed_files=[f.path for f in changed], reused_files=reused_files,
+                          reused_findings=len(reused))
+        if not pack.files:
+            return ReviewResponse(files_found=[], rating_out_of_5=0, summary="No reviewable changes.",
+                                  findings=reused, conclusion="", diff=diff, packing=_pack_report(pack))
+
+        progress("review")
+        header = (f"(Diff review {target.base_sha[:12]}...{target.head_sha[:12]}: only changed hunks are shown. "
+                  "Numbers are head-version line numbers; '+' lines were added, '-' lines removed. "
+                  "Review the changes only.)\n")
+        ai_text = await _generate(request, header + render_pack(pack))
     except HTTPException: raise
     except Exception as e:
-        logger.exception("Unhandled error in /review")
+        logger.exception("Unhandled error in diff review")
         raise HTTPException(status_code=502, detail=str(e))
 
-    ok, parsed = _parse_ai_json(ai_text)
-    if ok:
-        data = parsed
-        files_found = list(map(str, data.get("files_found", [])))
-        rating = int(data.get("rating_out_of_5", 0) or 0)
-        summary = str(data.get("summary", "") or "")
-        truncated = "truncated" in repo_contents.lower()
-        if truncated:
-            summary = "(Note: analysis truncated)\n" + summary
-        conclusion = str(data.get("conclusion", "") or "")
-        findings = [Finding(**f) for f in (data.get("findings", []) or []) if isinstance(f, dict)]
-
-        logger.info("Review: %d files (truncated=%s). Examples: %s",
-                    len(files_found), truncated, files_found[:5])
-
+    progress("parse")
+    with span("parse"):
+        ok, data = _parse_ai_json(ai_text)
+    PARSE_RESULTS.inc(outcome="ok" if ok else "failed")
+    if not ok:
+        logger.warning("AI JSON parse failed: %s", data)
         return ReviewResponse(
-            files_found=files_found,
-            rating_out_of_5=rating,
-            summary=summary,
-            findings=findings,
-            conclusion=conclusion,
-            truncated=truncated,
-            included_files=len(files_found),
-            total_bytes=len(repo_contents.encode("utf-8")),
+            files_found=[], rating_out_of_5=0, summary="Model returned unstructured text.",
+            findings=reused, conclusion="", raw_text=ai_text, truncated=pack.truncated,
+            included_files=len(pack.files), total_bytes=pack.total_bytes, packing=_pack_report(pack), diff=diff,
         )
+    summary = str(data.get("summary", "") or "")
+    if pack.truncated:
+        summary = "(Note: analysis truncated)\n" + summary
+    resp = ReviewResponse(
+        files_found=_files_found(data),
+        rating_out_of_5=parse_rating(data.get("rating_out_of_5")),
+        summary=summary,
+        findings=_findings(data.get("findings")) + reused,
+        conclusion=str(data.get("conclusion", "") or ""),
+        truncated=pack.truncated,
+        included_files=len(pack.files),
+        total_bytes=pack.total_bytes,
+        packing=_pack_report(pack),
+        diff=diff,
+    )
+    result_cache.put(cache_key, target.owner, target.repo, resp)
+    return resp
+
+def _findings(items: Any) -> List[Finding]:
+    # one out-of-schema finding (e.g. severity "critical") should not cost the whole review
+    findings = []
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        try:
+            findings.append(Finding(**item))
+        except ValidationError as e:
+            logger.warning("Dropping malformed finding: %s", e)
+    return findings
+
+def _files_found(data: dict) -> List[str]:
+    items = data.get("files_found")
+    return [str(p) for p in items] if isinstance(items, list) else []
 
-    logger.warning("AI JSON parse failed: %s", parsed)
+def _review_response(data: dict, pack: Pack, shards: int, failed: int = 0) -> ReviewResponse:
+    files_found = _files_found(data)
+    summary = str(data.get("summary", "") or "")
+    if failed:
+        summary = f"(Note: {failed} of {shards} parts could not be reviewed)\n" + summary
+    if pack.truncated:
+        summary = "(Note: analysis truncated)\n" + summary
+    logger.info("Review: %d files (truncated=%s, shards=%d). Examples: %s",
+                len(files_found), pack.truncated, shards, files_found[:5])
+    return ReviewResponse(
+        files_found=files_found,
+        rating_out_of_5=parse_rating(data.get("rating_out_of_5")),
+        summary=summary,
+        findings=_findings(data.get("findings")),
+        conclusion=str(data.get("conclusion", "") or ""),
+        truncated=pack.truncated,
+        included_files=len(pack.files),
+        total_bytes=pack.total_bytes,
+        packing=_pack_report(pack),
+        shards=shards,
+    )
+
+def _unstructured_response(ai_texts: List[Any], pack: Pack, shards: int) -> ReviewResponse:
     return ReviewResponse(
         files_found=[], rating_out_of_5=0,
         summary="Model returned unstructured text.",
-        findings=[], conclusion="", raw_text=ai_text
+        findings=[], conclusion="", raw_text="\n\n".join(t for t in ai_texts if isinstance(t, str)),
+        truncated=pack.truncated, included_files=len(pack.files), total_bytes=pack.total_bytes,
+        packing=_pack_report(pack), shards=shards,
     )
 
+def _model_usage(calls) -> List[ModelUsage]:
+    totals = {}
+    for tier, model, prompt_tokens, completion_tokens, seconds in calls:
+        usage = totals.setdefault((tier, model), ModelUsage(tier=tier, model=model))
+        usage.calls += 1
+        usage.prompt_tokens += prompt_tokens
+        usage.completion_tokens += completion_tokens
+        usage.latency_ms = round(usage.latency_ms + seconds * 1000, 1)
+    return list(totals.values())
+
+def _triage_scores(texts: List[Any]) -> dict:
+    scores = {}
+    for text in texts:
+        ok, data = _parse_ai_json(text)   # exceptions from gather fail here as non-strings
+        if not ok or not isinstance(data, dict):
+            continue
+        for item in data.get("files") or []:
+            try:
+                scores[str(item["file"])] = (float(item.get("risk", 0)), str(item.get("reason", "") or ""))
+            except (KeyError, TypeError, ValueError, AttributeError):
+                continue
+    return scores
+
+async def _triage(request: ReviewRequest, files: List[RepoFile], max_shards: int,
+                  max_tokens: int) -> Tuple[CascadeReport, List[RepoFile], str, List[str]]:
+    """Score every file with the triage model; returns the report, the files for the review
+    model, a prompt header summarising the rest and the paths nobody saw (never fetched, or
+    beyond the triage caps). A set fallback means: review everything."""
+    report = CascadeReport(triage_model=CASCADE_TRIAGE_MODEL, review_model=CASCADE_REVIEW_MODEL,
+                           threshold=CASCADE_FLAG_THRESHOLD)
+    with span("pack"):
+        shards = shard_files(files, context_budget(CASCADE_TRIAGE_MODEL), max_shards, max_tokens)
+    texts = await asyncio.gather(*(
+        triage_files(request.assignment_description, render_pack(Pack(s.files)), request.candidate_level)
+        for s in shards
+    ), return_exceptions=True)
+    scores = _triage_scores(texts)
+    triaged = [f.path for s in shards for f in s.files]
+    report.triaged_files = len(triaged)
+    if not scores:
+        if CASCADE_FALLBACK != "single":
+            raise HTTPException(status_code=502, detail="Cascade triage failed")
+        report.fallback = "triage failed"
+        return report, files, "", []
+
+    risk = lambda path: scores.get(path, (0.0, ""))[0]
+    flagged = [p for p in triaged if risk(p) >= CASCADE_FLAG_THRESHOLD]
+    if not flagged:
+        flagged = sorted(triaged, key=lambda p: -risk(p))[:CASCADE_MIN_FLAGGED]
+    if len(flagged) > CASCADE_MAX_FLAGGED_SHARE * len(triaged) and CASCADE_FALLBACK == "single":
+        report.fallback = "most files flagged"
+        return report, files, "", []
+    report.flagged = flagged
+
+    chosen = set(flagged)
+    rest = [p for p in triaged if p not in chosen]
+    lines = ["# Triage Notes",
+             f"(Cascade review: a triage model screened {len(triaged)} files and flagged the {len(flagged)} "
+             "under Repository Files. The files listed here were judged low-risk; review the flagged files "
+             "in detail and mention these only if their notes suggest a problem.)"]
+    lines += [f"- `{p}` (risk {risk(p):.2f}): {scores.get(p, (0.0, 'not assessed'))[1]}" for p in rest[:200]]
+    if len(rest) > 200:
+        lines.append(f"- ... and {len(rest) - 200} more low-risk files")
+    seen = set(triaged)
+    unseen = [f.path for f in files if f.path not in seen]
+    return report, [f for f in files if f.path in chosen], "\n".join(lines) + "\n\n", unseen
+
+async def run_review(request: ReviewRequest, progress: Callable[[str], None] = _no_progress,
+                     ingest_slot: Optional[asyncio.Semaphore] = None) -> ReviewResponse:
+    if request.base_ref or is_diff_url(request.github_repo_url):
+        return await run_diff_review(request, progress, ingest_slot)
+    mode, max_shards, max_tokens = _review_mode(request)
+    model = CASCADE_REVIEW_MODEL if mode == "cascade" else MISTRAL_MODEL
+    budget = context_budget(model)
+    calls = track_calls()
+    cascade, header = None, ""
+    try:
+        # ingest_slot lets a batch bound how many repos hit GitHub at once; the LLM stage runs outside it
+        async with ingest_slot or nullcontext():
+            progress("resolve")
+            target = await resolve_repo(request.github_repo_url)
+            options = (CASCADE_TRIAGE_MODEL, CASCADE_FLAG_THRESHOLD) if mode == "cascade" else ()
+            cache_key = result_cache.key(target.owner, target.repo, target.sha, request.assignment_description,
+                                         request.candidate_level, model, mode, max_shards, max_tokens, *options)
+            cached = result_cache.get(cache_key)
+            REVIEW_CACHE.inc(result="miss" if cached is None else "hit")
+            if cached is not None:
+                logger.info("Review cache hit for %s/%s@%s", target.owner, target.repo, target.sha[:12])
+                return cached
+
+            progress("fetch")
+            if mode == "single":
+                files = await fetch_repo_files(request.github_repo_url, target=target, budget=budget)
+            else:
+                files = await fetch_repo_files(request.github_repo_url, target=target,
+                                               max_files=MAP_REDUCE_MAX_FILES,
+                                               max_bytes=int(max_tokens * CHARS_PER_TOKEN))
+        with span("compact"):
+            files, compaction = compact_files(files)
+        if mode == "cascade":
+            progress("triage")
+            cascade, selected, header, unseen = await _triage(request, files, max_shards, max_tokens)
+        with span("pack"):
+            pack = pack_files(selected if mode == "cascade" else files, budget)
+            if mode == "cascade" and unseen:
+                order = {f.path: i for i, f in enumerate(files)}
+                pack.dropped = sorted(set(pack.dropped) | set(unseen), key=order.__getitem__)
+            if mode in ("single", "cascade") or (mode == "auto" and not pack.dropped and not pack.trimmed):
+                shards = [pack]
+            else:
+                shards = shard_files(files, budget, max_shards, max_tokens) or [pack]
+                pack = Pack([f for s in shards for f in s.files], shards[0].dropped, min(max_tokens, max_shards * budget))
+        progress("review")
+        ai_texts = await _review_shards(request, shards, header, model if mode == "cascade" else None)
+    except HTTPException: raise
+    except Exception as e:
+        logger.exception("Unhandled error in /review")
+        raise HTTPException(status_code=502, detail=str(e))
+
+    progress("parse")
+    parts, failed = [], 0
+    with span("parse"):
+        for shard, ai_text in zip(shards, ai_texts):
+            ok, parsed = _parse_ai_json(ai_text) if isinstance(ai_text, str) else (False, ai_text)
+            PARSE_RESULTS.inc(outcome="ok" if ok else "failed")
+            if ok:
+                parts.append((parsed, shard.tokens))
+            else:
+                failed += 1
+                logger.warning("AI JSON parse failed: %s", parsed)
+    if parts:
+        data = parts[0][0] if len(shards) == 1 else merge_reviews(parts)
+        resp = _review_response(data, pack, len(shards), failed)
+        resp.compaction, resp.cascade, resp.models = compaction, cascade, _model_usage(calls)
+        if not failed:
+            result_cache.put(cache_key, target.owner, target.repo, resp)
+            await _record_findings(request, files, pack, resp.findings, model)
+        return resp
+
+    resp = _unstructured_response(ai_texts, pack, len(shards))
+    resp.compaction, resp.cascade, resp.models = compaction, cascade, _model_usage(calls)
+    return resp
+
+@router.post("/review", response_model=ReviewResponse)
+async def review_code(request: ReviewRequest):
+    return await run_review(request)
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _closing_events(resp: ReviewResponse):
+    yield _sse("summary", {"summary": resp.summary})
+    yield _sse("rating", {"rating_out_of_5": resp.rating_out_of_5})
+    yield _sse("conclusion", {"conclusion": resp.conclusion})
+    yield _sse("done", resp.model_dump())
+
+def _replay_events(resp: ReviewResponse):
+    for f in resp.findings:
+        yield _sse("finding", f.model_dump())
+    yield from _closing_events(resp)
+
+async def _stream_model(request: ReviewRequest, target, files: List[RepoFile], pack: Pack, cache_key: str,
+                        compaction: Optional[CompactionReport] = None):
+    parser = ReviewStreamParser()
+    try:
+        async for chunk in stream_review(
+            assignment_description=request.assignment_description,
+            repo_contents=render_pack(pack),
+            candidate_level=request.candidate_level,
+        ):
+            for item in parser.feed(chunk):
+                try:
+                    yield _sse("finding", Finding(**item).model_dump())
+                except ValidationError as e:
+                    logger.warning("Skipping malformed streamed finding: %s", e)
+    except Exception as e:
+        logger.exception("Streaming review failed")
+        yield _sse("error", {"status_code": getattr(e, "status_code", None) or 502, "detail": str(e)})
+        return
+
+    try:
+        data = parser.result()
+    except ValueError:
+        ok, data = _parse_ai_json(parser.text)   # e.g. a double-encoded object
+        if not ok:
+            PARSE_RESULTS.inc(outcome="failed")
+            logger.warning("AI JSON parse failed: %s", data)
+            resp = _unstructured_response([parser.text], pack, 1)
+            resp.compaction = compaction
+            yield _sse("done", resp.model_dump())
+            return
+    PARSE_RESULTS.inc(outcome="ok")
+    resp = _review_response(data, pack, 1)
+    resp.compaction = compaction
+    result_cache.put(cache_key, target.owner, target.repo, resp)
+    await _record_findings(request, files, pack, resp.findings)
+    for event in _closing_events(resp):
+        yield event
+
+@router.post("/review/stream")
+async def review_stream(request: ReviewRequest):
+    """Server-sent events: one `finding` per finding as the model writes it, then
+    `summary`, `rating`, `conclusion` and `done` (the full ReviewResponse)."""
+    mode, max_shards, max_tokens = _review_mode(request)
+    if request.base_ref or is_diff_url(request.github_repo_url) or mode in ("map_reduce", "cascade"):
+        # diff and sharded reviews merge several results, so their events go out once complete
+        resp = await run_review(request)
+        return StreamingResponse(_replay_events(resp), media_type="text/event-stream")
+
+    # resolve and fetch before the stream opens so GitHub errors keep their HTTP status
+    try:
+        target = await resolve_repo(request.github_repo_url)
+        cache_key = result_cache.key(target.owner, target.repo, target.sha, request.assignment_description,
+                                     request.candidate_level, MISTRAL_MODEL, "single", max_shards, max_tokens)
+        cached = result_cache.get(cache_key)
+        REVIEW_CACHE.inc(result="miss" if cached is None else "hit")
+        if cached is not None:
+            return StreamingResponse(_replay_events(cached), media_type="text/event-stream")
+        budget = context_budget(MISTRAL_MODEL)
+        files = await fetch_repo_files(request.github_repo_url, target=target, budget=budget)
+        with span("compact"):
+            files, compaction = compact_files(files)
+        with span("pack"):
+            pack = pack_files(files, budget)
+    except HTTPException: raise
+    except Exception as e:
+        logger.exception("Unhandled error in /review/stream")
+        raise HTTPException(status_code=502, detail=str(e))
+    return StreamingResponse(_stream_model(request, target, files, pack, cache_key, compaction),
+                             media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+async def _batch_item(index: int, url: str, batch: BatchReviewRequest, slot: asyncio.Semaphore) -> BatchReviewItem:
+    try:
+        request = ReviewRequest(assignment_description=batch.assignment_description,
+                                github_repo_url=url, candidate_level=batch.candidate_level)
+        result = await run_review(request, ingest_slot=slot)
+        return BatchReviewItem(index=index, github_repo_url=url, status="ok", result=result)
+    except HTTPException as e:
+        return BatchReviewItem(index=index, github_repo_url=url, status="error",
+                               status_code=e.status_code, error=str(e.detail))
+
+@router.post("/review/batch")
+async def review_batch(batch: BatchReviewRequest):
+    if len(batch.github_repo_urls) > BATCH_MAX_REPOS:
+        raise HTTPException(status_code=422, detail=f"At most {BATCH_MAX_REPOS} repositories per batch")
+
+    async def stream():
+        # Ingestion is gated per batch while LLM calls share the global Mistral limit, so
+        # repo k+1 is fetched while repo k is being reviewed. Lines go out as repos finish.
+        slot = asyncio.Semaphore(BATCH_FETCH_CONCURRENCY)
+        tasks = [asyncio.create_task(_batch_item(i, url, batch, slot))
+                 for i, url in enumerate(batch.github_repo_urls)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item = await next_done
+                yield item.model_dump_json() + "\n"
+        finally:
+            for t in tasks:
+                t.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@router.post("/reviews", response_model=ReviewJob, status_code=202)
+async def submit_review_job(request: ReviewJobRequest):
+    return job_manager.submit(request)
+
+@router.get("/reviews/{job_id}", response_model=ReviewJob)
+async def get_review_job(job_id: str):
+    return await job_manager.get(job_id)
+
+@router.delete("/reviews/{job_id}", response_model=ReviewJob)
+async def cancel_review_job(job_id: str):
+    return await job_manager.cancel(job_id)
+
+
+@router.delete("/review/cache")
+async def invalidate_review_cache(github_repo_url: Optional[str] = None):
+    if github_repo_url is None:
+        return {"invalidated": result_cache.invalidate()}
+    owner, repo = repo_key(github_repo_url)
+    return {"invalidated": result_cache.invalidate(owner, repo)}
+
+@router.get("/cache/stats")
+async def cache_stats():
+    return {"blobs": blob_cache.stats(), "reviews": result_cache.stats(), "findings": findings_store.stats(),
+            "jobs": job_manager.stats(),
+            "coalescing": {"ingest": ingest_flight.stats(), "review": review_flight.stats()}}
+
+@router.get("/ready")
+async def readiness():
+    """200 once the clients are warm (right after startup unless FAST_STARTUP), 503 before and while stopping."""
+    ready = warmup.is_ready()
+    return JSONResponse({"status": "ready" if ready else "starting", **warmup.stats()},
+                        status_code=200 if ready else 503)
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    stats = {"blob_cache": blob_cache.stats(), "review_cache": result_cache.stats(),
+             "findings": findings_store.stats(), "jobs": job_manager.stats(),
+             "ingest_flight": ingest_flight.stats(), "review_flight": review_flight.stats(),
+             "startup": warmup.stats(),
+             "github_pool": {k: v for k, v in token_pool.stats().items() if k != "tokens"}}
+    return PlainTextResponse(metrics.render(stats), media_type="text/plain; version=0.0.4")
+
+@router.get("/github/rate-limit")
+async def github_rate_limit():
+    return token_pool.stats()
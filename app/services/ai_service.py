@@ -1,20 +1,99 @@
-import os, logging, json
-from mistralai import Mistral
+import os, time, logging, json, random, asyncio, importlib
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+import httpx
+from app.config import (
+    MISTRAL_MODEL, MISTRAL_SERVER_URL, CASCADE_TRIAGE_MODEL, LLM_CONCURRENCY, LLM_TIMEOUT, LLM_MAX_RETRIES, LLM_BACKOFF_BASE, LLM_BACKOFF_MAX,
+)
+from app.services.metrics import span, LLM_REQUESTS, LLM_TOKENS
+
+if TYPE_CHECKING:
+    from mistralai import Mistral
 
 logger = logging.getLogger(__name__)
 
-MISTRAL_MODEL = os.getenv("MISTRAL_MODEL", "mistral-large-latest")
 _client = None
+_http: Optional[httpx.AsyncClient] = None
+_sem: Optional[asyncio.Semaphore] = None
+_calls: ContextVar[Optional[List[Tuple[str, str, int, int, float]]]] = ContextVar("llm_calls", default=None)
 
-def _get_client() -> Mistral:
-    global _client
+def _get_client() -> "Mistral":
+    global _client, _http
     if _client is None:
         api_key = os.getenv("MISTRAL_API_KEY")
         if not api_key:
             raise RuntimeError("Missing MISTRAL_API_KEY. Add it to .env")
-        _client = Mistral(api_key=api_key)
+        from mistralai import Mistral   # the SDK is most of the app's import time; prewarm() loads it early
+        # shared keep-alive pool sized to the concurrency limit
+        _http = httpx.AsyncClient(
+            timeout=LLM_TIMEOUT,
+            limits=httpx.Limits(max_connections=LLM_CONCURRENCY, max_keepalive_connections=LLM_CONCURRENCY),
+        )
+        _client = Mistral(api_key=api_key, server_url=MISTRAL_SERVER_URL, async_client=_http,
+                          timeout_ms=int(LLM_TIMEOUT * 1000))
     return _client
 
+def _get_semaphore() -> asyncio.Semaphore:
+    global _sem
+    if _sem is None:
+        _sem = asyncio.Semaphore(LLM_CONCURRENCY)
+    return _sem
+
+async def startup():
+    global _sem
+    _sem = asyncio.Semaphore(LLM_CONCURRENCY)
+
+async def prewarm(connect: bool = False):
+    """Import the SDK off the event loop and build the client; with `connect`, also open a
+    keep-alive connection so the first review skips the TLS handshake."""
+    if not os.getenv("MISTRAL_API_KEY"):
+        return
+    await asyncio.to_thread(importlib.import_module, "mistralai")
+    _get_client()
+    if connect:
+        base = (MISTRAL_SERVER_URL or "https://api.mistral.ai").rstrip("/")
+        await _http.get(f"{base}/v1/models", headers={"Authorization": f"Bearer {os.getenv('MISTRAL_API_KEY')}"})
+
+async def aclose():
+    global _client, _http
+    if _http is not None:
+        await _http.aclose()
+    _client, _http = None, None
+
+def _retry_delay(attempt: int, err: Exception) -> Optional[float]:
+    # None means "do not retry": only rate limits, server errors and transport failures are transient
+    status = getattr(err, "status_code", None)
+    if not (isinstance(err, (httpx.TransportError, asyncio.TimeoutError)) or status == 429 or (status or 0) >= 500):
+        return None
+    headers = getattr(getattr(err, "raw_response", None), "headers", None) or {}
+    retry_after = headers.get("retry-after")
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), LLM_BACKOFF_MAX)
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+async def _retrying(call: Callable[[], Awaitable]):
+    attempt = 0
+    while True:
+        try:
+            result = await call()
+            LLM_REQUESTS.inc(outcome="ok")
+            return result
+        except Exception as e:
+            delay = _retry_delay(attempt, e) if attempt < LLM_MAX_RETRIES else None
+            if delay is None:
+                LLM_REQUESTS.inc(outcome="error")
+                raise
+            LLM_REQUESTS.inc(outcome="retry")
+            attempt += 1
+            logger.warning("Mistral call failed (%s); retry %d/%d in %.1fs", e, attempt, LLM_MAX_RETRIES, delay)
+            await asyncio.sleep(delay)
+
+async def _complete(client: "Mistral", **kwargs):
+    async def once():
+        async with _get_semaphore():
+            return await asyncio.wait_for(client.chat.complete_async(**kwargs), LLM_TIMEOUT)
+    return await _retrying(once)
+
 JSON_SCHEMA_INSTRUCTIONS = """
 You are a code reviewer. Return ONLY JSON matching this schema:
 
@@ -29,28 +108,71 @@ You are a code reviewer. Return ONLY JSON matching this schema:
 }
 """
 
-async def generate_review(assignment_description: str, repo_contents: str, candidate_level: str) -> str:
-    client = _get_client()
-    system_prompt = (
-        "You are a strict, helpful code reviewer. "
-        "Focus first on application code, then config/docs if room. "
-        "Be concise, actionable, security-focused."
-    )
-    user_prompt = (
+# Static instructions come first and the repo content last, so every review of the same
+# assignment shares one byte-identical prompt prefix (system + assignment + level).
+SYSTEM_PROMPT = (
+    "You are a strict, helpful code reviewer. "
+    "Focus first on application code, then config/docs if room. "
+    "Be concise, actionable, security-focused.\n"
+    f"{JSON_SCHEMA_INSTRUCTIONS}"
+)
+
+def _user_prompt(assignment_description: str, candidate_level: str, repo_contents: str) -> str:
+    return (
         f"ASSIGNMENT:\n{assignment_description}\n\n"
         f"CANDIDATE LEVEL: {candidate_level}\n\n"
-        f"REPO CONTENT (may be truncated):\n{repo_contents}\n\n"
-        f"{JSON_SCHEMA_INSTRUCTIONS}"
-    )
-    resp = client.chat.complete(
-        model=MISTRAL_MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-        temperature=0.2,
+        f"REPO CONTENT (may be truncated):\n{repo_contents}"
     )
-    text = resp.choices[0].message.content.strip()
+
+TRIAGE_PROMPT = """
+You are triaging a code review. For EVERY file shown, estimate how likely it is to contain
+bugs, security problems or poor practices worth a senior reviewer's time. Return ONLY JSON:
+
+{"files": [{"file": "path", "risk": 0.0-1.0, "reason": "one short sentence"}]}
+"""
+
+def track_calls() -> List[Tuple[str, str, int, int, float]]:
+    """Collect (tier, model, prompt tokens, completion tokens, seconds) for every completion
+    made from the current context, e.g. one review request."""
+    calls: List[Tuple[str, str, int, int, float]] = []
+    _calls.set(calls)
+    return calls
+
+def _record_usage(usage, tier: str = "review", model: str = MISTRAL_MODEL, seconds: float = 0.0):
+    prompt = getattr(usage, "prompt_tokens", 0) or 0
+    completion = getattr(usage, "completion_tokens", 0) or 0
+    LLM_TOKENS.inc(prompt, kind="prompt")
+    LLM_TOKENS.inc(completion, kind="completion")
+    calls = _calls.get()
+    if calls is not None:
+        calls.append((tier, model, prompt, completion, seconds))
+
+def _messages(assignment_description: str, repo_contents: str, candidate_level: str) -> list:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": _user_prompt(assignment_description, candidate_level, repo_contents)},
+    ]
+
+async def _chat(model: str, messages: list, tier: str) -> str:
+    client = _get_client()
+    start = time.perf_counter()
+    with span("llm" if tier == "review" else f"llm_{tier}"):
+        resp = await _complete(client, model=model, messages=messages, temperature=0.2)
+    _record_usage(getattr(resp, "usage", None), tier, model, time.perf_counter() - start)
+    return resp.choices[0].message.content.strip()
+
+async def triage_files(assignment_description: str, repo_contents: str, candidate_level: str,
+                       model: str = CASCADE_TRIAGE_MODEL) -> str:
+    """Per-file risk scores from the small cascade model, as JSON text."""
+    messages = [
+        {"role": "system", "content": TRIAGE_PROMPT},
+        {"role": "user", "content": _user_prompt(assignment_description, candidate_level, repo_contents)},
+    ]
+    return await _chat(model, messages, "triage")
+
+async def generate_review(assignment_description: str, repo_contents: str, candidate_level: str,
+                          model: str = MISTRAL_MODEL) -> str:
+    text = await _chat(model, _messages(assignment_description, repo_contents, candidate_level), "review")
     if text.startswith("```"):
         text = text.strip("`").replace("json\n", "").replace("JSON\n", "").strip()
     try:
@@ -59,3 +181,31 @@ async def generate_review(assignment_description: str, repo_contents: str, candi
         logger.warning("AI returned non-JSON; will pass raw text")
     return text
 
+async def stream_review(assignment_description: str, repo_contents: str, candidate_level: str) -> AsyncIterator[str]:
+    """Yield the review text as the model generates it.
+
+    Opening the stream is retried like a normal completion; once tokens flow a failure is
+    raised to the caller, and LLM_TIMEOUT bounds the gap between two chunks.
+    """
+    client = _get_client()
+    messages = _messages(assignment_description, repo_contents, candidate_level)
+    start = time.perf_counter()
+    async with _get_semaphore():
+        with span("llm_stream"):
+            stream = await _retrying(lambda: asyncio.wait_for(
+                client.chat.stream_async(model=MISTRAL_MODEL, messages=messages, temperature=0.2), LLM_TIMEOUT,
+            ))
+            async with stream:
+                events = stream.__aiter__()
+                while True:
+                    try:
+                        event = await asyncio.wait_for(events.__anext__(), LLM_TIMEOUT)
+                    except StopAsyncIteration:
+                        break
+                    usage = getattr(event.data, "usage", None)   # sent with the last chunk
+                    if usage is not None:
+                        _record_usage(usage, "review", MISTRAL_MODEL, time.perf_counter() - start)
+                    choices = event.data.choices
+                    delta = choices[0].delta.content if choices else None
+                    if isinstance(delta, str) and delta:
+                        yield delta
@@ -0,0 +1,233 @@
+import ast, json, re, asyncio, logging, multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Tuple
+from app.config import STATIC_ANALYSIS, ANALYSIS_WORKERS, ANALYSIS_MIN_BYTES
+from app.services.packer import RepoFile
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_cache: "OrderedDict[Tuple[str, str], FileSignals]" = OrderedDict()   # by (blob sha, path)
+_CACHE_MAX = 4096
+
+@dataclass
+class FileSignals:
+    path: str
+    lines: int = 0
+    parsed: Optional[bool] = None    # None when there is no parser for the language
+    complexity: int = 1              # cyclomatic: 1 + decision points
+    risky: List[str] = field(default_factory=list)
+    entry_point: bool = False
+    risk: float = 0.0                # 0-1, drives file selection and order
+
+    def notes(self) -> str:
+        parts = [f"risk {self.risk:.2f}", f"complexity {self.complexity}"]
+        if self.risky:
+            parts.append(", ".join(self.risky))
+        if self.entry_point:
+            parts.append("entry point")
+        if self.parsed is False:
+            parts.append("does not parse")
+        return "; ".join(parts)
+
+_PY_RISKY_CALLS = {
+    "eval": "eval", "exec": "exec", "compile": "exec", "__import__": "dynamic import",
+    "os.system": "shell", "os.popen": "shell", "subprocess.run": "subprocess", "subprocess.call": "subprocess",
+    "subprocess.Popen": "subprocess", "subprocess.check_output": "subprocess", "subprocess.check_call": "subprocess",
+    "pickle.load": "pickle", "pickle.loads": "pickle", "marshal.loads": "pickle", "yaml.load": "yaml.load",
+}
+_PY_BRANCHES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.ExceptHandler, ast.IfExp, ast.comprehension,
+                ast.Assert) + ((ast.match_case,) if hasattr(ast, "match_case") else ())
+_APP_FACTORIES = {"FastAPI", "Flask", "APIRouter", "Blueprint", "Celery"}
+_SQL = re.compile(r"\b(select\b.+\bfrom|insert\s+into|update\b.+\bset|delete\s+from)\b", re.I | re.S)
+
+_RISKY = [
+    (re.compile(r"\beval\s*\(|\bnew\s+Function\s*\("), "eval"),
+    (re.compile(r"child_process|\bsubprocess\.|\bexecSync\s*\(|Runtime\.getRuntime\(\)\.exec|\"os/exec\"|\bsystem\s*\(|\bpopen\s*\("),
+     "subprocess"),
+    (re.compile(r"\.innerHTML\s*=|dangerouslySetInnerHTML|document\.write\s*\("), "raw HTML"),
+    (re.compile(r"""["'`]\s*(?:SELECT|INSERT|UPDATE|DELETE)\b[^"'`\n]*(?:["'`]\s*\+|\$\{|%s|\{\})""", re.I),
+     "sql string"),
+    (re.compile(r"\b(?:unserialize|ObjectInputStream|Marshal\.load)\b"), "deserialization"),
+]
+_ENTRY = re.compile(r"\bfunc\s+main\s*\(|\bstatic\s+void\s+main\s*\(|\bint\s+main\s*\(|\.listen\s*\(|"
+                    r"\bexpress\s*\(\s*\)|\bcreateServer\s*\(|@(?:Rest)?Controller\b|\bfn\s+main\s*\(|"
+                    r"^\s*@\w+\.(?:get|post|put|patch|delete|route|websocket)\s*\(|__name__\s*==\s*.__main__.", re.M)
+_BRANCH = re.compile(r"\b(?:if|for|while|case|catch|elif|except|when)\b|&&|\|\||\?\s")
+_ENTRY_NAMES = {"main", "index", "server", "app", "manage", "wsgi", "asgi", "cli", "__main__"}
+
+_SENSITIVE_PARTS = ("auth", "login", "logout", "passw", "secret", "token", "session", "crypt", "secur", "permission",
+                    "oauth", "jwt", "admin", "payment", "billing", "upload", "middleware", "route", "controller",
+                    "handler", "api", "views", "sql", "db", "query")
+_LOW_PARTS = {"test", "tests", "spec", "specs", "__tests__", "fixtures", "examples", "example", "docs", "migrations"}
+
+def path_risk(path: str, size: int = 0) -> float:
+    """Risk guess from the path and size alone, 0-1, to choose which files to fetch before
+    any content is read: security-sensitive names, entry points, larger and shallower files."""
+    parts = [p for p in re.split(r"[/_.\-]+", path.lower()) if p]
+    stem = path.rsplit("/", 1)[-1].lower().split(".")[0]
+    score = (0.45 * any(p.startswith(_SENSITIVE_PARTS) for p in parts)
+             + 0.25 * (stem in _ENTRY_NAMES)
+             + 0.15 * min(1.0, (size or 0) / 20000)
+             + 0.15 * max(0.0, 1 - path.count("/") / 6))
+    if _LOW_PARTS.intersection(parts) or stem.startswith("test"):
+        score *= 0.2   # tests, docs and examples rank behind any source file
+    return round(score, 3)
+
+def fetch_order(path: str, size: int = 0) -> Tuple[float, str]:
+    # sort key for tree entries ahead of the MAX_FILES cut; plain path order when analysis is off
+    return (-path_risk(path, size) if STATIC_ANALYSIS else 0.0), path
+
+def _dotted(node: ast.AST) -> str:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        base = _dotted(node.value)
+        return f"{base}.{node.attr}" if base else node.attr
+    return ""
+
+def _sql_built(node: ast.AST) -> bool:
+    # SQL text assembled from values: f-strings, % / + on literals, or "...".format()
+    if isinstance(node, ast.JoinedStr):
+        text = "".join(v.value for v in node.values if isinstance(v, ast.Constant) and isinstance(v.value, str))
+        return any(isinstance(v, ast.FormattedValue) for v in node.values) and bool(_SQL.search(text))
+    if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Mod, ast.Add)):
+        side = node.left
+        return isinstance(side, ast.Constant) and isinstance(side.value, str) and bool(_SQL.search(side.value))
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == "format":
+        base = node.func.value
+        return isinstance(base, ast.Constant) and isinstance(base.value, str) and bool(_SQL.search(base.value))
+    return False
+
+def _python(sig: FileSignals, text: str, partial: bool = False):
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        # a preview head is cut at an arbitrary byte, so failing to parse says nothing about the file
+        sig.parsed = None if partial else False
+        _generic(sig, text)
+        return
+    sig.parsed = None if partial else True
+    risky = set()
+    for node in ast.walk(tree):
+        if isinstance(node, _PY_BRANCHES):
+            sig.complexity += 1
+        elif isinstance(node, ast.BoolOp):
+            sig.complexity += len(node.values) - 1
+        if isinstance(node, ast.Call):
+            name = _dotted(node.func)
+            if name in _PY_RISKY_CALLS:
+                risky.add(_PY_RISKY_CALLS[name])
+            if any(k.arg == "shell" and isinstance(k.value, ast.Constant) and k.value.value is True
+                   for k in node.keywords):
+                risky.add("shell")
+            if name.rsplit(".", 1)[-1] in _APP_FACTORIES or name in ("uvicorn.run", "app.run"):
+                sig.entry_point = True
+        elif isinstance(node, ast.If) and "__name__" in ast.dump(node.test) and "__main__" in ast.dump(node.test):
+            sig.entry_point = True
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            # HTTP handlers and CLI commands take untrusted input
+            for dec in node.decorator_list:
+                target = _dotted(dec.func if isinstance(dec, ast.Call) else dec)
+                if target.rsplit(".", 1)[-1] in ("get", "post", "put", "patch", "delete", "route", "command",
+                                                 "websocket"):
+                    sig.entry_point = True
+        if _sql_built(node):
+            risky.add("sql string")
+    sig.risky = sorted(risky)
+
+def _generic(sig: FileSignals, text: str):
+    sig.complexity += len(_BRANCH.findall(text))
+    sig.risky = sorted({label for pattern, label in _RISKY if pattern.search(text)} | set(sig.risky))
+    if _ENTRY.search(text):
+        sig.entry_point = True
+
+def analyze_text(path: str, text: str, code: bool = True, partial: bool = False) -> FileSignals:
+    """Cheap local signals for one file; pure, so it can run in a worker process.
+
+    `partial` text is only the head of the file: it gets no parse signal and no size term.
+    """
+    sig = FileSignals(path, lines=text.count("\n") + (not text.endswith("\n") and bool(text)))
+    name = path.rsplit("/", 1)[-1].lower()
+    stem, _, ext = name.rpartition(".")
+    if stem.split(".")[0] in _ENTRY_NAMES:
+        sig.entry_point = True
+    if ext == "py":
+        _python(sig, text, partial)
+    elif ext == "json" and not partial:
+        try:
+            json.loads(text)
+            sig.parsed = True
+        except ValueError:
+            sig.parsed = False
+    elif code:
+        _generic(sig, text)
+    sig.risk = _score(sig, code, partial)
+    return sig
+
+def _score(sig: FileSignals, code: bool, partial: bool = False) -> float:
+    score = (0.1
+             + 0.3 * min(1.0, (sig.complexity - 1) / 40)
+             + 0.25 * min(1.0, len(sig.risky) / 2)
+             + 0.15 * sig.entry_point
+             + 0.1 * (sig.parsed is False)
+             + (0.0 if partial else 0.1 * min(1.0, sig.lines / 500)))
+    return round(min(1.0, score) * (1.0 if code else 0.5), 3)
+
+def _analyze_batch(batch: List[Tuple[str, str, bool, bool]]) -> List[FileSignals]:
+    return [analyze_text(path, text, code, partial) for path, text, code, partial in batch]
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: the server process has threads, which fork does not copy safely
+        _pool = ProcessPoolExecutor(ANALYSIS_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+async def _run(batch: List[Tuple[str, str, bool, bool]]) -> List[FileSignals]:
+    total = sum(len(text) for _, text, _, _ in batch)
+    if ANALYSIS_WORKERS <= 0 or total < ANALYSIS_MIN_BYTES:
+        return await asyncio.to_thread(_analyze_batch, batch)
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    chunks = [batch[i::ANALYSIS_WORKERS * 2] for i in range(ANALYSIS_WORKERS * 2)]
+    results = await asyncio.gather(*(loop.run_in_executor(pool, _analyze_batch, c) for c in chunks if c))
+    return [s for part in results for s in part]
+
+async def analyze_files(files: List[RepoFile]) -> List[RepoFile]:
+    """Score fetched files and return them riskiest first, each with `risk` and `notes` set.
+
+    Partial files are scored on their preview. Files without content keep their place at the end.
+    """
+    if not STATIC_ANALYSIS:
+        return files
+    signals: Dict[str, FileSignals] = {}
+    todo = []
+    for f in files:
+        if f.content is None:
+            continue
+        hit = _cache.get((f.sha, f.path)) if f.sha and not f.partial else None
+        if hit is not None:
+            _cache.move_to_end((f.sha, f.path))
+            signals[f.path] = hit
+        else:
+            todo.append((f.path, f.content, f.code, f.partial))
+    if todo:
+        for sig in await _run(todo):
+            signals[sig.path] = sig
+        for f in files:
+            if f.sha and not f.partial and f.path in signals:
+                _cache[(f.sha, f.path)] = signals[f.path]
+        while len(_cache) > _CACHE_MAX:
+            _cache.popitem(last=False)
+    scored = [replace(f, risk=signals[f.path].risk, notes=signals[f.path].notes()) if f.path in signals else f
+              for f in files]
+    return sorted(scored, key=lambda f: -(f.risk or 0.0))
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
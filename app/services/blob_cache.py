@@ -0,0 +1,183 @@
+import os, asyncio, logging, threading
+from collections import OrderedDict
+from typing import Optional
+from app.config import BLOB_CACHE_DIR, BLOB_CACHE_MEMORY_BYTES, BLOB_CACHE_DISK_BYTES
+
+logger = logging.getLogger(__name__)
+
+class BlobCache:
+    """Two-tier cache of decoded file text keyed by git blob SHA.
+
+    Blob SHAs are content hashes, so entries never go stale; both tiers are only
+    bounded by size and evict least-recently-used entries first. The disk index is
+    built on first disk access; async callers use `aget`/`aput`, which keep disk I/O
+    off the event loop.
+    """
+
+    def __init__(self, directory: Optional[str], memory_bytes: int, disk_bytes: int):
+        self.directory = directory or None
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._mem: "OrderedDict[str, str]" = OrderedDict()
+        self._mem_size = 0
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_size = 0
+        self._lock = threading.Lock()
+        self._index_lock = threading.Lock()
+        self._indexed = not self.directory
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0,
+                       "memory_evictions": 0, "disk_evictions": 0}
+
+    def _path(self, sha: str) -> str:
+        return os.path.join(self.directory, sha[:2], sha)
+
+    def load_index(self):
+        """Rebuild the disk LRU from mtimes so the bound survives restarts. Runs once; it
+        walks the whole cache directory, so call it off the event loop."""
+        if self._indexed:
+            return
+        with self._index_lock:
+            if self._indexed:
+                return
+            entries = []
+            for root, _, names in os.walk(self.directory):
+                for name in names:
+                    if name.endswith(".tmp"):
+                        continue
+                    try:
+                        st = os.stat(os.path.join(root, name))
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, name, st.st_size))
+            with self._lock:
+                disk = OrderedDict((sha, size) for _, sha, size in sorted(entries) if sha not in self._disk)
+                disk.update(self._disk)   # written since start-up, so most recent
+                self._disk, self._disk_size = disk, sum(disk.values())
+                self._indexed = True
+                evicted = self._evict_disk()
+            self._remove(evicted)
+
+    def get(self, sha: str) -> Optional[str]:
+        text = self._get_memory(sha)
+        return text if text is not None else self._get_disk(sha)
+
+    async def aget(self, sha: str) -> Optional[str]:
+        text = self._get_memory(sha)
+        if text is not None or not self.directory:
+            return text if text is not None else self._get_disk(sha)
+        return await asyncio.to_thread(self._get_disk, sha)
+
+    def put(self, sha: str, text: str):
+        if self._put(sha, text):
+            self._write_disk(sha, text)
+
+    async def aput(self, sha: str, text: str):
+        if self._put(sha, text):
+            await asyncio.to_thread(self._write_disk, sha, text)
+
+    def _get_memory(self, sha: str) -> Optional[str]:
+        with self._lock:
+            text = self._mem.get(sha)
+            if text is not None:
+                self._mem.move_to_end(sha)
+                self._stats["memory_hits"] += 1
+            return text
+
+    def _get_disk(self, sha: str) -> Optional[str]:
+        self.load_index()
+        with self._lock:
+            if sha not in self._disk:
+                self._stats["misses"] += 1
+                return None
+        try:
+            with open(self._path(sha), encoding="utf-8") as f:
+                text = f.read()
+            os.utime(self._path(sha))
+        except OSError:
+            with self._lock:
+                self._drop_disk(sha)
+                self._stats["misses"] += 1
+            return None
+        with self._lock:
+            if sha in self._disk:
+                self._disk.move_to_end(sha)
+            self._stats["disk_hits"] += 1
+            self._put_memory(sha, text)
+        return text
+
+    def _put(self, sha: str, text: str) -> bool:
+        # memory tier; True when the blob still has to be written to disk
+        if not sha:
+            return False
+        with self._lock:
+            self._put_memory(sha, text)
+            return bool(self.directory) and sha not in self._disk
+
+    def _write_disk(self, sha: str, text: str):
+        self.load_index()
+        data = text.encode("utf-8")
+        if len(data) > self.disk_bytes:
+            return
+        path = self._path(sha)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning("Blob cache write failed for %s: %s", sha, e)
+            return
+        with self._lock:
+            if sha not in self._disk:
+                self._disk[sha] = len(data)
+                self._disk_size += len(data)
+            evicted = self._evict_disk()
+        self._remove(evicted)
+
+    def _evict_disk(self):
+        evicted = []
+        while self._disk_size > self.disk_bytes and self._disk:
+            old = next(iter(self._disk))
+            self._drop_disk(old)
+            self._stats["disk_evictions"] += 1
+            evicted.append(old)
+        return evicted
+
+    def _remove(self, shas):
+        for sha in shas:
+            try:
+                os.remove(self._path(sha))
+            except OSError:
+                pass
+
+    def _put_memory(self, sha: str, text: str):
+        size = len(text)
+        if size > self.memory_bytes:
+            return
+        if sha in self._mem:
+            self._mem.move_to_end(sha)
+            return
+        self._mem[sha] = text
+        self._mem_size += size
+        while self._mem_size > self.memory_bytes:
+            _, old = self._mem.popitem(last=False)
+            self._mem_size -= len(old)
+            self._stats["memory_evictions"] += 1
+
+    def _drop_disk(self, sha: str):
+        size = self._disk.pop(sha, None)
+        if size is not None:
+            self._disk_size -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._stats,
+                "memory_entries": len(self._mem),
+                "memory_bytes": self._mem_size,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_size,
+            }
+
+blob_cache = BlobCache(BLOB_CACHE_DIR, BLOB_CACHE_MEMORY_BYTES, BLOB_CACHE_DISK_BYTES)
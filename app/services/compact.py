@@ -0,0 +1,92 @@
+import re, hashlib
+from dataclasses import replace
+from typing import Dict, List, Optional, Tuple
+from app.config import PROMPT_COMPACTION, COMPACT_STRIP
+from app.models import CompactionReport
+from app.services.packer import RepoFile, estimate_tokens
+
+_LOCKFILES = {
+    "package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml", "composer.lock", "gemfile.lock",
+    "cargo.lock", "poetry.lock", "pipfile.lock", "go.sum", "packages.lock.json", "bun.lockb",
+}
+_MINIFIED_NAME = re.compile(r"[.-]min\.(?:js|css|mjs)$|\.bundle\.js$|\.chunk\.js$")
+_GENERATED = re.compile(r"@generated|do not edit|code generated|auto-?generated|generated by\b", re.I)
+_COMMENT = re.compile(r"^\s*(?:#|//|/\*|\*|--|;|<!--)")
+_LICENSE = re.compile(r"licen[sc]e|copyright|spdx-license-identifier|\(c\)", re.I)
+_MINIFIED_AVG_LINE = 300      # characters per line that no hand-written source reaches
+_BANNER_MIN_LINES = 3
+
+def skip_reason(path: str, text: str) -> Optional[str]:
+    """Why a file is not worth prompt tokens: lockfile, minified or generated; None to keep it."""
+    name = path.rsplit("/", 1)[-1].lower()
+    if name in _LOCKFILES or name.endswith(".lock"):
+        return "lockfile"
+    head = text[:2000]
+    if name.endswith(".json") and ('"lockfileVersion"' in head or head.count('"integrity"') >= 5):
+        return "lockfile"
+    if _MINIFIED_NAME.search(name):
+        return "minified"
+    if name.endswith(".md"):
+        return None   # prose: long lines and "generated by" mentions are normal there
+    lines = text.count("\n") + 1
+    if len(text) > 1000 and len(text) / lines > _MINIFIED_AVG_LINE:
+        return "minified"
+    if any(_COMMENT.match(line) and _GENERATED.search(line) for line in head.splitlines()[:5]):
+        return "generated"
+    return None
+
+def strip_text(text: str) -> str:
+    """Drop trailing whitespace and a leading license banner without moving any line.
+
+    The banner's first line becomes a short marker and the rest become empty lines, so
+    line N of the result is still line N of the file and finding line numbers stay right.
+    """
+    lines = text.split("\n")
+    start = 1 if lines[0].startswith("#!") else 0
+    end = start
+    while end < len(lines) and _COMMENT.match(lines[end]):
+        end += 1
+    if end < len(lines) and lines[end].rstrip().endswith("*/"):
+        end += 1
+    block = lines[start:end]
+    if len(block) >= _BANNER_MIN_LINES and any(_LICENSE.search(line) for line in block):
+        lines[start:end] = [f"(license header, lines {start + 1}-{end}, omitted)"] + [""] * (len(block) - 1)
+    return "\n".join(line.rstrip() for line in lines)
+
+def compact_files(files: List[RepoFile]) -> Tuple[List[RepoFile], CompactionReport]:
+    """Prepare fetched files for packing: fold identical blobs into their first path, skip
+    lockfiles and minified or generated files, and optionally strip banners/whitespace.
+    Order is kept; files without content pass through untouched."""
+    report = CompactionReport()
+    if not PROMPT_COMPACTION:
+        return files, report
+    kept: List[RepoFile] = []
+    first: Dict[str, int] = {}
+    for f in files:
+        if f.content is None:
+            kept.append(f)
+            continue
+        report.tokens_before += estimate_tokens(f.content)
+        reason = skip_reason(f.path, f.content)
+        if reason:
+            report.skipped[f.path] = reason
+            continue
+        # the blob SHA is a content hash; files fetched without one are hashed here
+        key = f"{f.sha or hashlib.sha1(f.content.encode('utf-8')).hexdigest()}:{f.partial}"
+        if key in first:
+            report.duplicates.setdefault(kept[first[key]].path, []).append(f.path)
+            continue
+        first[key] = len(kept)
+        text = strip_text(f.content) if COMPACT_STRIP else f.content
+        if text != f.content:
+            report.stripped_files += 1
+            f = replace(f, content=text)
+        report.tokens_after += estimate_tokens(text)
+        kept.append(f)
+    index = {f.path: i for i, f in enumerate(kept)}
+    for path, copies in report.duplicates.items():
+        i = index[path]
+        note = "identical at " + ", ".join(f"`{p}`" for p in copies)
+        kept[i] = replace(kept[i], notes=f"{kept[i].notes}; {note}" if kept[i].notes else note)
+    report.tokens_saved = report.tokens_before - report.tokens_after
+    return kept, report
@@ -0,0 +1,28 @@
+import re
+from typing import List
+
+_HUNK = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@(.*)$")
+
+def render_patch(patch: str) -> str:
+    """Annotate a unified diff with new-file line numbers.
+
+    Added and context lines carry their line number in the head version, so findings can
+    point at real lines; removed lines are kept (unnumbered) for context.
+    """
+    out: List[str] = []
+    new_line = 0
+    for raw in patch.splitlines():
+        m = _HUNK.match(raw)
+        if m:
+            new_line = int(m.group(3))
+            out.append(raw)
+            continue
+        if raw.startswith("\\"):            # "\ No newline at end of file"
+            continue
+        mark, text = (raw[:1], raw[1:]) if raw else (" ", "")
+        if mark == "-":
+            out.append(f"-      | {text}")
+        else:
+            out.append(f"{'+' if mark == '+' else ' '}{new_line:>5} | {text}")
+            new_line += 1
+    return "\n".join(out) + "\n"
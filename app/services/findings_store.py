@@ -0,0 +1,81 @@
+import json, asyncio, hashlib, sqlite3, threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from app.config import FINDINGS_STORE, FINDINGS_MAX_ENTRIES, FINDINGS_DB_PATH
+
+class FindingsStore:
+    """Per-file review findings keyed by git blob SHA and review context.
+
+    A blob SHA pins the file's exact content, so findings recorded from a full review
+    still hold wherever the same blob turns up again, e.g. unchanged files in a PR.
+    Async callers use `aget_many`/`aput_many`, which run SQLite work in a worker thread.
+    """
+
+    def __init__(self, max_entries: int = FINDINGS_MAX_ENTRIES, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self._mem: "OrderedDict[Tuple[str, str], List[dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False) if path else None
+        self._stats = {"hits": 0, "misses": 0, "stored": 0}
+        if self._db:
+            with self._lock, self._db:
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS findings (sha TEXT, context TEXT, body TEXT, PRIMARY KEY (sha, context))"
+                )
+
+    @staticmethod
+    def context(assignment: str, level: str, model: str) -> str:
+        raw = json.dumps([assignment, level, model])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, sha: str, context: str) -> Optional[List[dict]]:
+        key = (sha, context)
+        with self._lock:
+            found = self._mem.get(key)
+            if found is not None:
+                self._mem.move_to_end(key)
+            elif self._db:
+                row = self._db.execute("SELECT body FROM findings WHERE sha = ? AND context = ?", key).fetchone()
+                if row:
+                    found = json.loads(row[0])
+                    self._put_memory(key, found)
+            self._stats["hits" if found is not None else "misses"] += 1
+            return [dict(f) for f in found] if found is not None else None
+
+    def get_many(self, shas: List[str], context: str) -> Dict[str, List[dict]]:
+        found = {sha: self.get(sha, context) for sha in shas}
+        return {sha: f for sha, f in found.items() if f is not None}
+
+    async def aget_many(self, shas: List[str], context: str) -> Dict[str, List[dict]]:
+        if not self._db:
+            return self.get_many(shas, context)
+        return await asyncio.to_thread(self.get_many, shas, context)
+
+    async def aput_many(self, context: str, by_sha: Dict[str, List[dict]]):
+        if not self._db:
+            return self.put_many(context, by_sha)
+        await asyncio.to_thread(self.put_many, context, by_sha)
+
+    def put_many(self, context: str, by_sha: Dict[str, List[dict]]):
+        with self._lock:
+            for sha, findings in by_sha.items():
+                self._put_memory((sha, context), findings)
+            self._stats["stored"] += len(by_sha)
+            if self._db:
+                with self._db:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO findings (sha, context, body) VALUES (?, ?, ?)",
+                        [(sha, context, json.dumps(f)) for sha, f in by_sha.items()],
+                    )
+
+    def _put_memory(self, key: Tuple[str, str], findings: List[dict]):
+        self._mem[key] = findings
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "entries": len(self._mem)}
+
+findings_store = FindingsStore(path=FINDINGS_DB_PATH if FINDINGS_STORE == "sqlite" else None)
@@ -0,0 +1,153 @@
+import math, time, asyncio, logging
+from dataclasses import dataclass
+from typing import List, Optional
+from urllib.parse import urlparse
+import httpx
+from fastapi import HTTPException
+from app.config import (
+    GITHUB_API_URL, GITHUB_TOKENS, GITHUB_RATE_LIMIT_MAX_WAIT, GITHUB_RATE_LIMIT_RETRIES,
+    GITHUB_THROTTLE_BELOW, GITHUB_THROTTLE_MAX_DELAY,
+)
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class TokenBudget:
+    token: Optional[str]
+    limit: Optional[int] = None        # unknown until GitHub answers
+    remaining: Optional[int] = None
+    reset_at: float = 0.0              # epoch seconds, from X-RateLimit-Reset
+    blocked_until: float = 0.0         # secondary limits / Retry-After
+    next_at: float = 0.0               # pacing slot once the budget runs low
+    requests: int = 0
+
+    def available_at(self, now: float) -> float:
+        at = self.blocked_until
+        if self.remaining is not None and self.remaining <= 0 and self.reset_at > now:
+            at = max(at, self.reset_at)
+        return at
+
+    def refresh(self, now: float):
+        if self.reset_at and now >= self.reset_at and self.limit is not None:
+            self.remaining, self.reset_at = self.limit, 0.0
+
+    def reserve(self, now: float, throttle_below: float, max_delay: float) -> float:
+        """Take one request from the budget; returns how long to pause to spread the rest."""
+        self.requests += 1
+        if self.remaining is None:
+            return 0.0
+        self.remaining -= 1   # optimistic; the response headers correct it
+        if not self.limit or self.remaining >= self.limit * throttle_below or self.reset_at <= now:
+            return 0.0
+        interval = (self.reset_at - now) / max(self.remaining, 1)
+        start = max(now, self.next_at)
+        self.next_at = start + min(interval, max_delay)
+        return min(start - now, max_delay)
+
+class TokenPool:
+    """Per-token GitHub rate-limit budgets.
+
+    Requests go to the token with the most budget left. Low budgets are paced toward their
+    reset time, and when every token is exhausted callers wait (up to `max_wait`) rather
+    than fail.
+    """
+
+    def __init__(self, tokens: List[str], max_wait: float = GITHUB_RATE_LIMIT_MAX_WAIT,
+                 throttle_below: float = GITHUB_THROTTLE_BELOW, max_delay: float = GITHUB_THROTTLE_MAX_DELAY):
+        self.budgets = [TokenBudget(t) for t in tokens] or [TokenBudget(None)]
+        self.max_wait = max_wait
+        self.throttle_below = throttle_below
+        self.max_delay = max_delay
+        self._stats = {"requests": 0, "throttled": 0, "queued": 0, "rate_limited": 0}
+
+    async def acquire(self) -> TokenBudget:
+        waited = 0.0
+        while True:
+            now = time.time()
+            for b in self.budgets:
+                b.refresh(now)
+            ready = [b for b in self.budgets if b.available_at(now) <= now]
+            if ready:
+                budget = max(ready, key=lambda b: math.inf if b.remaining is None else b.remaining)
+                self._stats["requests"] += 1
+                delay = budget.reserve(now, self.throttle_below, self.max_delay)
+                if delay > 0:
+                    self._stats["throttled"] += 1
+                    await asyncio.sleep(delay)
+                return budget
+            wait = min(b.available_at(now) for b in self.budgets) - now
+            if waited + wait > self.max_wait:
+                raise HTTPException(status_code=429, detail="GitHub rate limit exhausted",
+                                    headers={"Retry-After": str(math.ceil(wait))})
+            self._stats["queued"] += 1
+            logger.warning("GitHub rate limit exhausted on all tokens; waiting %.1fs", wait)
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def update(self, budget: TokenBudget, response: httpx.Response) -> bool:
+        """Record the budget headers; returns True when the response is a rate-limit refusal."""
+        h, now = response.headers, time.time()
+        if h.get("x-ratelimit-limit", "").isdigit():
+            budget.limit = int(h["x-ratelimit-limit"])
+        if h.get("x-ratelimit-remaining", "").isdigit():
+            budget.remaining = int(h["x-ratelimit-remaining"])
+        if h.get("x-ratelimit-reset", "").isdigit():
+            budget.reset_at = float(h["x-ratelimit-reset"])
+        retry_after = h.get("retry-after", "")
+        limited = response.status_code == 429 or (response.status_code == 403 and (
+            budget.remaining == 0 or bool(retry_after)))
+        if limited:
+            self._stats["rate_limited"] += 1
+            if retry_after.isdigit():
+                budget.blocked_until = now + int(retry_after)
+            elif budget.remaining == 0 and budget.reset_at > now:
+                budget.blocked_until = budget.reset_at
+            else:
+                budget.blocked_until = now + 60   # GitHub's advice for secondary limits without a hint
+        return limited
+
+    def stats(self) -> dict:
+        now = time.time()
+        return {
+            **self._stats,
+            "tokens": [{
+                "token": f"...{b.token[-4:]}" if b.token else "anonymous",
+                "limit": b.limit,
+                "remaining": b.remaining,
+                "reset_in": max(0, round(b.reset_at - now)) if b.reset_at else None,
+                "blocked_for": max(0, round(b.blocked_until - now)),
+                "requests": b.requests,
+            } for b in self.budgets],
+        }
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    """Sends GitHub API requests through a TokenPool; other hosts (raw downloads) pass through."""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, pool: TokenPool,
+                 retries: int = GITHUB_RATE_LIMIT_RETRIES, api_url: str = GITHUB_API_URL):
+        self.inner = inner
+        self.pool = pool
+        self.retries = retries
+        self.api_host = urlparse(api_url).netloc
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.url.netloc.decode("ascii") != self.api_host:
+            return await self.inner.handle_async_request(request)
+        attempt = 0
+        while True:
+            budget = await self.pool.acquire()
+            if budget.token:
+                request.headers["Authorization"] = f"token {budget.token}"
+            else:
+                request.headers.pop("Authorization", None)
+            response = await self.inner.handle_async_request(request)
+            if not self.pool.update(budget, response) or attempt >= self.retries:
+                return response
+            attempt += 1
+            await response.aclose()
+            logger.warning("GitHub rate limited %s; retry %d/%d", request.url.path, attempt, self.retries)
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+token_pool = TokenPool(GITHUB_TOKENS)
@@ -1,119 +1,580 @@
-import os, logging, base64, requests
+import logging, base64, codecs, asyncio, tarfile, zlib
+from collections import OrderedDict
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
 from urllib.parse import urlparse
+import httpx
 from fastapi import HTTPException
 from app.config import (
     ALLOWED_EXTS, SECONDARY_EXTS, IGNORE_DIRS,
-    MAX_FILE_BYTES, MAX_TOTAL_BYTES, MAX_FILES, PREVIEW_LINES, DEFAULT_REF
+    MAX_FILE_BYTES, MAX_TOTAL_BYTES, MAX_FILES, DEFAULT_REF,
+    GITHUB_API_URL, FETCH_CONCURRENCY, FETCH_TIMEOUT,
+    INGEST_MODE, TARBALL_MIN_FILES, TARBALL_MAX_REPO_BYTES, ETAG_CACHE_ENTRIES,
+    PREVIEW_FETCH, PREVIEW_LINES, PREVIEW_MAX_CHARS,
 )
+from app.services.tarball import TarStreamReader
+from app.services.github_ratelimit import RateLimitedTransport, token_pool
+from app.services.metrics import span, GITHUB_REQUESTS, GITHUB_BYTES
+from app.services.pathmatch import PathMatcher, default_patterns, vendored_patterns
+from app.services.tree import RepoTree, TreeStreamParser
+from app.services.blob_cache import blob_cache
+from app.services.analysis import fetch_order
+from app.services.packer import RepoFile, plan_upgrades
 
 logger = logging.getLogger(__name__)
-TOKEN = os.getenv("GITHUB_TOKEN")
+_client: Optional[httpx.AsyncClient] = None
+_etags: "OrderedDict[str, tuple]" = OrderedDict()
+_trees: "OrderedDict[str, Tuple[str, RepoTree]]" = OrderedDict()   # parsed trees by URL, with ETag
+_matchers: "OrderedDict[tuple, PathMatcher]" = OrderedDict()       # by (.gitignore, .gitattributes) blob SHAs
+_default_matcher = PathMatcher(default_patterns(IGNORE_DIRS))
 
-def _headers():
-    return {"Authorization": f"token {TOKEN}"} if TOKEN else {}
+class RepoUrl(NamedTuple):
+    owner: str
+    repo: str
+    ref: str
+    base: Optional[str] = None   # compare URLs: base...ref
+    pull: Optional[int] = None   # pull request number
 
-def _parse_repo(url: str):
+class RepoTarget(NamedTuple):
+    owner: str
+    repo: str
+    ref: str
+    sha: str
+
+class DiffTarget(NamedTuple):
+    owner: str
+    repo: str
+    base_sha: str
+    head_sha: str
+
+class DiffFile(NamedTuple):
+    path: str
+    status: str                  # added | modified | renamed | ...
+    sha: Optional[str]           # blob SHA on the head side
+    additions: int
+    deletions: int
+    patch: Optional[str]         # unified diff hunks; None for binary or very large diffs
+    code: bool = True
+
+_API_HOST = httpx.URL(GITHUB_API_URL).host
+
+def _request_kind(url: httpx.URL) -> str:
+    if url.host != _API_HOST:
+        return "raw"   # download_url / codeload redirects
+    path = url.path
+    for kind in ("tarball", "contents", "git/trees", "commits", "pulls", "compare"):
+        if f"/{kind}/" in path:
+            return kind.replace("git/", "")
+    return "meta"
+
+async def _record_response(response: httpx.Response):
+    kind = _request_kind(response.request.url)
+    GITHUB_REQUESTS.inc(kind=kind, status=response.status_code)
+    # tarballs and ranged previews are streamed and may stop early, so they count what they read
+    if kind != "tarball" and "range" not in response.request.headers and response.headers.get("content-length", "").isdigit():
+        GITHUB_BYTES.inc(int(response.headers["content-length"]), kind=kind)
+
+def _get_client() -> httpx.AsyncClient:
+    # one pooled client per process; keep-alive connections are reused across reviews and
+    # every API call is routed through the token pool, which sets Authorization per request
+    global _client
+    if _client is None:
+        transport = httpx.AsyncHTTPTransport(limits=httpx.Limits(
+            max_connections=FETCH_CONCURRENCY * 2, max_keepalive_connections=FETCH_CONCURRENCY,
+        ))
+        _client = httpx.AsyncClient(
+            transport=RateLimitedTransport(transport, token_pool),
+            timeout=FETCH_TIMEOUT,
+            follow_redirects=True,
+            event_hooks={"response": [_record_response]},
+        )
+    return _client
+
+async def prewarm(connect: bool = False):
+    client = _get_client()
+    await asyncio.to_thread(blob_cache.load_index)
+    if connect:
+        # /rate_limit is free of charge and also seeds the token pool's budgets
+        await client.get(f"{GITHUB_API_URL}/rate_limit")
+
+async def aclose():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+async def _conditional_get(client: httpx.AsyncClient, url: str, **kwargs) -> httpx.Response:
+    # Revalidate with If-None-Match; GitHub does not count 304s against the rate limit.
+    key = str(httpx.URL(url, params=kwargs.get("params")))
+    cached = _etags.get(key)
+    headers = dict(kwargs.pop("headers", None) or {})
+    if cached:
+        headers["If-None-Match"] = cached[0]
+    r = await client.get(url, headers=headers, **kwargs)
+    if r.status_code == 304 and cached:
+        _etags.move_to_end(key)
+        return httpx.Response(200, content=cached[1], headers={"content-type": cached[2]}, request=r.request)
+    if r.status_code == 200 and r.headers.get("etag"):
+        _etags[key] = (r.headers["etag"], r.content, r.headers.get("content-type", ""))
+        _etags.move_to_end(key)
+        while len(_etags) > ETAG_CACHE_ENTRIES:
+            _etags.popitem(last=False)
+    return r
+
+def _parse_repo(url: str) -> RepoUrl:
+    # understands /tree/<ref>, /commit/<sha>, /compare/<base>...<head> and /pull/<n>
     if not url.startswith("https://github.com/"):
         raise HTTPException(status_code=422, detail="Invalid GitHub URL")
     parts = urlparse(url).path.strip("/").split("/")
     if len(parts) < 2:
         raise HTTPException(status_code=422, detail="Invalid GitHub URL")
     owner, repo = parts[0], parts[1]
-    ref = DEFAULT_REF
-    if len(parts) >= 4 and parts[2] == "tree":
-        ref = parts[3]
-    return owner, repo, ref
+    if repo.endswith(".git"):
+        repo = repo[:-4]
+    kind, rest = (parts[2], "/".join(parts[3:])) if len(parts) >= 4 else (None, "")
+    if kind in ("tree", "commit"):
+        return RepoUrl(owner, repo, rest)   # may still carry a subdirectory; see _resolve_url_ref
+    if kind == "compare":
+        base, sep, head = rest.partition("...")
+        if not sep or not base or not head:
+            raise HTTPException(status_code=422, detail="Compare URL must look like /compare/<base>...<head>")
+        return RepoUrl(owner, repo, head, base=base)
+    if kind == "pull":
+        if not parts[3].isdigit():
+            raise HTTPException(status_code=422, detail="Invalid pull request URL")
+        return RepoUrl(owner, repo, DEFAULT_REF, pull=int(parts[3]))
+    return RepoUrl(owner, repo, DEFAULT_REF)
+
+def is_diff_url(url: str) -> bool:
+    parsed = _parse_repo(url)
+    return parsed.base is not None or parsed.pull is not None
 
-def _is_ignored(path: str) -> bool:
-    return any(path.startswith(d) for d in IGNORE_DIRS)
+def _is_ignored(path: str, matcher: PathMatcher = _default_matcher) -> bool:
+    return matcher.ignored(path)
 
 def _ext(path: str) -> str:
     i = path.rfind(".")
     return path[i:].lower() if i != -1 else ""
 
-def fetch_repo_and_generate_message(repo_url: str) -> str:
-    owner, repo, ref = _parse_repo(repo_url)
-
-    # existence check
-    meta = requests.get(f"https://api.github.com/repos/{owner}/{repo}", headers=_headers(), timeout=15)
-    if meta.status_code == 404:
-        raise HTTPException(status_code=404, detail="Repository not found")
-    if meta.status_code == 403:
-        raise HTTPException(status_code=429, detail="GitHub rate limit reached")
-    meta.raise_for_status()
-
-    # list tree
-    r = requests.get(
-        f"https://api.github.com/repos/{owner}/{repo}/git/trees/{ref}?recursive=1",
-        headers=_headers(), timeout=30
-    )
-    if r.status_code in (403, 404):
-        raise HTTPException(status_code=r.status_code, detail="Repo tree unavailable")
-    r.raise_for_status()
-    tree = r.json().get("tree", [])
-    if not tree:
-        raise HTTPException(status_code=204, detail="Repository empty")
+def _eligible(path: str, size: Optional[int], matcher: PathMatcher = _default_matcher) -> bool:
+    ext = _ext(path)
+    if ext not in ALLOWED_EXTS and ext not in SECONDARY_EXTS:
+        return False
+    return not (size and size > MAX_FILE_BYTES) and not matcher.ignored(path)
 
-    # filter candidates
-    candidates = []
-    for node in tree:
-        if node.get("type") != "blob":
-            continue
-        path = node["path"]
-        if _is_ignored(path):
+def _candidates(tree: RepoTree, matcher: PathMatcher) -> Tuple[List[int], List[int]]:
+    # one pass, cheapest checks first: size, then extension, then the ignore rules
+    code, secondary = [], []
+    for i, path in enumerate(tree.paths):
+        if tree.sizes[i] > MAX_FILE_BYTES:
             continue
         ext = _ext(path)
-        if ext in ALLOWED_EXTS or ext in SECONDARY_EXTS:
-            if node.get("size") and node["size"] > MAX_FILE_BYTES:
-                continue
-            candidates.append(node)
+        bucket = code if ext in ALLOWED_EXTS else secondary if ext in SECONDARY_EXTS else None
+        if bucket is not None and not matcher.ignored(path):
+            bucket.append(i)
+    return code, secondary
 
-    if not candidates:
-        return "# Repository Files\n*(no eligible files matched)*"
+async def _get_tree(client: httpx.AsyncClient, owner: str, repo: str, sha: str, recursive: bool = True) -> RepoTree:
+    # streamed into a compact RepoTree; revalidated with the ETag like other metadata
+    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/git/trees/{sha}"
+    params = {"recursive": 1} if recursive else None
+    key = str(httpx.URL(url, params=params))
+    cached = _trees.get(key)
+    headers = {"If-None-Match": cached[0]} if cached else {}
+    async with client.stream("GET", url, params=params, headers=headers) as r:
+        if r.status_code == 304 and cached:
+            _trees.move_to_end(key)
+            return cached[1]
+        if r.status_code in (403, 404):
+            raise HTTPException(status_code=r.status_code, detail="Repo tree unavailable")
+        r.raise_for_status()
+        parser = TreeStreamParser()
+        async for chunk in r.aiter_bytes():
+            parser.feed(chunk)
+        tree = parser.close()
+        etag = r.headers.get("etag")
+    if etag:
+        _trees[key] = (etag, tree)
+        _trees.move_to_end(key)
+        while len(_trees) > ETAG_CACHE_ENTRIES:
+            _trees.popitem(last=False)
+    return tree
 
-    # prioritize code
-    code = [n for n in candidates if _ext(n["path"]) in ALLOWED_EXTS]
-    meta_files = [n for n in candidates if _ext(n["path"]) in SECONDARY_EXTS]
-    ordered = sorted(code, key=lambda n: n["path"]) + sorted(meta_files, key=lambda n: n["path"])
+async def _repo_matcher(client: httpx.AsyncClient, owner: str, repo: str, ref: str, tree: RepoTree) -> PathMatcher:
+    # the default rules plus the repo's root .gitignore and linguist-vendored/-generated attributes
+    found = {p: i for i, p in enumerate(tree.paths) if p in (".gitignore", ".gitattributes")}
+    if not found:
+        return _default_matcher
+    key = tuple(tree.shas[found[n]] if n in found else None for n in (".gitignore", ".gitattributes"))
+    if None not in key and key in _matchers:
+        _matchers.move_to_end(key)
+        return _matchers[key]
+    sem = asyncio.Semaphore(2)
+    names = list(found)
+    texts = await asyncio.gather(*(_fetch_file(client, sem, owner, repo, ref, tree.node(found[n])) for n in names))
+    files = dict(zip(names, (t or "" for t in texts)))
+    matcher = PathMatcher(default_patterns(IGNORE_DIRS) + files.get(".gitignore", "").splitlines()
+                          + vendored_patterns(files.get(".gitattributes", "")))
+    _matchers[key] = matcher
+    while len(_matchers) > 64:
+        _matchers.popitem(last=False)
+    return matcher
 
-    # fetch previews
-    total_bytes, included = 0, 0
-    lines = ["# Repository Files"]
-    session = requests.Session(); session.headers.update(_headers())
+async def _walk_tree(client: httpx.AsyncClient, owner: str, repo: str, sha: str) -> Tuple[RepoTree, PathMatcher]:
+    """Rebuild a tree GitHub truncated: list the root, then fetch the subtrees in parallel,
+    skipping ignored directories without listing them."""
+    root = await _get_tree(client, owner, repo, sha, recursive=False)
+    matcher = await _repo_matcher(client, owner, repo, sha, root)
+    out = RepoTree()
+    out.extend(root)
+    sem = asyncio.Semaphore(FETCH_CONCURRENCY)
 
-    for node in ordered:
-        if included >= MAX_FILES or total_bytes >= MAX_TOTAL_BYTES:
-            lines.append(f"\n*(truncated: {included} files, {total_bytes} bytes)*")
-            break
+    async def walk(prefix: str, tree_sha: str):
+        async with sem:
+            sub = await _get_tree(client, owner, repo, tree_sha)
+            flat = sub.truncated
+            if flat:   # still too big: list this level and descend
+                sub = await _get_tree(client, owner, repo, tree_sha, recursive=False)
+        out.extend(sub, prefix)
+        if flat:
+            await asyncio.gather(*(walk(f"{prefix}{d}/", s) for d, s in sub.dirs
+                                   if not matcher.ignored(f"{prefix}{d}/")))
 
-        contents_url = f"https://api.github.com/repos/{owner}/{repo}/contents/{node['path']}?ref={ref}"
-        cr = session.get(contents_url, timeout=30)
+    await asyncio.gather(*(walk(f"{d}/", s) for d, s in root.dirs if not matcher.ignored(f"{d}/")))
+    return out, matcher
+
+async def _list_repo(client: httpx.AsyncClient, owner: str, repo: str, sha: str) -> Tuple[RepoTree, PathMatcher]:
+    tree = await _get_tree(client, owner, repo, sha)
+    if tree.truncated:
+        logger.info("Tree for %s/%s@%s is truncated; walking subtrees", owner, repo, sha[:12])
+        return await _walk_tree(client, owner, repo, sha)
+    return tree, await _repo_matcher(client, owner, repo, sha, tree)
+
+async def _fetch_file(client: httpx.AsyncClient, sem: asyncio.Semaphore,
+                      owner: str, repo: str, ref: str, node: dict) -> Optional[str]:
+    sha = node.get("sha")
+    if sha:
+        cached = await blob_cache.aget(sha)
+        if cached is not None:
+            return cached
+    content = await _download_file(client, sem, owner, repo, ref, node["path"])
+    if content is not None and sha:
+        await blob_cache.aput(sha, content)
+    return content
+
+async def _download_file(client: httpx.AsyncClient, sem: asyncio.Semaphore,
+                         owner: str, repo: str, ref: str, path: str) -> Optional[str]:
+    async with sem:
+        cr = await client.get(f"{GITHUB_API_URL}/repos/{owner}/{repo}/contents/{path}", params={"ref": ref})
         if cr.status_code in (403, 404):
-            continue
+            return None
         cr.raise_for_status()
         data = cr.json()
         size = data.get("size", 0)
         if size and size > MAX_FILE_BYTES:
-            continue
+            return None
 
         if data.get("encoding") == "base64" and "content" in data:
-            content = base64.b64decode(data["content"]).decode("utf-8", errors="replace")
+            return base64.b64decode(data["content"]).decode("utf-8", errors="replace")
+        if not data.get("download_url"):
+            return None
+        download = await client.get(data["download_url"])
+        download.raise_for_status()
+        return download.text
+
+def _preview_done(text: str, newlines: int) -> bool:
+    # enough for the packer's preview, and provably more than it: the PREVIEW_LINES-th newline
+    # has text after it, or the character cap is exceeded
+    return len(text) > PREVIEW_MAX_CHARS or newlines > PREVIEW_LINES or (
+        newlines == PREVIEW_LINES and not text.endswith("\n"))
+
+async def _download_preview(client: httpx.AsyncClient, sem: asyncio.Semaphore, owner: str, repo: str,
+                            ref: str, path: str) -> Optional[Tuple[str, bytes, bool]]:
+    """Stream raw file bytes until the preview is in hand: (text, raw bytes read, complete).
+
+    A Range header caps what the server sends; when it is ignored the stream is still
+    closed as soon as enough has arrived.
+    """
+    headers = {"Accept": "application/vnd.github.raw", "Range": f"bytes=0-{PREVIEW_MAX_CHARS * 4 - 1}"}
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    raw, text, newlines = bytearray(), "", 0
+    async with sem:
+        async with client.stream("GET", f"{GITHUB_API_URL}/repos/{owner}/{repo}/contents/{path}",
+                                 params={"ref": ref}, headers=headers) as r:
+            if r.status_code == 416:   # empty file
+                return "", b"", True
+            if r.status_code in (403, 404):
+                return None
+            r.raise_for_status()
+            # full size, to tell a preview that happens to hold the whole file from a cut-off one
+            total = r.headers.get("content-range", "").rpartition("/")[2] if r.status_code == 206 \
+                else r.headers.get("content-length", "")
+            total = int(total) if total.isdigit() else None
+            async for chunk in r.aiter_bytes():
+                raw += chunk
+                piece = decoder.decode(chunk)
+                newlines += piece.count("\n")
+                text += piece
+                if _preview_done(text, newlines) and (total is None or len(raw) < total):
+                    GITHUB_BYTES.inc(len(raw), kind="contents")
+                    return text, bytes(raw), False
+    GITHUB_BYTES.inc(len(raw), kind="contents")
+    return text + decoder.decode(b"", final=True), bytes(raw), True
+
+async def _download_rest(client: httpx.AsyncClient, sem: asyncio.Semaphore, owner: str, repo: str,
+                         ref: str, path: str, head: bytes) -> Optional[str]:
+    # continue a preview from where it stopped; a server without Range support sends it all
+    async with sem:
+        r = await client.get(f"{GITHUB_API_URL}/repos/{owner}/{repo}/contents/{path}", params={"ref": ref},
+                             headers={"Accept": "application/vnd.github.raw", "Range": f"bytes={len(head)}-"})
+    if r.status_code in (403, 404, 416):
+        return None
+    r.raise_for_status()
+    GITHUB_BYTES.inc(len(r.content), kind="contents")
+    data = head + r.content if r.status_code == 206 else r.content
+    return data.decode("utf-8", errors="replace")
+
+def _next_batch(ordered, start: int, included: int, total_bytes: int,
+                max_files: int = MAX_FILES, max_bytes: int = MAX_TOTAL_BYTES):
+    # Size the batch from tree metadata so a parallel round never fetches far past the caps:
+    # at most the remaining file slots, stopping at the node expected to cross the byte cap.
+    batch, budget = [], max_bytes - total_bytes
+    for node in ordered[start:start + max_files - included]:
+        batch.append(node)
+        budget -= node.get("size") or 0
+        if budget <= 0:
+            break
+    return batch
+
+async def _fetch_contents(client: httpx.AsyncClient, owner: str, repo: str, ref: str, ordered,
+                          max_files: int = MAX_FILES, max_bytes: int = MAX_TOTAL_BYTES,
+                          fetch: Callable = None) -> dict:
+    # per-file Contents API, in parallel batches until the caps are reached
+    fetch = fetch or _fetch_file
+    contents, pos, included, total_bytes = {}, 0, 0, 0
+    sem = asyncio.Semaphore(FETCH_CONCURRENCY)
+    while pos < len(ordered) and included < max_files and total_bytes < max_bytes:
+        batch = _next_batch(ordered, pos, included, total_bytes, max_files, max_bytes)
+        results = await asyncio.gather(*(
+            fetch(client, sem, owner, repo, ref, node) for node in batch
+        ))
+        for node, content in zip(batch, results):
+            pos += 1
+            if content is None:
+                continue
+            contents[node["path"]] = content
+            total_bytes += node.get("size") or len(content)
+            included += 1
+            if included >= max_files or total_bytes >= max_bytes:
+                break
+    return contents
+
+async def _fetch_previews(client: httpx.AsyncClient, owner: str, repo: str, ref: str, ordered, n_code: int,
+                          max_files: int, max_bytes: int, budget: int) -> Tuple[dict, set]:
+    """Contents mode for a known token budget: stream preview heads first, then fetch the
+    rest of only those files the packer will upgrade to whole files. Returns the contents
+    and the paths that are still previews."""
+    heads: Dict[str, bytes] = {}
+
+    async def fetch_preview(client, sem, owner, repo, ref, node) -> Optional[str]:
+        cached = await blob_cache.aget(node["sha"]) if node.get("sha") else None
+        if cached is not None:
+            return cached
+        got = await _download_preview(client, sem, owner, repo, ref, node["path"])
+        if got is None:
+            return None
+        text, raw, complete = got
+        if complete:
+            if node.get("sha"):
+                await blob_cache.aput(node["sha"], text)
         else:
-            if not data.get("download_url"):
+            heads[node["path"]] = raw
+        return text
+
+    contents = await _fetch_contents(client, owner, repo, ref, ordered, max_files, max_bytes, fetch_preview)
+    files = [RepoFile(n["path"], n["size"], contents.get(n["path"]), n["sha"], k < n_code, n["path"] in heads)
+             for k, n in enumerate(ordered)]
+    upgrades = plan_upgrades(files, budget)
+    if upgrades:
+        sem = asyncio.Semaphore(FETCH_CONCURRENCY)
+        full = await asyncio.gather(*(_download_rest(client, sem, owner, repo, ref, p, heads[p]) for p in upgrades))
+        shas = {n["path"]: n["sha"] for n in ordered}
+        for path, text in zip(upgrades, full):
+            if text is None:
                 continue
-            download = session.get(data["download_url"], timeout=30)
-            download.raise_for_status()
-            content = download.text
+            contents[path] = text
+            del heads[path]
+            if shas.get(path):
+                await blob_cache.aput(shas[path], text)
+    return contents, set(heads)
+
+async def _fetch_tarball(client: httpx.AsyncClient, owner: str, repo: str, ref: str, ordered,
+                         max_files: int = MAX_FILES, max_bytes: int = MAX_TOTAL_BYTES) -> dict:
+    # one streamed archive request; stop reading once every planned file has arrived
+    contents, shas = {}, {}
+    for node in _next_batch(ordered, 0, 0, 0, max_files, max_bytes):
+        cached = await blob_cache.aget(node["sha"]) if node.get("sha") else None
+        if cached is not None:
+            contents[node["path"]] = cached
+        else:
+            shas[node["path"]] = node.get("sha")
+    if not shas:
+        return contents
+
+    reader = TarStreamReader(lambda path, size: path in shas)
+    found = 0
+    async with client.stream("GET", f"{GITHUB_API_URL}/repos/{owner}/{repo}/tarball/{ref}") as r:
+        r.raise_for_status()
+        async for chunk in r.aiter_raw():
+            GITHUB_BYTES.inc(len(chunk), kind="tarball")   # streamed, so no Content-Length to read
+            for path, data in reader.feed(chunk):
+                contents[path] = data.decode("utf-8", errors="replace")
+                await blob_cache.aput(shas[path], contents[path])
+                found += 1
+            if reader.done or found == len(shas):
+                break
+    return contents
+
+def _use_tarball(repo_bytes: int, ordered, max_files: int = MAX_FILES) -> bool:
+    if INGEST_MODE != "auto":
+        return INGEST_MODE == "tarball"
+    return min(len(ordered), max_files) >= TARBALL_MIN_FILES and repo_bytes <= TARBALL_MAX_REPO_BYTES
+
+async def _check_repo(client: httpx.AsyncClient, owner: str, repo: str):
+    meta = await _conditional_get(client, f"{GITHUB_API_URL}/repos/{owner}/{repo}", timeout=15)
+    if meta.status_code == 404:
+        raise HTTPException(status_code=404, detail="Repository not found")
+    if meta.status_code == 403:
+        raise HTTPException(status_code=429, detail="GitHub rate limit reached")
+    meta.raise_for_status()
+
+async def _resolve_ref(client: httpx.AsyncClient, owner: str, repo: str, ref: str) -> str:
+    # pin the ref to a commit so caches key on content, not on a moving branch name
+    c = await _conditional_get(client, f"{GITHUB_API_URL}/repos/{owner}/{repo}/commits/{ref}",
+                               headers={"Accept": "application/vnd.github.sha"}, timeout=15)
+    if c.status_code in (404, 422):
+        raise HTTPException(status_code=404, detail=f"Ref not found: {ref}")
+    if c.status_code == 403:
+        raise HTTPException(status_code=429, detail="GitHub rate limit reached")
+    c.raise_for_status()
+    return c.text.strip()
+
+async def _resolve_url_ref(client: httpx.AsyncClient, owner: str, repo: str, path: str) -> Tuple[str, str]:
+    """(ref, sha) for a URL path such as `main/src/app` or `feature/x`.
 
-        byte_len = len(content.encode("utf-8"))
-        total_bytes += byte_len
-        included += 1
-        preview = "\n".join(content.splitlines()[:PREVIEW_LINES])
+    Branch names may contain slashes and /tree/ URLs may point into a subdirectory, so
+    prefixes are tried shortest first; git forbids a ref that is a prefix of another.
+    """
+    segments = path.split("/")
+    for i in range(1, len(segments) + 1):
+        ref = "/".join(segments[:i])
+        try:
+            return ref, await _resolve_ref(client, owner, repo, ref)
+        except HTTPException as e:
+            if e.status_code != 404 or i == len(segments):
+                raise
+    raise HTTPException(status_code=404, detail=f"Ref not found: {path}")
 
-        lines.append(f"- `{node['path']}` ({byte_len} bytes)")
-        lines.append("```")
-        lines.append(preview)
-        lines.append("```")
+async def resolve_repo(repo_url: str) -> RepoTarget:
+    parsed = _parse_repo(repo_url)
+    client = _get_client()
+    with span("github_meta"):
+        await _check_repo(client, parsed.owner, parsed.repo)  # existence check
+    with span("github_commit"):
+        ref, sha = await _resolve_url_ref(client, parsed.owner, parsed.repo, parsed.ref)
+    return RepoTarget(parsed.owner, parsed.repo, ref, sha)
 
-    return "\n".join(lines)
+async def resolve_diff(repo_url: str, base_ref: Optional[str] = None) -> DiffTarget:
+    parsed = _parse_repo(repo_url)
+    owner, repo = parsed.owner, parsed.repo
+    client = _get_client()
+    await _check_repo(client, owner, repo)
+    if parsed.pull is not None and not base_ref:
+        pr = await _conditional_get(client, f"{GITHUB_API_URL}/repos/{owner}/{repo}/pulls/{parsed.pull}", timeout=15)
+        if pr.status_code == 404:
+            raise HTTPException(status_code=404, detail=f"Pull request not found: #{parsed.pull}")
+        pr.raise_for_status()
+        data = pr.json()
+        # PR head commits are reachable from the base repo, forks included
+        return DiffTarget(owner, repo, data["base"]["sha"], data["head"]["sha"])
+    base = base_ref or parsed.base
+    if not base:
+        raise HTTPException(status_code=422, detail="Diff review needs base_ref, a compare URL or a PR URL")
+    base_sha, head_sha = await asyncio.gather(
+        _resolve_ref(client, owner, repo, base), _resolve_url_ref(client, owner, repo, parsed.ref),
+    )
+    return DiffTarget(owner, repo, base_sha, head_sha[1])
+
+async def fetch_diff(target: DiffTarget) -> Tuple[List[DiffFile], List[RepoFile]]:
+    """Changed eligible files between base and head, plus the unchanged eligible blobs at head.
+
+    Unchanged files come from the head tree without their content, so callers can look up
+    earlier results by blob SHA without downloading anything.
+    """
+    owner, repo = target.owner, target.repo
+    client = _get_client()
+    with span("github_compare"):
+        r = await _conditional_get(client, f"{GITHUB_API_URL}/repos/{owner}/{repo}/compare/{target.base_sha}...{target.head_sha}")
+    if r.status_code == 404:
+        raise HTTPException(status_code=404, detail="Compare unavailable for these refs")
+    r.raise_for_status()
+    changed = [
+        DiffFile(f["filename"], f.get("status", "modified"), f.get("sha"),
+                 f.get("additions", 0), f.get("deletions", 0), f.get("patch"), _ext(f["filename"]) in ALLOWED_EXTS)
+        for f in r.json().get("files", [])
+        if f.get("status") != "removed" and _eligible(f["filename"], None)
+    ]
+    touched = {f.path for f in changed}
 
+    with span("github_tree"):
+        tree, matcher = await _list_repo(client, owner, repo, target.head_sha)
+    changed = [f for f in changed if not matcher.ignored(f.path)]
+    code, secondary = _candidates(tree, matcher)
+    unchanged = [
+        RepoFile(tree.paths[i], tree.sizes[i], None, tree.shas[i], is_code)
+        for indices, is_code in ((code, True), (secondary, False)) for i in indices
+        if tree.paths[i] not in touched
+    ]
+    return changed, unchanged
+
+async def fetch_repo_files(repo_url: str, target: Optional[RepoTarget] = None,
+                           max_files: int = MAX_FILES, max_bytes: int = MAX_TOTAL_BYTES,
+                           budget: Optional[int] = None) -> List[RepoFile]:
+    """Eligible files at the pinned commit, code first, riskiest-looking paths first within each
+    group. With a token `budget` (single-pack reviews) Contents-mode files may come back as
+    partial previews."""
+    target = target or await resolve_repo(repo_url)
+    owner, repo, ref = target.owner, target.repo, target.sha  # fetch the pinned commit
+    client = _get_client()
+
+    # list tree
+    with span("github_tree"):
+        tree, matcher = await _list_repo(client, owner, repo, ref)
+    if not tree.paths and not tree.dirs:
+        raise HTTPException(status_code=204, detail="Repository empty")
+
+    # filter candidates, code first
+    code, secondary = _candidates(tree, matcher)
+    if not code and not secondary:
+        return []
+    by_path = lambda i: fetch_order(tree.paths[i], tree.sizes[i])   # likely-risky files first
+    ordered = [tree.node(i) for i in sorted(code, key=by_path) + sorted(secondary, key=by_path)]
+    n_code = len(code)
+
+    # fetch previews
+    partial = set()
+    with span("github_files"):
+        if _use_tarball(sum(tree.sizes), ordered, max_files):
+            try:
+                contents = await _fetch_tarball(client, owner, repo, ref, ordered, max_files, max_bytes)
+            except (httpx.HTTPError, OSError, ValueError, tarfile.TarError, zlib.error) as e:
+                logger.warning("Tarball ingestion failed for %s/%s (%s); using Contents API", owner, repo, e)
+                contents = await _fetch_contents(client, owner, repo, ref, ordered, max_files, max_bytes)
+        elif budget is not None and PREVIEW_FETCH:
+            contents, partial = await _fetch_previews(client, owner, repo, ref, ordered, n_code,
+                                                      max_files, max_bytes, budget)
+        else:
+            contents = await _fetch_contents(client, owner, repo, ref, ordered, max_files, max_bytes)
+    return [
+        RepoFile(n["path"], n["size"], contents.get(n["path"]), n["sha"], k < n_code, n["path"] in partial)
+        for k, n in enumerate(ordered)
+    ]
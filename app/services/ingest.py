@@ -0,0 +1,127 @@
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple, Type
+from fastapi import HTTPException
+from app.config import MAX_FILES, MAX_TOTAL_BYTES, MISTRAL_MODEL
+from app.services import github_service, local_repo, analysis
+from app.services.github_service import RepoTarget, DiffTarget, DiffFile
+from app.services.packer import RepoFile, pack_files, render_pack, context_budget
+from app.services.compact import compact_files
+from app.services.singleflight import ingest_flight
+from app.services.metrics import span
+
+class IngestBackend(ABC):
+    """Where repo content comes from. A backend claims the URLs it understands and turns one
+    into a pinned RepoTarget and then into RepoFiles; everything after that (packing,
+    prompts, caches) is shared, so every backend produces the same prompt format."""
+
+    name = ""
+
+    @abstractmethod
+    def handles(self, url: str) -> bool:
+        ...
+
+    @abstractmethod
+    def repo_key(self, url: str) -> Tuple[str, str]:
+        """(owner, repo) used to scope result-cache entries."""
+
+    @abstractmethod
+    async def resolve(self, url: str) -> RepoTarget:
+        ...
+
+    @abstractmethod
+    async def fetch_files(self, url: str, target: RepoTarget, max_files: int, max_bytes: int,
+                          budget: Optional[int] = None) -> List[RepoFile]:
+        """`budget` is the token budget of a single-pack review; backends may then return
+        partial previews (RepoFile.partial) for files that will not be sent whole."""
+
+    def supports_diff(self, url: str) -> bool:
+        return False
+
+class GitHubBackend(IngestBackend):
+    name = "github"
+
+    def handles(self, url: str) -> bool:
+        return url.startswith("https://github.com/")
+
+    def repo_key(self, url: str) -> Tuple[str, str]:
+        parsed = github_service._parse_repo(url)
+        return parsed.owner, parsed.repo
+
+    async def resolve(self, url: str) -> RepoTarget:
+        return await github_service.resolve_repo(url)
+
+    async def fetch_files(self, url, target, max_files, max_bytes, budget=None):
+        return await github_service.fetch_repo_files(url, target, max_files, max_bytes, budget)
+
+    def supports_diff(self, url: str) -> bool:
+        return True
+
+class LocalBackend(IngestBackend):
+    name = "local"
+
+    def handles(self, url: str) -> bool:
+        return local_repo.is_local_url(url)
+
+    def repo_key(self, url: str) -> Tuple[str, str]:
+        return local_repo.repo_key(url)
+
+    async def resolve(self, url: str) -> RepoTarget:
+        return await local_repo.resolve_repo(url)
+
+    async def fetch_files(self, url, target, max_files, max_bytes, budget=None):
+        # local reads cost no network round trips, so there is no separate preview path
+        return await local_repo.fetch_repo_files(url, target, max_files, max_bytes)
+
+_backends: List[IngestBackend] = [LocalBackend(), GitHubBackend()]
+
+def register_backend(cls: Type[IngestBackend]) -> Type[IngestBackend]:
+    """Add a backend class; it is consulted before the built-in ones. Usable as a decorator.
+
+    The class is instantiated here, so one missing an abstract method fails at registration.
+    """
+    _backends.insert(0, cls())
+    return cls
+
+def backend_for(url: str) -> IngestBackend:
+    for backend in _backends:
+        if backend.handles(url):
+            return backend
+    raise HTTPException(status_code=422, detail="Invalid GitHub URL")
+
+def repo_key(url: str) -> Tuple[str, str]:
+    return backend_for(url).repo_key(url)
+
+def is_diff_url(url: str) -> bool:
+    backend = backend_for(url)
+    return backend.supports_diff(url) and github_service.is_diff_url(url)
+
+async def resolve_repo(repo_url: str) -> RepoTarget:
+    backend = backend_for(repo_url)
+    return await ingest_flight.do(ingest_flight.key("resolve", repo_url), lambda: backend.resolve(repo_url))
+
+async def fetch_repo_files(repo_url: str, target: Optional[RepoTarget] = None,
+                           max_files: int = MAX_FILES, max_bytes: int = MAX_TOTAL_BYTES,
+                           budget: Optional[int] = None) -> List[RepoFile]:
+    backend = backend_for(repo_url)
+    target = target or await backend.resolve(repo_url)
+    # concurrent reviews of one commit share a single ingestion
+    key = ingest_flight.key(backend.name, target.owner, target.repo, target.sha, max_files, max_bytes, budget)
+
+    async def fetch():
+        files = await backend.fetch_files(repo_url, target, max_files, max_bytes, budget)
+        with span("analyze"):
+            return await analysis.analyze_files(files)
+    return await ingest_flight.do(key, fetch)
+
+async def resolve_diff(repo_url: str, base_ref: Optional[str] = None) -> DiffTarget:
+    if not backend_for(repo_url).supports_diff(repo_url):
+        raise HTTPException(status_code=422, detail="Diff reviews need a GitHub repository URL")
+    return await github_service.resolve_diff(repo_url, base_ref)
+
+async def fetch_diff(target: DiffTarget) -> Tuple[List[DiffFile], List[RepoFile]]:
+    key = ingest_flight.key("diff", target.owner, target.repo, target.base_sha, target.head_sha)
+    return await ingest_flight.do(key, lambda: github_service.fetch_diff(target))
+
+async def fetch_repo_and_generate_message(repo_url: str, target: Optional[RepoTarget] = None) -> str:
+    files, _ = compact_files(await fetch_repo_files(repo_url, target))
+    return render_pack(pack_files(files, context_budget(MISTRAL_MODEL)))
@@ -0,0 +1,262 @@
+import time, uuid, queue, asyncio, logging, sqlite3, threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+from fastapi import HTTPException
+from app.config import JOB_WORKERS, JOB_QUEUE_SIZE, JOB_DEADLINE, JOB_HISTORY, JOB_STORE, JOB_DB_PATH
+from app.models import ReviewJob, ReviewJobRequest, ReviewRequest, ReviewResponse, JobStage
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("resolve", "fetch", "triage", "review", "parse")   # triage runs only in cascade mode
+Progress = Callable[[str], None]
+Runner = Callable[[ReviewRequest, Progress], Awaitable[ReviewResponse]]
+
+class MemoryJobStore:
+    def __init__(self, history: int = JOB_HISTORY):
+        self.history = history
+        self._jobs: "OrderedDict[str, ReviewJob]" = OrderedDict()
+
+    def save(self, job: ReviewJob):
+        self._jobs[job.id] = job
+        # drop the oldest finished jobs once over the retention bound
+        if len(self._jobs) > self.history:
+            for jid in [j.id for j in self._jobs.values() if j.status not in ("queued", "running")]:
+                del self._jobs[jid]
+                if len(self._jobs) <= self.history:
+                    break
+
+    def get(self, job_id: str) -> Optional[ReviewJob]:
+        return self._jobs.get(job_id)
+
+    def pending(self):
+        return [j for j in self._jobs.values() if j.status in ("queued", "running")]
+
+    async def aget(self, job_id: str) -> Optional[ReviewJob]:
+        return self.get(job_id)
+
+    async def apending(self):
+        return self.pending()
+
+    def close(self):
+        pass
+
+class SQLiteJobStore:
+    """Jobs persisted to SQLite. Saves come from the event loop (progress callbacks included),
+    so they are handed to one writer thread, which keeps them in order; reads see saves that
+    are still queued. Async callers use `aget`/`apending`, which read in a worker thread."""
+
+    def __init__(self, path: str = JOB_DB_PATH):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db_lock = threading.Lock()
+        self._lock = threading.Lock()        # queued saves only, so save() never waits on a commit
+        self._queued: Dict[str, str] = {}    # job id -> latest body not yet committed
+        self._writes: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        with self._db_lock, self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, status TEXT, created_at REAL, body TEXT)"
+            )
+
+    def save(self, job: ReviewJob):
+        body = job.model_dump_json()
+        with self._lock:
+            self._queued[job.id] = body
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="job-store-writer", daemon=True)
+                self._writer.start()
+        self._writes.put((job.id, job.status, job.created_at, body))
+
+    def _write_loop(self):
+        while True:
+            row = self._writes.get()
+            if row is None:
+                return
+            try:
+                with self._db_lock, self._db:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO jobs (id, status, created_at, body) VALUES (?, ?, ?, ?)", row)
+            except sqlite3.Error as e:
+                logger.error("Saving job %s failed: %s", row[0], e)
+            with self._lock:
+                if self._queued.get(row[0]) is row[3]:
+                    del self._queued[row[0]]
+
+    def get(self, job_id: str) -> Optional[ReviewJob]:
+        with self._lock:
+            body = self._queued.get(job_id)
+        if body is None:
+            with self._db_lock:
+                row = self._db.execute("SELECT body FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            body = row[0] if row else None
+        return ReviewJob.model_validate_json(body) if body else None
+
+    def pending(self):
+        with self._lock:
+            queued = dict(self._queued)
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT id, body FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        jobs = [ReviewJob.model_validate_json(queued.pop(jid, body)) for jid, body in rows]
+        jobs += [ReviewJob.model_validate_json(body) for body in queued.values()]
+        return [j for j in jobs if j.status in ("queued", "running")]
+
+    async def aget(self, job_id: str) -> Optional[ReviewJob]:
+        return await asyncio.to_thread(self.get, job_id)
+
+    async def apending(self):
+        return await asyncio.to_thread(self.pending)
+
+    def close(self):
+        # commit everything still queued; a later save starts a new writer
+        with self._lock:
+            writer, self._writer = self._writer, None
+            if writer is not None:
+                self._writes.put(None)
+        if writer is not None:
+            writer.join()
+
+def _make_store():
+    return SQLiteJobStore() if JOB_STORE == "sqlite" else MemoryJobStore()
+
+class JobManager:
+    """Bounded queue of review jobs drained by a fixed pool of worker tasks."""
+
+    def __init__(self, store=None, workers: int = JOB_WORKERS, queue_size: int = JOB_QUEUE_SIZE):
+        self.store = store or _make_store()
+        self.workers = workers
+        self.queue_size = queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._cancelled = set()
+        self._runner: Optional[Runner] = None
+
+    async def start(self, runner: Runner):
+        self._runner = runner
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        # a persistent store may hold jobs from a previous process
+        for job in await self.store.apending():
+            if job.status == "running" or self._queue.full():
+                self._finish(job, "failed", error="Interrupted by restart")
+            else:
+                self._queue.put_nowait(job.id)
+
+    async def stop(self):
+        for w in self._workers:
+            w.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        await asyncio.to_thread(self.store.close)
+
+    def submit(self, request: ReviewJobRequest) -> ReviewJob:
+        if self._queue is None:
+            raise HTTPException(status_code=503, detail="Review workers not running")
+        now = time.time()
+        job = ReviewJob(
+            id=uuid.uuid4().hex,
+            stages=[JobStage(name=s) for s in STAGES],
+            created_at=now,
+            updated_at=now,
+            deadline_at=now + (request.deadline_seconds or JOB_DEADLINE),
+            request=ReviewRequest(**request.model_dump(include=set(ReviewRequest.model_fields))),
+        )
+        if self._queue.full():
+            raise HTTPException(status_code=503, detail="Review queue is full, retry later")
+        self.store.save(job)
+        self._queue.put_nowait(job.id)
+        return job
+
+    async def get(self, job_id: str) -> ReviewJob:
+        job = await self.store.aget(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job
+
+    async def cancel(self, job_id: str) -> ReviewJob:
+        job = await self.get(job_id)
+        if job.status == "queued":
+            self._finish(job, "cancelled")
+        elif job.status == "running" and job_id in self._running:
+            self._cancelled.add(job_id)
+            self._running[job_id].cancel()
+        return await self.store.aget(job_id)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "running": len(self._running),
+            "workers": len(self._workers),
+            "queue_size": self.queue_size,
+        }
+
+    def _finish(self, job: ReviewJob, status: str, error: Optional[str] = None,
+                result: Optional[ReviewResponse] = None):
+        now = time.time()
+        for stage in job.stages:
+            if stage.status == "running":
+                stage.status, stage.finished_at = ("done" if status == "succeeded" else "failed"), now
+            elif stage.status == "pending" and status == "succeeded":
+                stage.status = "skipped"
+        job.status, job.error, job.result, job.updated_at = status, error, result, now
+        self.store.save(job)
+
+    def _progress(self, job: ReviewJob) -> Progress:
+        def advance(name: str):
+            now = time.time()
+            names = [s.name for s in job.stages]
+            upto = names.index(name) if name in names else -1
+            for i, stage in enumerate(job.stages):
+                if stage.status == "running":
+                    stage.status, stage.finished_at = "done", now
+                elif stage.status == "pending" and i < upto:
+                    stage.status = "skipped"   # the runner went past it, e.g. triage outside cascade mode
+                if stage.name == name:
+                    stage.status, stage.started_at = "running", now
+            job.updated_at = now
+            self.store.save(job)
+        return advance
+
+    async def _work(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception:
+                logger.exception("Review job %s crashed", job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        job = await self.store.aget(job_id)
+        if job is None or job.status != "queued":
+            return  # cancelled while waiting
+        remaining = job.deadline_at - time.time()
+        if remaining <= 0:
+            self._finish(job, "failed", error="Deadline exceeded while queued")
+            return
+
+        job.status, job.updated_at = "running", time.time()
+        self.store.save(job)
+        task = asyncio.create_task(self._runner(job.request, self._progress(job)))
+        self._running[job_id] = task
+        try:
+            result = await asyncio.wait_for(task, remaining)
+            self._finish(job, "succeeded", result=result)
+        except asyncio.TimeoutError:
+            self._finish(job, "failed", error="Deadline exceeded")
+        except asyncio.CancelledError:
+            if job_id not in self._cancelled:
+                raise  # worker shutdown
+            self._finish(job, "cancelled")
+        except HTTPException as e:
+            self._finish(job, "failed", error=f"{e.status_code}: {e.detail}")
+        except Exception as e:
+            logger.exception("Review job %s failed", job_id)
+            self._finish(job, "failed", error=str(e))
+        finally:
+            self._running.pop(job_id, None)
+            self._cancelled.discard(job_id)
+
+job_manager = JobManager()
@@ -0,0 +1,83 @@
+import json
+from typing import List, Optional
+
+class ReviewStreamParser:
+    """Incremental scanner for the review JSON as the model streams it.
+
+    `feed` returns every object of the top-level "findings" array as soon as its closing
+    brace arrives. Text around the top-level object (code fences, chatter) is ignored, and
+    the finished object is decoded once by `result`.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_str = False
+        self._escape = False
+        self._str_start = 0
+        self._last_str: Optional[str] = None
+        self._key: Optional[str] = None
+        self._findings_depth: Optional[int] = None
+        self._item_start: Optional[int] = None
+        self._start: Optional[int] = None
+        self._end: Optional[int] = None
+
+    @property
+    def done(self) -> bool:
+        return self._end is not None
+
+    def feed(self, chunk: str) -> List[dict]:
+        self.text += chunk
+        found = []
+        text, i = self.text, self._pos
+        while i < len(text) and not self.done:
+            c = text[i]
+            if self._in_str:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_str = False
+                    if self._depth == 1:
+                        self._last_str = json.loads(text[self._str_start:i + 1])
+            elif self._start is None:
+                if c == "{":
+                    self._start, self._depth = i, 1
+            elif c == '"':
+                self._in_str, self._str_start = True, i
+            elif c == ":" and self._depth == 1:
+                self._key = self._last_str
+            elif c in "{[":
+                if c == "[" and self._depth == 1 and self._key == "findings":
+                    self._findings_depth = 2
+                elif c == "{" and self._depth == self._findings_depth:
+                    self._item_start = i
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._end = i + 1
+                elif c == "]" and self._depth == 1:
+                    self._findings_depth = None
+                elif c == "}" and self._depth == self._findings_depth and self._item_start is not None:
+                    try:
+                        item = json.loads(text[self._item_start:i + 1])
+                    except ValueError:
+                        item = None
+                    if isinstance(item, dict):
+                        found.append(item)
+                    self._item_start = None
+            i += 1
+        self._pos = i
+        return found
+
+    def result(self) -> dict:
+        """Decode the completed top-level object; raises ValueError if it never closed."""
+        if not self.done:
+            raise ValueError("incomplete JSON object")
+        obj = json.loads(self.text[self._start:self._end])
+        if not isinstance(obj, dict):
+            raise ValueError("not a JSON object")
+        return obj
@@ -0,0 +1,228 @@
+import os, stat, shutil, asyncio, hashlib, logging, tempfile
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs, unquote
+from fastapi import HTTPException
+from app.config import (
+    IGNORE_DIRS, MAX_FILE_BYTES, MAX_TOTAL_BYTES, MAX_FILES, DEFAULT_REF,
+    LOCAL_REPO_ROOTS, LOCAL_CLONE_DIR, LOCAL_CLONE_MAX, LOCAL_GIT_TIMEOUT,
+)
+from app.services.github_service import RepoTarget, _candidates
+from app.services.metrics import span
+from app.services.pathmatch import PathMatcher, default_patterns, vendored_patterns
+from app.services.tree import RepoTree
+from app.services.packer import RepoFile
+from app.services.analysis import fetch_order
+
+# file:// ingestion: plain directories are read in place; git repos (bare or working) are
+# pinned to a commit and read from a shallow checkout kept in LOCAL_CLONE_DIR.
+
+logger = logging.getLogger(__name__)
+OWNER = "local"
+_clone_locks: Dict[str, Tuple[asyncio.Lock, int]] = {}   # checkout name -> (lock, tasks using it)
+_walked: "OrderedDict[str, Tuple[RepoTree, PathMatcher]]" = OrderedDict()   # plain-dir listings by fingerprint
+
+def is_local_url(url: str) -> bool:
+    return url.startswith("file://")
+
+def _parse(url: str) -> Tuple[str, str]:
+    """(real path, ref) for file:///abs/path[?ref=<ref>]; the path must sit under LOCAL_REPO_ROOTS."""
+    parsed = urlparse(url)
+    if parsed.netloc not in ("", "localhost") or not parsed.path:
+        raise HTTPException(status_code=422, detail="Invalid file:// URL")
+    path = os.path.realpath(unquote(parsed.path))
+    roots = [os.path.realpath(r) for r in LOCAL_REPO_ROOTS]
+    if not any(os.path.commonpath([path, r]) == r for r in roots):
+        raise HTTPException(status_code=403, detail="Local path is outside LOCAL_REPO_ROOTS")
+    if not os.path.isdir(path):
+        raise HTTPException(status_code=404, detail="Repository not found")
+    ref = parse_qs(parsed.query).get("ref", [DEFAULT_REF])[0]
+    return path, ref
+
+def repo_key(url: str) -> Tuple[str, str]:
+    path = os.path.realpath(unquote(urlparse(url).path))
+    return OWNER, path
+
+def _is_git(path: str) -> bool:
+    # only the directory itself, so a plain folder inside some checkout is read as it is
+    return os.path.exists(os.path.join(path, ".git")) or (
+        os.path.isfile(os.path.join(path, "HEAD")) and os.path.isdir(os.path.join(path, "objects")))
+
+async def _git(*args: str, cwd: Optional[str] = None) -> bytes:
+    proc = await asyncio.create_subprocess_exec(
+        "git", *args, cwd=cwd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        env={**os.environ, "GIT_TERMINAL_PROMPT": "0"},
+    )
+    try:
+        out, err = await asyncio.wait_for(proc.communicate(), LOCAL_GIT_TIMEOUT)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise HTTPException(status_code=504, detail=f"git {args[0]} timed out")
+    if proc.returncode != 0:
+        raise RuntimeError(err.decode("utf-8", errors="replace").strip() or f"git {args[0]} failed")
+    return out
+
+def _read_head(path: str, limit: int = MAX_FILE_BYTES) -> Optional[str]:
+    # a file that grew past the cap since it was listed is skipped
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size > limit:
+                return None
+            return f.read(limit).decode("utf-8", errors="replace")
+    except OSError:
+        return None
+
+def _matcher(root: str) -> PathMatcher:
+    texts = {}
+    for name in (".gitignore", ".gitattributes"):
+        texts[name] = _read_head(os.path.join(root, name)) or ""
+    if not any(texts.values()):
+        return PathMatcher(default_patterns(IGNORE_DIRS))
+    return PathMatcher(default_patterns(IGNORE_DIRS) + texts[".gitignore"].splitlines()
+                       + vendored_patterns(texts[".gitattributes"]))
+
+def _walk_dir(root: str) -> Tuple[RepoTree, PathMatcher, str]:
+    """Listing of a plain directory plus a fingerprint of every path, size and mtime, which
+    stands in for a commit SHA. Ignored directories are pruned and symlinks skipped."""
+    matcher, tree, h = _matcher(root), RepoTree(), hashlib.sha1()
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel = os.path.relpath(dirpath, root)
+        prefix = "" if rel == "." else rel.replace(os.sep, "/") + "/"
+        dirnames[:] = sorted(d for d in dirnames
+                             if not os.path.islink(os.path.join(dirpath, d)) and not matcher.ignored(f"{prefix}{d}/"))
+        for name in sorted(filenames):
+            try:
+                st = os.lstat(os.path.join(dirpath, name))
+            except OSError:
+                continue
+            if stat.S_ISREG(st.st_mode):
+                tree.add(prefix + name, st.st_size, None)
+                h.update(f"{prefix}{name}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8"))
+    return tree, matcher, "dir-" + h.hexdigest()
+
+async def resolve_repo(repo_url: str) -> RepoTarget:
+    path, ref = _parse(repo_url)
+    if _is_git(path):
+        with span("local_commit"):
+            try:
+                sha = (await _git("rev-parse", "--verify", "--end-of-options", f"{ref}^{{commit}}", cwd=path)).decode().strip()
+            except RuntimeError:
+                raise HTTPException(status_code=404, detail=f"Ref not found: {ref}")
+        return RepoTarget(OWNER, path, ref, sha)
+    if ref != DEFAULT_REF:
+        raise HTTPException(status_code=422, detail="Refs need a git repository")
+    with span("local_tree"):
+        tree, matcher, sha = await asyncio.to_thread(_walk_dir, path)
+    _walked[sha] = (tree, matcher)
+    while len(_walked) > 8:
+        _walked.popitem(last=False)
+    return RepoTarget(OWNER, path, ref, sha)
+
+def _evict_clones(keep: str):
+    try:
+        entries = [os.path.join(LOCAL_CLONE_DIR, n) for n in os.listdir(LOCAL_CLONE_DIR) if not n.endswith(".tmp")]
+    except OSError:
+        return
+    entries.sort(key=lambda p: os.path.getmtime(p) if os.path.exists(p) else 0)
+    for p in entries[:max(0, len(entries) - LOCAL_CLONE_MAX)]:
+        if p != keep:
+            shutil.rmtree(p, ignore_errors=True)
+
+async def _checkout(repo: str, sha: str) -> str:
+    """Shallow checkout of `sha`, shared by every review of that commit."""
+    name = f"{hashlib.sha1(repo.encode('utf-8')).hexdigest()[:12]}-{sha}"
+    dest = os.path.join(LOCAL_CLONE_DIR, name)
+    lock, users = _clone_locks.get(name, (asyncio.Lock(), 0))
+    _clone_locks[name] = (lock, users + 1)
+    try:
+        async with lock:
+            if os.path.isdir(dest):
+                os.utime(dest)
+                return dest
+            await _clone(repo, sha, dest)
+    finally:
+        # the last task out drops the lock, whichever way it left
+        lock, users = _clone_locks[name]
+        if users > 1:
+            _clone_locks[name] = (lock, users - 1)
+        else:
+            del _clone_locks[name]
+    await asyncio.to_thread(_evict_clones, dest)
+    return dest
+
+async def _clone(repo: str, sha: str, dest: str):
+    os.makedirs(LOCAL_CLONE_DIR, exist_ok=True)
+    # a private staging dir, so a failed clone never races a retry or another process
+    tmp = tempfile.mkdtemp(prefix=os.path.basename(dest) + ".", suffix=".tmp", dir=LOCAL_CLONE_DIR)
+    try:
+        await _git("init", "-q", cwd=tmp)
+        try:
+            # file:// (not a plain path) so --depth is honoured instead of copying all objects
+            await _git("fetch", "-q", "--depth", "1", f"file://{repo}", sha, cwd=tmp)
+        except RuntimeError:
+            await _git("fetch", "-q", f"file://{repo}", cwd=tmp)   # servers refusing fetch-by-SHA
+        await _git("-c", "advice.detachedHead=false", "checkout", "-q", sha, cwd=tmp)
+        os.replace(tmp, dest)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+async def _ls_tree(checkout: str, sha: str) -> RepoTree:
+    tree = RepoTree()
+    out = await _git("ls-tree", "-r", "-l", "-z", "--full-tree", sha, cwd=checkout)
+    for entry in out.split(b"\0"):
+        if not entry:
+            continue
+        meta, _, path = entry.partition(b"\t")
+        mode, kind, blob, size = meta.split()
+        if kind == b"blob" and mode != b"120000":   # symlinks are not file content
+            tree.add(path.decode("utf-8", errors="replace"), int(size), blob.decode())
+    return tree
+
+def _read_files(root: str, ordered: List[dict], max_files: int, max_bytes: int) -> Dict[str, str]:
+    # same caps and order as the GitHub Contents path
+    contents, included, total_bytes = {}, 0, 0
+    for node in ordered:
+        if included >= max_files or total_bytes >= max_bytes:
+            break
+        text = _read_head(os.path.join(root, *node["path"].split("/")))
+        if text is None:
+            continue
+        contents[node["path"]] = text
+        total_bytes += node.get("size") or len(text)
+        included += 1
+    return contents
+
+async def fetch_repo_files(repo_url: str, target: Optional[RepoTarget] = None,
+                           max_files: int = MAX_FILES, max_bytes: int = MAX_TOTAL_BYTES) -> List[RepoFile]:
+    target = target or await resolve_repo(repo_url)
+    if target.sha.startswith("dir-"):
+        root = target.repo
+        cached = _walked.get(target.sha)
+        if cached is None:
+            with span("local_tree"):
+                tree, matcher, _ = await asyncio.to_thread(_walk_dir, root)
+        else:
+            tree, matcher = cached
+    else:
+        try:
+            with span("local_clone"):
+                root = await _checkout(target.repo, target.sha)
+            with span("local_tree"):
+                tree = await _ls_tree(root, target.sha)
+                matcher = await asyncio.to_thread(_matcher, root)
+        except RuntimeError as e:
+            raise HTTPException(status_code=502, detail=f"Local checkout failed: {e}")
+    if not len(tree):
+        raise HTTPException(status_code=204, detail="Repository empty")
+
+    code, secondary = _candidates(tree, matcher)
+    by_path = lambda i: fetch_order(tree.paths[i], tree.sizes[i])   # likely-risky files first
+    ordered = [tree.node(i) for i in sorted(code, key=by_path) + sorted(secondary, key=by_path)]
+    with span("local_files"):
+        contents = await asyncio.to_thread(_read_files, root, ordered, max_files, max_bytes)
+    return [
+        RepoFile(n["path"], n["size"], contents.get(n["path"]), n["sha"], k < len(code))
+        for k, n in enumerate(ordered)
+    ]
@@ -0,0 +1,146 @@
+import time, threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+# Minimal Prometheus text-format metrics: a dict update per event and no extra dependency.
+
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+_registry: List["_Metric"] = []
+_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("timings", default=None)
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, v in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {v:g}")
+        return lines
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets=_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        self._values: Dict[Tuple[str, ...], list] = {}   # [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def count(self, **labels) -> int:
+        row = self._values.get(self._key(labels))
+        return row[-1] if row else 0
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            for key, row in sorted(self._values.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, row):
+                    cumulative += n
+                    le = 'le="%g"' % bound
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {row[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {row[-2]:.6f}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {row[-1]}")
+        return lines
+
+HTTP_SECONDS = Histogram("codereviewer_http_request_seconds", "API request latency", ("method", "route", "status"))
+STAGE_SECONDS = Histogram("codereviewer_stage_seconds", "Time spent per review stage", ("stage",))
+GITHUB_REQUESTS = Counter("codereviewer_github_requests_total", "GitHub API requests", ("kind", "status"))
+GITHUB_BYTES = Counter("codereviewer_github_bytes_total", "Bytes received from GitHub", ("kind",))
+LLM_REQUESTS = Counter("codereviewer_llm_requests_total", "Mistral calls by outcome", ("outcome",))
+LLM_TOKENS = Counter("codereviewer_llm_tokens_total", "Mistral tokens reported by the API", ("kind",))
+PARSE_RESULTS = Counter("codereviewer_parse_results_total", "Model answers parsed as review JSON", ("outcome",))
+COALESCED = Counter("codereviewer_coalesced_total", "Requests that joined an identical in-flight leader", ("level",))
+REVIEW_CACHE = Counter("codereviewer_review_cache_total", "Review result cache lookups", ("result",))
+
+@contextmanager
+def span(stage: str):
+    """Time a stage into STAGE_SECONDS and, inside a request, its Server-Timing list."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        timings = _timings.get()
+        if timings is not None:
+            timings.append((stage, elapsed))
+
+def start_request() -> List[Tuple[str, float]]:
+    timings: List[Tuple[str, float]] = []
+    _timings.set(timings)
+    return timings
+
+def server_timing(timings: List[Tuple[str, float]]) -> str:
+    # repeated stages (e.g. several shards) are summed into one entry
+    totals: Dict[str, List[float]] = {}
+    for stage, elapsed in timings:
+        entry = totals.setdefault(stage, [0.0, 0])
+        entry[0] += elapsed
+        entry[1] += 1
+    return ", ".join(
+        f"{stage};dur={total * 1000:.1f}" + (f';desc="x{n}"' if n > 1 else "")
+        for stage, (total, n) in totals.items()
+    )
+
+def render(stats: Optional[Dict[str, dict]] = None) -> str:
+    """Exposition text for every metric, plus numeric fields of component stats() dicts."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    if stats:
+        lines.append("# HELP codereviewer_component_stat Counters and sizes reported by caches, pools and queues")
+        lines.append("# TYPE codereviewer_component_stat gauge")
+        for component, values in stats.items():
+            for field, v in values.items():
+                if isinstance(v, (int, float)) and not isinstance(v, bool):
+                    lines.append(f'codereviewer_component_stat{{component="{component}",field="{field}"}} {v:g}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,188 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+from app.config import (
+    PREVIEW_LINES, PREVIEW_MAX_CHARS, MODEL_CONTEXT_TOKENS, DEFAULT_CONTEXT_TOKENS,
+    CONTEXT_BUDGET_TOKENS, PROMPT_RESERVE_TOKENS, CHARS_PER_TOKEN,
+)
+
+@dataclass
+class RepoFile:
+    path: str
+    size: int                      # bytes, from the tree metadata
+    content: Optional[str] = None  # None when ingestion stopped before this file
+    sha: Optional[str] = None
+    code: bool = True              # application code vs config/docs
+    partial: bool = False          # content is only a streamed preview head; `size` is the real size
+    risk: Optional[float] = None   # static pre-analysis score (0-1), when analyzed
+    notes: str = ""                # pre-analysis signals shown next to the file in the prompt
+
+@dataclass
+class PackedFile:
+    path: str
+    size: int
+    text: str
+    tokens: int
+    trimmed: bool = False
+    notes: str = ""
+
+@dataclass
+class Pack:
+    files: List[PackedFile]
+    dropped: List[str] = field(default_factory=list)
+    budget: int = 0
+
+    @property
+    def tokens(self) -> int:
+        return sum(f.tokens for f in self.files)
+
+    @property
+    def trimmed(self) -> List[str]:
+        return [f.path for f in self.files if f.trimmed]
+
+    @property
+    def truncated(self) -> bool:
+        # trimmed previews are reported separately; truncated means whole files were left out
+        return bool(self.dropped)
+
+    @property
+    def total_bytes(self) -> int:
+        # whole files are counted from tree sizes; only the (short) trimmed previews are encoded
+        return sum(len(f.text.encode("utf-8")) if f.trimmed else f.size for f in self.files)
+
+def estimate_tokens(text: str) -> int:
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+def context_budget(model: str) -> int:
+    window = MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS)
+    return max(0, min(CONTEXT_BUDGET_TOKENS, window - PROMPT_RESERVE_TOKENS))
+
+def _head(text: str, max_lines: int, max_chars: int) -> str:
+    # first max_lines lines without splitting the whole text
+    end = -1
+    for _ in range(max_lines):
+        end = text.find("\n", end + 1, max_chars)
+        if end == -1:
+            return text[:max_chars]
+    return text if end >= len(text) - 1 else text[:end]
+
+def _priority(f: RepoFile) -> float:
+    name = f.path.rsplit("/", 1)[-1].lower()
+    score = 3.0 if f.code else 1.0
+    if name.startswith("readme"):
+        score += 1.5
+    if "test" in f.path.lower():
+        score -= 0.5
+    if f.risk is not None:
+        score += 2.0 * f.risk
+    return score - 0.1 * f.path.count("/")
+
+def pack_files(files: List[RepoFile], budget: int) -> Pack:
+    """Fit fetched files into `budget` tokens.
+
+    Pass 1 gives every file, by priority, a preview of PREVIEW_LINES lines (the whole file
+    when it is shorter). Pass 2 upgrades trimmed files to whole files while they still fit.
+    Files that do not get a preview are dropped; partial files (streamed preview heads)
+    cannot be upgraded. Output keeps the ingestion order.
+    """
+    ranked = sorted((f for f in files if f.content is not None), key=lambda f: (-_priority(f), f.size, f.path))
+    dropped = [f.path for f in files if f.content is None]
+    chosen, _ = _choose(ranked, budget)
+    order = {f.path: i for i, f in enumerate(files)}
+    dropped += [f.path for f in ranked if f.path not in chosen]
+    dropped.sort(key=order.__getitem__)
+    return Pack([chosen[f.path] for f in files if f.path in chosen], dropped, budget)
+
+def plan_upgrades(files: List[RepoFile], budget: int) -> List[str]:
+    """Partial files that pack_files would send whole if their full content were fetched.
+
+    Their full cost is estimated from the tree size; bytes never undercount characters,
+    so everything planned here still fits once downloaded.
+    """
+    ranked = sorted((f for f in files if f.content is not None), key=lambda f: (-_priority(f), f.size, f.path))
+    return _choose(ranked, budget)[1]
+
+def _choose(ranked: List[RepoFile], budget: int):
+    chosen, upgrades, left = {}, [], budget
+    for f in ranked:
+        head = _head(f.content, PREVIEW_LINES, PREVIEW_MAX_CHARS)
+        trimmed = f.partial or len(head) < len(f.content)
+        tokens = estimate_tokens(head)
+        if tokens > left:
+            continue
+        chosen[f.path] = PackedFile(f.path, f.size, head, tokens, trimmed, f.notes)
+        left -= tokens
+
+    for f in ranked:
+        p = chosen.get(f.path)
+        if p is None or not p.trimmed:
+            continue
+        full = int(f.size / CHARS_PER_TOKEN) + 1 if f.partial else estimate_tokens(f.content)
+        if full - p.tokens <= left:
+            left -= full - p.tokens
+            if f.partial:
+                upgrades.append(f.path)   # the preview stays until the rest is fetched
+            else:
+                chosen[f.path] = PackedFile(f.path, f.size, f.content, full, False, f.notes)
+    return chosen, upgrades
+
+def render_pack(pack: Pack) -> str:
+    if not pack.files and not pack.dropped:
+        return "# Repository Files\n*(no eligible files matched)*"
+    lines = ["# Repository Files"]
+    for f in pack.files:
+        note = ", trimmed preview" if f.trimmed else ""
+        signals = f" [{f.notes}]" if f.notes else ""
+        lines.append(f"- `{f.path}` ({f.size} bytes{note}){signals}")
+        lines.append("```")
+        lines.append(f.text)
+        lines.append("```")
+    if pack.dropped:
+        lines.append(f"\n*(truncated: {len(pack.dropped)} more files not included)*")
+    return "\n".join(lines)
+
+def shard_files(files: List[RepoFile], budget: int, max_shards: int, max_tokens: int) -> List[Pack]:
+    """Split files into packs of at most `budget` tokens each, for map-reduce review.
+
+    Files are chosen by priority until `max_tokens` (and `max_shards` full budgets) are used,
+    then laid out in ingestion order so each shard keeps neighbouring paths together.
+    A single file larger than `budget` is cut to its head and gets a shard of its own.
+    Everything left out is reported as dropped on the first shard.
+    """
+    limit = min(max_tokens, max_shards * budget)
+    ranked = sorted((f for f in files if f.content is not None), key=lambda f: (-_priority(f), f.size, f.path))
+    chosen, used = {}, 0
+    for f in ranked:
+        text, trimmed = f.content, f.partial
+        tokens = estimate_tokens(text)
+        if tokens > budget:
+            text, trimmed = _head(text, len(text), int((budget - 1) * CHARS_PER_TOKEN)), True
+            tokens = estimate_tokens(text)
+        if used + tokens > limit:
+            continue
+        chosen[f.path] = PackedFile(f.path, f.size, text, tokens, trimmed, f.notes)
+        used += tokens
+
+    shards: List[Pack] = []
+    current: List[PackedFile] = []
+    left = budget
+    overflow = []
+    for f in files:
+        p = chosen.get(f.path)
+        if p is None:
+            continue
+        if p.tokens > left and current:
+            shards.append(Pack(current, budget=budget))
+            current, left = [], budget
+        if len(shards) >= max_shards:
+            overflow.append(p.path)  # next-fit packing can need one more shard than the token count suggests
+            continue
+        current.append(p)
+        left -= p.tokens
+    if current and len(shards) < max_shards:
+        shards.append(Pack(current, budget=budget))
+
+    order = {f.path: i for i, f in enumerate(files)}
+    dropped = sorted([f.path for f in files if f.path not in chosen] + overflow, key=order.__getitem__)
+    if shards:
+        shards[0].dropped = dropped
+    return shards
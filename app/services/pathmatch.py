@@ -0,0 +1,133 @@
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_VENDOR_ATTRS = ("linguist-vendored", "linguist-generated")
+
+def _glob_to_regex(glob: str) -> str:
+    out, i = [], 0
+    while i < len(glob):
+        c = glob[i]
+        if glob.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if glob.startswith("/**", i) and i + 3 == len(glob):
+            out.append("(?:/.*)?")
+            i += 3
+            continue
+        if glob.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            end = glob.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = glob[i + 1:end]
+                out.append("[" + ("^" + body[1:] if body.startswith("!") else body) + "]")
+                i = end
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+def _rule(pattern: str) -> Optional[Tuple[bool, bool, bool, str]]:
+    """(negate, dir_only, anchored, body) for one gitignore line, or None for blanks/comments."""
+    p = pattern.rstrip("\n").rstrip()
+    if not p or p.startswith("#"):
+        return None
+    negate = p.startswith("!")
+    if negate:
+        p = p[1:]
+    if p.startswith("\\"):
+        p = p[1:]
+    dir_only = p.endswith("/")
+    p = p.rstrip("/")
+    anchored = "/" in p   # a leading or middle slash anchors the rule to the repo root
+    return negate, dir_only, anchored, p.lstrip("/")
+
+def _rule_regex(dir_only: bool, anchored: bool, body: str) -> str:
+    # a matching directory ignores everything below it; tree paths are always blobs
+    prefix = "" if anchored else "(?:.*/)?"
+    suffix = "/.*" if dir_only else "(?:/.*)?"
+    return prefix + _glob_to_regex(body) + suffix
+
+class PathMatcher:
+    """Gitignore-style ignore rules compiled once and applied to every tree path.
+
+    Literal directory names that may appear at any depth (``node_modules/``) are looked up
+    per path component; anchored literal directories go in a trie; everything else is one
+    combined regex. Negated rules switch to ordered, last-match-wins evaluation.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        rules = [r for r in (_rule(p) for p in patterns) if r is not None]
+        self.patterns = len(rules)
+        self._ordered: Optional[List[Tuple[bool, "re.Pattern"]]] = None
+        self._names: set = set()
+        self._trie: Dict[str, dict] = {}
+        self._regex: Optional["re.Pattern"] = None
+        if any(negate for negate, *_ in rules):
+            self._ordered = [(negate, re.compile(_rule_regex(d, a, b)))
+                             for negate, d, a, b in rules]
+            return
+        globs = []
+        for _, dir_only, anchored, body in rules:
+            literal = not any(ch in body for ch in "*?[")
+            if literal and dir_only and not anchored:
+                self._names.add(body)
+            elif literal and anchored:
+                node = self._trie
+                for part in body.split("/"):
+                    node = node.setdefault(part, {})
+                node[""] = {}   # end marker: this prefix and everything under it
+            else:
+                globs.append(_rule_regex(dir_only, anchored, body))
+        if globs:
+            self._regex = re.compile("|".join(f"(?:{g})" for g in globs))
+
+    def ignored(self, path: str) -> bool:
+        """True if the blob at `path` is excluded; a path ending in "/" is a directory."""
+        if self._ordered is not None:
+            hit = False
+            for negate, regex in self._ordered:
+                if regex.fullmatch(path):
+                    hit = not negate
+            return hit
+        parts = path.split("/")
+        if self._names and not self._names.isdisjoint(parts[:-1]):
+            return True
+        if self._trie:
+            node = self._trie
+            for part in parts:
+                node = node.get(part)
+                if node is None:
+                    break
+                if "" in node:
+                    return True
+        return bool(self._regex and self._regex.fullmatch(path))
+
+def default_patterns(ignore_dirs: Iterable[str]) -> List[str]:
+    # IGNORE_DIRS entries like "node_modules/" apply at any depth, as in a .gitignore
+    return sorted(ignore_dirs)
+
+def vendored_patterns(gitattributes: str) -> List[str]:
+    """Ignore rules for paths marked linguist-vendored / linguist-generated in .gitattributes."""
+    out = []
+    for line in gitattributes.splitlines():
+        fields = line.split()
+        if not fields or fields[0].startswith("#"):
+            continue
+        pattern = fields[0]
+        for attr in fields[1:]:
+            name, _, value = attr.lstrip("-!").partition("=")
+            if name not in _VENDOR_ATTRS:
+                continue
+            unset = attr.startswith(("-", "!")) or value.lower() == "false"
+            out.append(("!" if unset else "") + pattern)
+    return out
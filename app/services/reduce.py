@@ -0,0 +1,59 @@
+import re
+from typing import Any, Dict, List, Tuple
+
+_SEVERITY = {"low": 0, "medium": 1, "high": 2}
+
+def _line(value: Any) -> int:
+    # model output: "12", "12-14" and "L12" count as 12, anything else as no line
+    m = re.search(r"\d+", str(value)) if value is not None and not isinstance(value, bool) else None
+    return int(m.group(0)) if m else 0
+
+def parse_rating(value: Any) -> int:
+    """A model's rating_out_of_5 as 1-5: "4", "4/5" and 3.5 all parse; 0 when there is no number."""
+    m = re.search(r"\d+(?:\.\d+)?", str(value)) if value is not None and not isinstance(value, bool) else None
+    return min(5, max(1, round(float(m.group(0))))) if m and float(m.group(0)) else 0
+
+def _issue_key(f: dict) -> Tuple[str, int, str]:
+    issue = re.sub(r"\W+", " ", str(f.get("issue", "")).lower()).strip()
+    return str(f.get("file") or ""), _line(f.get("line")), issue
+
+def merge_reviews(parts: List[Tuple[dict, int]]) -> dict:
+    """Reduce per-shard review dicts into one review.
+
+    `parts` pairs each parsed shard review with the shard's token count. Findings are
+    deduplicated by (file, line, normalised issue text), keeping the highest severity;
+    the rating is the token-weighted mean of the shard ratings.
+    """
+    files: Dict[str, None] = {}
+    findings: Dict[Tuple[str, int, str], dict] = {}
+    weighted, weight = 0.0, 0
+    summaries, conclusions = [], []
+
+    for data, tokens in parts:
+        for path in data.get("files_found", []) or []:
+            files[str(path)] = None
+        for f in data.get("findings", []) or []:
+            if not isinstance(f, dict):
+                continue
+            key = _issue_key(f)
+            seen = findings.get(key)
+            if seen is None or _SEVERITY.get(f.get("severity"), 0) > _SEVERITY.get(seen.get("severity"), 0):
+                findings[key] = f
+        rating = parse_rating(data.get("rating_out_of_5"))
+        if rating:
+            weighted += rating * tokens
+            weight += tokens
+        for text, bucket in ((data.get("summary"), summaries), (data.get("conclusion"), conclusions)):
+            text = str(text or "").strip()
+            if text and text not in bucket:
+                bucket.append(text)
+
+    ordered = sorted(findings.values(), key=lambda f: (-_SEVERITY.get(f.get("severity"), 0),
+                                                        str(f.get("file") or ""), _line(f.get("line"))))
+    return {
+        "files_found": list(files),
+        "rating_out_of_5": round(weighted / weight) if weight else 0,
+        "summary": "\n".join(summaries),
+        "findings": ordered,
+        "conclusion": "\n".join(conclusions),
+    }
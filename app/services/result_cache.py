@@ -0,0 +1,70 @@
+import time, json, hashlib, threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+from app.config import REVIEW_CACHE_TTL, REVIEW_CACHE_MAX_ENTRIES
+from app.models import ReviewResponse
+
+class ResultCache:
+    """TTL + LRU cache of finished reviews.
+
+    Keys use the resolved commit SHA, so a push to the reviewed branch is a natural miss.
+    """
+
+    def __init__(self, ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str, ReviewResponse]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "invalidated": 0}
+
+    @staticmethod
+    def key(owner: str, repo: str, sha: str, assignment: str, level: str, model: str, *options) -> str:
+        raw = json.dumps([owner.lower(), repo.lower(), sha, assignment, level, model, *options])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[ReviewResponse]:
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            expires, _, resp = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return resp.model_copy(deep=True)
+
+    def put(self, key: str, owner: str, repo: str, resp: ReviewResponse):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, f"{owner}/{repo}".lower(), resp.model_copy(deep=True))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, owner: Optional[str] = None, repo: Optional[str] = None) -> int:
+        with self._lock:
+            if owner is None:
+                n = len(self._entries)
+                self._entries.clear()
+            else:
+                name = f"{owner}/{repo}".lower()
+                stale = [k for k, (_, r, _) in self._entries.items() if r == name]
+                for k in stale:
+                    del self._entries[k]
+                n = len(stale)
+            self._stats["invalidated"] += n
+            return n
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries)}
+
+result_cache = ResultCache(REVIEW_CACHE_TTL, REVIEW_CACHE_MAX_ENTRIES)
@@ -0,0 +1,63 @@
+import json, asyncio, hashlib, logging
+from typing import Any, Awaitable, Callable, Dict
+from fastapi import HTTPException
+from app.services.metrics import COALESCED
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """Coalesces identical in-flight work: the first caller for a key runs it and later
+    callers await the same task.
+
+    The work runs in its own task, so a leader that disconnects does not cancel it for the
+    followers. If the leader fails with anything but a client error (4xx), followers do not
+    inherit the failure: one of them starts a fresh attempt and the rest join it.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._stats = {"leaders": 0, "coalesced": 0, "leader_failures": 0, "follower_retries": 0}
+
+    @staticmethod
+    def key(*parts) -> str:
+        raw = json.dumps(parts, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            self._stats["leader_failures"] += 1   # also marks the exception retrieved
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        for attempt in range(2):
+            task = self._inflight.get(key)
+            leader = task is None
+            if leader:
+                task = asyncio.ensure_future(fn())
+                self._inflight[key] = task
+                task.add_done_callback(lambda t, key=key: self._done(key, t))
+                self._stats["leaders"] += 1
+            else:
+                self._stats["coalesced"] += 1
+                COALESCED.inc(level=self.name)
+            try:
+                return await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if leader or not task.cancelled() or attempt:
+                    raise   # our own cancellation, not the shared task's
+            except HTTPException as e:
+                if leader or e.status_code < 500 or attempt:
+                    raise
+            except Exception:
+                if leader or attempt:
+                    raise
+            self._stats["follower_retries"] += 1
+            logger.info("%s leader failed for %s; retrying as a follower", self.name, key[:12])
+
+    def stats(self) -> dict:
+        return {**self._stats, "in_flight": len(self._inflight)}
+
+ingest_flight = SingleFlight("ingest")
+review_flight = SingleFlight("review")
@@ -0,0 +1,93 @@
+import tarfile, zlib
+from typing import Callable, List, Optional, Tuple
+
+BLOCK = 512
+
+def _pax_path(data: bytes) -> Optional[str]:
+    # pax records look like b"<len> <key>=<value>\n"
+    pos = 0
+    while pos < len(data):
+        sp = data.find(b" ", pos)
+        if sp == -1:
+            break
+        length = int(data[pos:sp])
+        key, _, value = data[sp + 1:pos + length].rstrip(b"\n").partition(b"=")
+        if key == b"path":
+            return value.decode("utf-8", "surrogateescape")
+        pos += length
+    return None
+
+class TarStreamReader:
+    """Incremental reader for a gzipped tar stream.
+
+    Feed it raw chunks as they arrive; it returns the completed members that
+    `want(path, size)` accepted and discards everything else without buffering it.
+    Paths are reported without the archive's top-level directory.
+    """
+
+    def __init__(self, want: Callable[[str, int], bool]):
+        self._want = want
+        self._gz = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self._buf = bytearray()
+        self._info: Optional[tarfile.TarInfo] = None
+        self._keep = False
+        self._left = 0
+        self._data = bytearray()
+        self._next_name: Optional[str] = None
+        self.done = False
+
+    def feed(self, chunk: bytes) -> List[Tuple[str, bytes]]:
+        out: List[Tuple[str, bytes]] = []
+        self._buf += self._gz.decompress(chunk)
+        while not self.done:
+            if self._info is None:
+                if len(self._buf) < BLOCK:
+                    break
+                header = bytes(self._buf[:BLOCK])
+                del self._buf[:BLOCK]
+                if not header.strip(b"\0"):
+                    self.done = True  # end-of-archive marker
+                    break
+                self._start(tarfile.TarInfo.frombuf(header, "utf-8", "surrogateescape"))
+                continue
+            if self._left:
+                take = min(self._left, len(self._buf))
+                if not take:
+                    break
+                if self._keep:
+                    self._data += self._buf[:take]
+                del self._buf[:take]
+                self._left -= take
+            if not self._left:
+                self._finish(out)
+        return out
+
+    def _start(self, info: tarfile.TarInfo):
+        self._info = info
+        self._left = -(-info.size // BLOCK) * BLOCK  # data is padded to whole blocks
+        self._data = bytearray()
+        if info.type in (tarfile.XHDTYPE, tarfile.GNUTYPE_LONGNAME):
+            self._keep = True
+        elif info.type in (tarfile.REGTYPE, tarfile.AREGTYPE):
+            name = self._next_name or info.name
+            self._keep = self._want(self._strip_root(name), info.size)
+        else:
+            self._keep = False
+
+    def _finish(self, out: List[Tuple[str, bytes]]):
+        info, data = self._info, bytes(self._data[:self._info.size])
+        self._info, self._data = None, bytearray()
+        if info.type == tarfile.XHDTYPE:
+            self._next_name = _pax_path(data)
+            return
+        if info.type == tarfile.GNUTYPE_LONGNAME:
+            self._next_name = data.rstrip(b"\0").decode("utf-8", "surrogateescape")
+            return
+        if info.type in (tarfile.REGTYPE, tarfile.AREGTYPE) and self._keep:
+            out.append((self._strip_root(self._next_name or info.name), data))
+        if info.type != tarfile.XGLTYPE:
+            self._next_name = None
+
+    @staticmethod
+    def _strip_root(name: str) -> str:
+        return name.split("/", 1)[1] if "/" in name else name
@@ -0,0 +1,93 @@
+import re, json, codecs
+from array import array
+from typing import List, Optional, Tuple
+
+_TREE_KEY = re.compile(r'"tree"\s*:\s*\[')
+_SKIP = re.compile(r"[\s,]*")
+_TRUNCATED = re.compile(r'"truncated"\s*:\s*true')
+
+class RepoTree:
+    """Blob entries of a git tree as parallel arrays (path, size, sha), plus subtree SHAs."""
+
+    __slots__ = ("paths", "sizes", "shas", "dirs", "truncated")
+
+    def __init__(self):
+        self.paths: List[str] = []
+        self.sizes = array("q")
+        self.shas: List[Optional[str]] = []
+        self.dirs: List[Tuple[str, str]] = []   # (path, tree sha), used to walk truncated trees
+        self.truncated = False
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def add(self, path: str, size: int, sha: Optional[str]):
+        self.paths.append(path)
+        self.sizes.append(size)
+        self.shas.append(sha)
+
+    def extend(self, other: "RepoTree", prefix: str = ""):
+        self.paths.extend(prefix + p for p in other.paths)
+        self.sizes.extend(other.sizes)
+        self.shas.extend(other.shas)
+
+    def node(self, i: int) -> dict:
+        return {"path": self.paths[i], "type": "blob", "size": self.sizes[i], "sha": self.shas[i]}
+
+class TreeStreamParser:
+    """Incremental parser for a GitHub tree response.
+
+    Entries are decoded one object at a time as bytes arrive, so the full JSON document
+    (and a dict per entry) never has to be held in memory.
+    """
+
+    def __init__(self):
+        self.tree = RepoTree()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._meta = ""      # text outside the entries array, for the "truncated" flag
+        self._state = "head"
+
+    def feed(self, data: bytes):
+        self._feed_text(self._utf8.decode(data))
+
+    def _feed_text(self, text: str):
+        self._buf += text
+        if self._state == "head":
+            m = _TREE_KEY.search(self._buf)
+            if m is None:
+                return
+            self._meta, self._buf, self._state = self._buf[:m.start()], self._buf[m.end():], "entries"
+        if self._state == "entries":
+            buf, pos = self._buf, 0
+            while True:
+                pos = _SKIP.match(buf, pos).end()
+                if pos >= len(buf):
+                    break
+                if buf[pos] == "]":
+                    self._state, pos = "tail", pos + 1
+                    break
+                try:
+                    entry, pos = self._decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    break   # partial object; wait for more bytes
+                self._add(entry)
+            self._buf = buf[pos:]
+        if self._state == "tail":
+            self._meta += self._buf
+            self._buf = ""
+
+    def _add(self, entry: dict):
+        kind = entry.get("type")
+        if kind == "blob":
+            self.tree.add(entry["path"], entry.get("size") or 0, entry.get("sha"))
+        elif kind == "tree":
+            self.tree.dirs.append((entry["path"], entry.get("sha")))
+
+    def close(self) -> RepoTree:
+        self._feed_text(self._utf8.decode(b"", final=True))
+        if self._state != "tail":
+            raise ValueError("incomplete tree response")
+        self.tree.truncated = bool(_TRUNCATED.search(self._meta))
+        return self.tree
@@ -0,0 +1,40 @@
+import time, logging
+from typing import Dict
+from app.config import WARMUP_CONNECT
+from app.services import ai_service, github_service
+
+logger = logging.getLogger(__name__)
+
+_PROBES = ("/ready", "/metrics")
+_stats: Dict[str, float] = {"ready": 0, "import_seconds": 0.0, "warmup_seconds": 0.0, "first_request_seconds": 0.0}
+
+def record_import(seconds: float):
+    _stats["import_seconds"] = round(seconds, 4)
+
+async def run():
+    """Load the SDKs and build the pooled clients so the first review does not pay for them."""
+    start = time.perf_counter()
+    try:
+        await ai_service.prewarm(WARMUP_CONNECT)
+        await github_service.prewarm(WARMUP_CONNECT)
+    except Exception as e:
+        # a cold client still works; it is only slower on first use
+        logger.warning("Warm-up incomplete: %s", e)
+    _stats["warmup_seconds"] = round(time.perf_counter() - start, 4)
+    _stats["ready"] = 1
+    logger.info("Ready in %.3fs (imports %.3fs)", _stats["warmup_seconds"], _stats["import_seconds"])
+
+def mark_stopping():
+    # shutting down: stop taking traffic from the load balancer before connections close
+    _stats["ready"] = 0
+
+def is_ready() -> bool:
+    return bool(_stats["ready"])
+
+def record_request(path: str, seconds: float):
+    # the first real request after start-up; probes do not count
+    if not _stats["first_request_seconds"] and path not in _PROBES:
+        _stats["first_request_seconds"] = round(seconds, 4)
+
+def stats() -> dict:
+    return dict(_stats)
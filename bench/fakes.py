@@ -0,0 +1,269 @@
+"""Local stand-ins for the GitHub REST API and Mistral chat completions.
+
+Repos are synthetic and derived from their name: `bench/r<N>-<k>` has N files, so any
+number of distinct repos of a given size can be reviewed without storing anything.
+
+    python -m bench.fakes --github-port 9001 --mistral-port 9002 --github-latency-ms 20
+"""
+import io, json, time, base64, random, asyncio, hashlib, tarfile, argparse, threading
+from collections import Counter
+from functools import lru_cache
+from typing import Iterator, List, Tuple
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LINE = "value_{:06d} = compute({:06d})  # synthetic line\n"
+LINE_BYTES = len(LINE.format(0, 0))
+_LAYOUT = (  # (share of files, path template)
+    (70, "src/pkg{d}/mod{i}.py"),
+    (10, "web/components{d}/widget{i}.js"),
+    (8, "tests/pkg{d}/test_mod{i}.py"),
+    (6, "docs/section{d}/page{i}.md"),
+    (6, "node_modules/dep{d}/index{i}.js"),
+)
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha1("/".join(parts).encode("utf-8")).hexdigest()
+
+def repo_size(repo: str) -> int:
+    # "r1000-3" -> 1000 files; anything else is a small 10-file repo
+    head = repo.split("-", 1)[0]
+    return int(head[1:]) if head[:1] == "r" and head[1:].isdigit() else 10
+
+@lru_cache(maxsize=64)
+def repo_files(repo: str) -> Tuple[Tuple[str, int, str], ...]:
+    """(path, size, blob sha) for every file, sorted by path like a git tree."""
+    n, files = repo_size(repo), []
+    for i in range(n):
+        slot = i % 100
+        for share, template in _LAYOUT:
+            if slot < share:
+                break
+            slot -= share
+        path = template.format(d=i // 200, i=i)
+        lines = 10 + int(_digest(repo, path)[:4], 16) % 90
+        files.append((path, lines * LINE_BYTES, _digest(repo, path, "blob")))
+    return tuple(sorted(files))
+
+@lru_cache(maxsize=64)
+def _sizes(repo: str) -> dict:
+    return {p: s for p, s, _ in repo_files(repo)}
+
+def file_text(repo: str, path: str) -> str:
+    size = _sizes(repo)[path]
+    return "".join(LINE.format(j, j) for j in range(size // LINE_BYTES))
+
+def _tarball_chunks(owner: str, repo: str, sha: str) -> Iterator[bytes]:
+    # streamed like codeload: gzip frames go out as members are added
+    buf = io.BytesIO()
+    root = f"{owner}-{repo}-{sha[:7]}"
+    with tarfile.open(fileobj=buf, mode="w|gz") as tar:
+        for path, size, _ in repo_files(repo):
+            data = file_text(repo, path).encode("utf-8")
+            info = tarfile.TarInfo(f"{root}/{path}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+            if buf.tell() >= 64 * 1024:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+    yield buf.getvalue()
+
+def github_app(latency_ms: float = 0, rate_limit: int = 0, reset_window: int = 3600,
+               secondary_rate: float = 0.0) -> FastAPI:
+    """Fake api.github.com. `rate_limit` is requests per token per window (0 = unlimited)."""
+    app = FastAPI()
+    stats: Counter = Counter()
+    budgets = {}
+    lock = threading.Lock()
+
+    def _kind(path: str) -> str:
+        for kind in ("commits", "git/trees", "contents", "tarball", "pulls", "compare"):
+            if f"/{kind}/" in path or path.endswith(f"/{kind}"):
+                return kind
+        return "meta"
+
+    @app.middleware("http")
+    async def github_limits(request: Request, call_next):
+        if request.url.path.startswith("/_"):
+            return await call_next(request)
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        token = request.headers.get("authorization", "anonymous")
+        now = time.time()
+        with lock:
+            stats["calls"] += 1
+            stats[_kind(request.url.path)] += 1
+            remaining, reset = budgets.get(token, (rate_limit, now + reset_window))
+            if reset <= now:
+                remaining, reset = rate_limit, now + reset_window
+        headers = {}
+        if rate_limit:
+            headers = {"X-RateLimit-Limit": str(rate_limit), "X-RateLimit-Reset": str(int(reset)),
+                       "X-RateLimit-Remaining": str(max(remaining - 1, 0))}
+            if remaining <= 0:
+                stats["rate_limited"] += 1
+                headers["X-RateLimit-Remaining"] = "0"
+                return JSONResponse({"message": "API rate limit exceeded"}, status_code=403, headers=headers)
+        if secondary_rate and random.random() < secondary_rate:
+            stats["secondary_limited"] += 1
+            return JSONResponse({"message": "secondary rate limit"}, status_code=403, headers={"Retry-After": "1"})
+        response = await call_next(request)
+        if response.status_code != 304:   # GitHub does not charge conditional hits
+            with lock:
+                budgets[token] = (remaining - 1, reset)
+        response.headers.update(headers)
+        stats["bytes"] += int(response.headers.get("content-length", 0))
+        return response
+
+    def _etagged(request: Request, body: bytes, media_type: str = "application/json") -> Response:
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if request.headers.get("if-none-match") == etag:
+            stats["not_modified"] += 1
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(body, media_type=media_type, headers={"ETag": etag})
+
+    @app.get("/repos/{owner}/{repo}")
+    async def meta(owner: str, repo: str, request: Request):
+        body = {"id": int(_digest(owner, repo)[:6], 16), "full_name": f"{owner}/{repo}", "default_branch": "main"}
+        return _etagged(request, json.dumps(body).encode())
+
+    @app.get("/repos/{owner}/{repo}/commits/{ref:path}")
+    async def commit(owner: str, repo: str, ref: str, request: Request):
+        sha = _digest(owner, repo, "commit")
+        if "sha" in request.headers.get("accept", ""):
+            return _etagged(request, sha.encode(), "text/plain")
+        return _etagged(request, json.dumps({"sha": sha}).encode())
+
+    @app.get("/repos/{owner}/{repo}/git/trees/{sha}")
+    async def tree(owner: str, repo: str, sha: str, request: Request):
+        nodes = [{"path": p, "mode": "100644", "type": "blob", "sha": b, "size": s} for p, s, b in repo_files(repo)]
+        return _etagged(request, json.dumps({"sha": sha, "tree": nodes, "truncated": False}).encode())
+
+    @app.get("/repos/{owner}/{repo}/contents/{path:path}")
+    async def contents(owner: str, repo: str, path: str, request: Request):
+        try:
+            text = file_text(repo, path)
+        except KeyError:
+            return JSONResponse({"message": "Not Found"}, status_code=404)
+        if request.headers.get("accept") == "application/vnd.github.raw":
+            data = text.encode("utf-8")
+            start, _, end = request.headers.get("range", "").partition("bytes=")[2].partition("-")
+            if not start.isdigit():
+                return Response(data, media_type="application/octet-stream")
+            first, last = int(start), min(int(end) if end.isdigit() else len(data) - 1, len(data) - 1)
+            if first >= len(data):
+                return Response(status_code=416, headers={"Content-Range": f"bytes */{len(data)}"})
+            return Response(data[first:last + 1], status_code=206, media_type="application/octet-stream",
+                            headers={"Content-Range": f"bytes {first}-{last}/{len(data)}"})
+        return {"type": "file", "path": path, "size": len(text), "encoding": "base64",
+                "content": base64.b64encode(text.encode("utf-8")).decode("ascii"), "download_url": None}
+
+    @app.get("/repos/{owner}/{repo}/tarball/{ref:path}")
+    async def tarball(owner: str, repo: str, ref: str):
+        return StreamingResponse(_tarball_chunks(owner, repo, _digest(owner, repo, "commit")),
+                                 media_type="application/x-gzip")
+
+    @app.get("/_stats")
+    async def get_stats():
+        return dict(stats)
+
+    @app.post("/_reset")
+    async def reset():
+        stats.clear()
+        budgets.clear()
+        return {}
+
+    return app
+
+def _review_json(prompt: str) -> str:
+    paths = [ln.split("`")[1] for ln in prompt.splitlines() if ln.startswith("- `")]
+    findings = [{"file": p, "line": 1 + i, "severity": ("low", "medium", "high")[i % 3],
+                 "issue": f"Synthetic issue {i}", "suggestion": "Synthetic suggestion"} for i, p in enumerate(paths[:5])]
+    return json.dumps({"files_found": paths, "rating_out_of_5": 3, "summary": "Synthetic review.",
+                       "findings": findings, "conclusion": "Synthetic conclusion."})
+
+def mistral_app(latency_ms: float = 0, ms_per_1k_tokens: float = 0, max_concurrency: int = 0,
+                error_rate: float = 0.0) -> FastAPI:
+    """Fake Mistral chat completions (plain and streamed). Over `max_concurrency` in-flight
+    requests, or with probability `error_rate`, it answers 429 like a rate-limited key."""
+    app = FastAPI()
+    stats: Counter = Counter()
+    in_flight = 0
+
+    @app.post("/v1/chat/completions")
+    async def complete(request: Request):
+        nonlocal in_flight
+        body = await request.json()
+        prompt = "\n".join(m.get("content", "") for m in body.get("messages", []))
+        prompt_tokens = len(prompt) // 4
+        stats["calls"] += 1
+        stats["prompt_tokens"] += prompt_tokens
+        if (max_concurrency and in_flight >= max_concurrency) or (error_rate and random.random() < error_rate):
+            stats["rate_limited"] += 1
+            return JSONResponse({"message": "rate limited"}, status_code=429, headers={"Retry-After": "1"})
+        in_flight += 1
+        stats["peak_in_flight"] = max(stats["peak_in_flight"], in_flight)
+        try:
+            await asyncio.sleep((latency_ms + ms_per_1k_tokens * prompt_tokens / 1000) / 1000)
+        finally:
+            in_flight -= 1
+        content = _review_json(prompt)
+        base = {"id": "bench", "model": body.get("model", "bench"), "created": int(time.time())}
+        if not body.get("stream"):
+            return {**base, "object": "chat.completion",
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                              "total_tokens": prompt_tokens + len(content) // 4},
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}]}
+
+        def events() -> Iterator[str]:
+            for i in range(0, len(content), 64):
+                chunk = {**base, "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": {"content": content[i:i + 64]}, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/_stats")
+    async def get_stats():
+        return dict(stats)
+
+    @app.post("/_reset")
+    async def reset():
+        stats.clear()
+        return {}
+
+    return app
+
+def _serve(apps: List[Tuple[FastAPI, int]]):
+    import uvicorn
+
+    async def main():
+        servers = [uvicorn.Server(uvicorn.Config(a, host="127.0.0.1", port=p, log_level="warning"))
+                   for a, p in apps]
+        await asyncio.gather(*(s.serve() for s in servers))
+    asyncio.run(main())
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--github-port", type=int, default=9001)
+    ap.add_argument("--mistral-port", type=int, default=9002)
+    ap.add_argument("--github-latency-ms", type=float, default=0)
+    ap.add_argument("--github-rate-limit", type=int, default=0, help="requests per token per window (0 = off)")
+    ap.add_argument("--github-reset-window", type=int, default=3600)
+    ap.add_argument("--github-secondary-rate", type=float, default=0.0)
+    ap.add_argument("--mistral-latency-ms", type=float, default=0)
+    ap.add_argument("--mistral-ms-per-1k-tokens", type=float, default=0)
+    ap.add_argument("--mistral-max-concurrency", type=int, default=0)
+    ap.add_argument("--mistral-error-rate", type=float, default=0.0)
+    args = ap.parse_args()
+    _serve([
+        (github_app(args.github_latency_ms, args.github_rate_limit, args.github_reset_window,
+                    args.github_secondary_rate), args.github_port),
+        (mistral_app(args.mistral_latency_ms, args.mistral_ms_per_1k_tokens, args.mistral_max_concurrency,
+                     args.mistral_error_rate), args.mistral_port),
+    ])
+
+if __name__ == "__main__":
+    main()
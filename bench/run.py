@@ -0,0 +1,214 @@
+"""Offline /review benchmark against the local GitHub and Mistral stand-ins.
+
+Starts bench.fakes in a subprocess, points the real app at it and drives /review
+in-process at increasing concurrency for each synthetic repo size. Every request reviews
+a distinct repo, so the result cache never short-circuits a run.
+
+    python -m bench.run --sizes 10,1000,100000 --concurrency 1,8,32 --requests 32
+    python -m bench.run --label after --compare bench/results/before.json
+
+Results are written to bench/results/<label>.json.
+"""
+import os, sys, json, time, socket, asyncio, argparse, platform, subprocess, resource
+from typing import List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "reviews_per_s", "github_calls_per_review", "peak_rss_mb")
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))]
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _start_fakes(args, github_port: int, mistral_port: int) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "bench.fakes",
+           "--github-port", str(github_port), "--mistral-port", str(mistral_port),
+           "--github-latency-ms", str(args.github_latency_ms),
+           "--github-rate-limit", str(args.github_rate_limit),
+           "--github-secondary-rate", str(args.github_secondary_rate),
+           "--mistral-latency-ms", str(args.mistral_latency_ms),
+           "--mistral-ms-per-1k-tokens", str(args.mistral_ms_per_1k_tokens),
+           "--mistral-max-concurrency", str(args.mistral_max_concurrency),
+           "--mistral-error-rate", str(args.mistral_error_rate)]
+    return subprocess.Popen(cmd, cwd=ROOT)
+
+async def _wait_ready(client, urls: List[str], timeout: float = 20):
+    end = time.monotonic() + timeout
+    for url in urls:
+        while True:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    break
+            except Exception:
+                pass
+            if time.monotonic() > end:
+                raise RuntimeError(f"stand-in did not start: {url}")
+            await asyncio.sleep(0.1)
+
+async def _scenario(api, fakes, github_url: str, mistral_url: str, files: int, concurrency: int,
+                    requests: int, seq: List[int]) -> dict:
+    await fakes.post(f"{github_url}/_reset")
+    await fakes.post(f"{mistral_url}/_reset")
+    latencies, errors, peak = [], {}, _rss_mb()
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        seq[0] += 1
+        body = {"assignment_description": "Benchmark assignment", "candidate_level": "Mid",
+                "github_repo_url": f"https://github.com/bench/r{files}-{seq[0]}"}
+        async with sem:
+            start = time.perf_counter()
+            r = await api.post("/review", json=body)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if r.status_code != 200:
+                errors[r.status_code] = errors.get(r.status_code, 0) + 1
+
+    async def sample_rss():
+        nonlocal peak
+        while True:
+            peak = max(peak, _rss_mb())
+            await asyncio.sleep(0.05)
+
+    sampler = asyncio.create_task(sample_rss())
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    wall = time.perf_counter() - started
+    sampler.cancel()
+    gh = (await fakes.get(f"{github_url}/_stats")).json()
+    llm = (await fakes.get(f"{mistral_url}/_stats")).json()
+    return {
+        "files": files,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": round(_percentile(latencies, 50), 1),
+        "p95_ms": round(_percentile(latencies, 95), 1),
+        "p99_ms": round(_percentile(latencies, 99), 1),
+        "reviews_per_s": round(requests / wall, 2),
+        "github_calls_per_review": round(gh.get("calls", 0) / requests, 2),
+        "github_calls": gh,
+        "llm_calls_per_review": round(llm.get("calls", 0) / requests, 2),
+        "llm_rate_limited": llm.get("rate_limited", 0),
+        "peak_rss_mb": round(peak, 1),
+    }
+
+async def _run(args) -> List[dict]:
+    github_port, mistral_port = _free_port(), _free_port()
+    github_url, mistral_url = f"http://127.0.0.1:{github_port}", f"http://127.0.0.1:{mistral_port}"
+    # the app reads its settings at import time, so point it at the stand-ins first
+    os.environ.update({
+        "GITHUB_API_URL": github_url, "MISTRAL_SERVER_URL": mistral_url, "MISTRAL_API_KEY": "bench",
+        "GITHUB_TOKENS": ",".join(f"bench{i}" for i in range(args.github_tokens)),
+        "REVIEW_CACHE_TTL": "0", "BLOB_CACHE_DIR": "",
+    })
+    for item in args.env:
+        key, _, value = item.partition("=")
+        os.environ[key] = value
+    sys.path.insert(0, ROOT)
+
+    import logging
+    import httpx
+    from app.main import app
+    logging.getLogger().setLevel(logging.WARNING)
+
+    proc = _start_fakes(args, github_port, mistral_port)
+    results, seq = [], [0]
+    try:
+        async with httpx.AsyncClient(timeout=None) as fakes, app.router.lifespan_context(app):
+            await _wait_ready(fakes, [f"{github_url}/_stats", f"{mistral_url}/_stats"])
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as api:
+                for files in args.sizes:
+                    for concurrency in args.concurrency:
+                        row = await _scenario(api, fakes, github_url, mistral_url, files, concurrency,
+                                              max(args.requests, concurrency), seq)
+                        results.append(row)
+                        _print_row(row)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return results
+
+def _print_row(row: dict):
+    errors = sum(row["errors"].values())
+    print(f"{row['files']:>7} files  c={row['concurrency']:<4} p50={row['p50_ms']:>8.1f}ms "
+          f"p95={row['p95_ms']:>8.1f}ms p99={row['p99_ms']:>8.1f}ms  {row['reviews_per_s']:>7.2f} rev/s  "
+          f"gh={row['github_calls_per_review']:>6.2f}/rev  rss={row['peak_rss_mb']:>7.1f}MB"
+          + (f"  errors={errors}" if errors else ""), flush=True)
+
+def _compare(results: List[dict], baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = {(r["files"], r["concurrency"]): r for r in json.load(f)["results"]}
+    print(f"\nvs {baseline_path}:")
+    for row in results:
+        old = baseline.get((row["files"], row["concurrency"]))
+        if not old:
+            continue
+        deltas = []
+        for m in METRICS:
+            if old.get(m):
+                deltas.append(f"{m}={(row[m] - old[m]) / old[m] * 100:+.1f}%")
+        print(f"{row['files']:>7} files  c={row['concurrency']:<4} " + "  ".join(deltas))
+
+def _ints(text: str) -> List[int]:
+    return [int(x) for x in text.split(",") if x.strip()]
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=_ints, default=_ints("10,100,1000,10000,100000"), help="files per repo")
+    ap.add_argument("--concurrency", type=_ints, default=_ints("1,4,16,64"))
+    ap.add_argument("--requests", type=int, default=32, help="reviews per scenario (at least the concurrency)")
+    ap.add_argument("--github-latency-ms", type=float, default=20)
+    ap.add_argument("--github-rate-limit", type=int, default=0, help="per token per hour; 0 = unlimited")
+    ap.add_argument("--github-secondary-rate", type=float, default=0.0)
+    ap.add_argument("--github-tokens", type=int, default=1)
+    ap.add_argument("--mistral-latency-ms", type=float, default=500)
+    ap.add_argument("--mistral-ms-per-1k-tokens", type=float, default=20)
+    ap.add_argument("--mistral-max-concurrency", type=int, default=0)
+    ap.add_argument("--mistral-error-rate", type=float, default=0.0)
+    ap.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra app settings")
+    ap.add_argument("--label", help="results file name (default: <timestamp>-<commit>)")
+    ap.add_argument("--out", default=os.path.join(ROOT, "bench", "results"))
+    ap.add_argument("--compare", metavar="RESULTS.json", help="print deltas against an earlier run")
+    args = ap.parse_args()
+
+    commit = _commit()
+    started = time.strftime("%Y%m%dT%H%M%S")
+    results = asyncio.run(_run(args))
+    label = args.label or f"{started}-{commit or 'nogit'}"
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"{label}.json")
+    with open(path, "w") as f:
+        json.dump({"label": label, "commit": commit, "started_at": started, "python": platform.python_version(),
+                   "settings": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "label")},
+                   "results": results}, f, indent=2)
+    print(f"\nsaved {path}")
+    if args.compare:
+        _compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
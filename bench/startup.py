@@ -0,0 +1,118 @@
+"""Cold-start benchmark: how long a fresh uvicorn worker takes to serve its first review.
+
+Each run starts `uvicorn app.main:app` in a new process against the bench.fakes stand-ins
+and records time to first accepted request, time to GET /ready, the app's own import and
+warm-up timings, and the latency of the first /review.
+
+    python -m bench.startup --runs 5
+    python -m bench.startup --runs 5 --env FAST_STARTUP=1 --label fast --compare bench/results/startup-before.json
+
+Results are written to bench/results/startup-<label>.json.
+"""
+import os, sys, json, time, asyncio, argparse, platform, subprocess
+from types import SimpleNamespace
+from typing import List
+
+from bench.run import ROOT, _free_port, _start_fakes, _wait_ready, _commit, _percentile
+
+METRICS = ("listening_ms", "ready_ms", "first_review_ms", "import_ms")
+
+async def _cold_start(env: dict, port: int, seq: int) -> dict:
+    import httpx
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+                             "--log-level", "warning"], cwd=ROOT, env=env)
+    base = f"http://127.0.0.1:{port}"
+    row = {}
+    try:
+        async with httpx.AsyncClient(base_url=base, timeout=None) as api:
+            while "ready_ms" not in row:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with {proc.returncode}")
+                try:
+                    r = await api.get("/ready")
+                except httpx.TransportError:
+                    await asyncio.sleep(0.005)
+                    continue
+                row.setdefault("listening_ms", round((time.perf_counter() - started) * 1000, 1))
+                if r.status_code == 200:
+                    row["ready_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                    row["import_ms"] = round(r.json()["import_seconds"] * 1000, 1)
+                    row["warmup_ms"] = round(r.json()["warmup_seconds"] * 1000, 1)
+                else:
+                    await asyncio.sleep(0.005)
+            body = {"assignment_description": "Benchmark assignment", "candidate_level": "Mid",
+                    "github_repo_url": f"https://github.com/bench/r100-cold{seq}"}
+            start = time.perf_counter()
+            r = await api.post("/review", json=body)
+            row["first_review_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            row["status"] = r.status_code
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return row
+
+async def _run(args) -> List[dict]:
+    github_port, mistral_port = _free_port(), _free_port()
+    github_url, mistral_url = f"http://127.0.0.1:{github_port}", f"http://127.0.0.1:{mistral_port}"
+    env = {**os.environ, "GITHUB_API_URL": github_url, "MISTRAL_SERVER_URL": mistral_url, "MISTRAL_API_KEY": "bench",
+           "GITHUB_TOKENS": "bench0", "REVIEW_CACHE_TTL": "0", "BLOB_CACHE_DIR": "", "LOG_FILE": "",
+           "PYTHONPATH": ROOT}
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    fakes_args = SimpleNamespace(github_latency_ms=args.github_latency_ms, github_rate_limit=0,
+                                 github_secondary_rate=0.0, mistral_latency_ms=args.mistral_latency_ms,
+                                 mistral_ms_per_1k_tokens=0, mistral_max_concurrency=0, mistral_error_rate=0.0)
+    import httpx
+    proc = _start_fakes(fakes_args, github_port, mistral_port)
+    rows = []
+    try:
+        async with httpx.AsyncClient() as fakes:
+            await _wait_ready(fakes, [f"{github_url}/_stats", f"{mistral_url}/_stats"])
+        for i in range(args.runs):
+            row = await _cold_start(env, _free_port(), i)
+            rows.append(row)
+            print(f"run {i + 1}: listening={row['listening_ms']:.1f}ms ready={row['ready_ms']:.1f}ms "
+                  f"import={row['import_ms']:.1f}ms warmup={row['warmup_ms']:.1f}ms "
+                  f"first review={row['first_review_ms']:.1f}ms ({row['status']})", flush=True)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return rows
+
+def _summary(rows: List[dict]) -> dict:
+    return {f"p50_{m}": round(_percentile([r[m] for r in rows], 50), 1) for m in METRICS}
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--github-latency-ms", type=float, default=20)
+    ap.add_argument("--mistral-latency-ms", type=float, default=500)
+    ap.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra app settings")
+    ap.add_argument("--label", help="results file name (default: <timestamp>-<commit>)")
+    ap.add_argument("--out", default=os.path.join(ROOT, "bench", "results"))
+    ap.add_argument("--compare", metavar="RESULTS.json", help="print deltas against an earlier run")
+    args = ap.parse_args()
+
+    commit = _commit()
+    started = time.strftime("%Y%m%dT%H%M%S")
+    rows = asyncio.run(_run(args))
+    summary = _summary(rows)
+    print("  ".join(f"{k}={v}ms" for k, v in summary.items()))
+    label = args.label or f"{started}-{commit or 'nogit'}"
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"startup-{label}.json")
+    with open(path, "w") as f:
+        json.dump({"label": label, "commit": commit, "started_at": started, "python": platform.python_version(),
+                   "settings": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "label")},
+                   "summary": summary, "runs": rows}, f, indent=2)
+    print(f"\nsaved {path}")
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)["summary"]
+        print(f"vs {args.compare}: " + "  ".join(
+            f"{k}={(v - old[k]) / old[k] * 100:+.1f}%" for k, v in summary.items() if old.get(k)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import base64
+
+import httpx
+import pytest
+
+import app.services.analysis as analysis
+import app.services.github_service as gh
+from app.services.blob_cache import BlobCache
+from app.services.packer import RepoFile, pack_files, render_pack, estimate_tokens
+
+LOGIN = '''
+import subprocess
+from fastapi import APIRouter
+
+router = APIRouter()
+
+@router.post("/login")
+def login(db, user, password):
+    if not user or not password:
+        return None
+    row = db.execute(f"SELECT * FROM users WHERE name = '{user}'")
+    for attempt in range(3):
+        if row and row.password == password:
+            subprocess.run(["audit", user])
+            return row
+    return None
+'''
+CONSTANTS = "".join(f"VALUE_{i} = {i}\n" for i in range(40))
+
+
+def test_analyze_text_collects_signals():
+    login = analysis.analyze_text("src/auth/login.py", LOGIN)
+    assert login.parsed and login.entry_point
+    assert login.risky == ["sql string", "subprocess"]
+    assert login.complexity == 6                      # 1 + if, or, for, if, and
+    assert login.notes() == "risk 0.54; complexity 6; sql string, subprocess; entry point"
+
+    consts = analysis.analyze_text("aaa_constants.py", CONSTANTS)
+    assert consts.risky == [] and not consts.entry_point and consts.complexity == 1
+    assert consts.risk < login.risk
+
+    assert analysis.analyze_text("broken.py", "def f(:\n").parsed is False
+    js = analysis.analyze_text("web/app.js", "const q = 'SELECT * FROM t WHERE id=' + id;\nel.innerHTML = q;\n")
+    assert js.risky == ["raw HTML", "sql string"] and js.entry_point
+    assert analysis.analyze_text("README.md", "# eval(x)\n", code=False).risky == []
+
+
+@pytest.mark.asyncio
+async def test_risk_drives_selection_order_and_prompt_notes():
+    files = [RepoFile("aaa_constants.py", len(CONSTANTS), CONSTANTS, "s1"),
+             RepoFile("src/auth/login.py", len(LOGIN), LOGIN, "s2")]
+    budget = max(estimate_tokens(CONSTANTS), estimate_tokens(LOGIN)) + 5
+
+    assert [f.path for f in pack_files(files, budget).files] == ["aaa_constants.py"]
+
+    ranked = await analysis.analyze_files(files)
+    pack = pack_files(ranked, budget)
+
+    assert [f.path for f in ranked] == ["src/auth/login.py", "aaa_constants.py"]
+    assert [f.path for f in pack.files] == ["src/auth/login.py"]
+    assert "- `src/auth/login.py` (" in render_pack(pack)
+    assert "sql string, subprocess; entry point]" in render_pack(pack)
+
+
+@pytest.mark.asyncio
+async def test_process_pool_matches_inline_analysis(monkeypatch):
+    files = [RepoFile(f"src/m{i}.py", len(LOGIN), LOGIN if i % 2 else CONSTANTS) for i in range(6)]
+    inline = await analysis.analyze_files(files)
+
+    monkeypatch.setattr(analysis, "ANALYSIS_WORKERS", 2)
+    monkeypatch.setattr(analysis, "ANALYSIS_MIN_BYTES", 0)
+    try:
+        pooled = await analysis.analyze_files(files)
+        assert analysis._pool is not None
+    finally:
+        analysis.shutdown()
+
+    assert pooled == inline
+
+
+@pytest.mark.asyncio
+async def test_partial_previews_get_no_parse_or_size_signal():
+    cut = LOGIN[:LOGIN.index("subprocess.run") + 20]          # a streamed head, cut mid-statement
+    whole = analysis.analyze_text("src/auth/login.py", LOGIN)
+
+    [f] = await analysis.analyze_files([RepoFile("src/auth/login.py", len(LOGIN), cut, "s2", partial=True)])
+    sig = analysis.analyze_text("src/auth/login.py", cut, partial=True)
+
+    assert sig.parsed is None and "does not parse" not in f.notes
+    assert "subprocess" in sig.risky and sig.entry_point
+    assert analysis.analyze_text("src/auth/login.py", cut).parsed is False   # the same text as a whole file
+    assert analysis.analyze_text("x.py", "\n" * 2000, partial=True).risk == analysis.analyze_text("x.py", "").risk
+    assert whole.parsed is True
+
+
+@pytest.mark.asyncio
+async def test_risky_paths_are_fetched_ahead_of_the_file_cap(monkeypatch):
+    files = {f"aaa_{i}.py": f"X = {i}\n" for i in range(5)}
+    files.update({"src/auth/login.py": LOGIN, "tests/test_auth.py": "def test_x():\n    pass\n"})
+
+    def handler(request: httpx.Request):
+        url = str(request.url)
+        if "/git/trees/" in url:
+            return httpx.Response(200, json={"tree": [
+                {"path": p, "type": "blob", "size": len(t), "sha": f"b{n}"} for n, (p, t) in enumerate(files.items())]})
+        if "/contents/" in url:
+            text = files[url.split("/contents/")[1].split("?")[0]]
+            return httpx.Response(200, json={"encoding": "base64", "size": len(text),
+                                             "content": base64.b64encode(text.encode()).decode()})
+        return httpx.Response(404)
+
+    monkeypatch.setattr(gh, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(gh, "blob_cache", BlobCache(None, 1_000_000, 0))
+    monkeypatch.setattr(gh, "_etags", gh.OrderedDict())
+    monkeypatch.setattr(gh, "_trees", gh.OrderedDict())
+    monkeypatch.setattr(gh, "_matchers", gh.OrderedDict())
+    monkeypatch.setattr(gh, "INGEST_MODE", "contents")
+
+    out = await gh.fetch_repo_files("https://github.com/o/r", gh.RepoTarget("o", "r", "HEAD", "abc"), max_files=3)
+
+    fetched = [f.path for f in out if f.content is not None]
+    assert fetched[0] == "src/auth/login.py"               # alphabetically behind all five aaa_*.py
+    assert "tests/test_auth.py" not in fetched
+    assert analysis.path_risk("src/auth/login.py") > analysis.path_risk("aaa_0.py") > analysis.path_risk("tests/test_auth.py")
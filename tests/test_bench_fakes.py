@@ -0,0 +1,33 @@
+from fastapi.testclient import TestClient
+
+from app.services.tarball import TarStreamReader
+from bench.fakes import github_app, mistral_app, repo_files
+
+
+def test_fake_github_serves_synthetic_repo_with_rate_limits():
+    gh = TestClient(github_app(rate_limit=3))
+    files = repo_files("r100-1")
+    assert len(files) == 100
+    assert [p for p, _, _ in files] == sorted(p for p, _, _ in files)
+
+    tree = gh.get("/repos/bench/r100-1/git/trees/abc")
+    assert len(tree.json()["tree"]) == 100
+    assert tree.headers["X-RateLimit-Remaining"] == "2"
+    assert gh.get("/repos/bench/r100-1/git/trees/abc", headers={"If-None-Match": tree.headers["etag"]}).status_code == 304
+
+    reader = TarStreamReader(lambda path, size: True)
+    got = dict(reader.feed(gh.get("/repos/bench/r100-1/tarball/main").content))
+    path, size, _ = files[0]
+    assert len(got) == 100 and len(got[path]) == size
+
+    assert gh.get("/repos/bench/r100-1").status_code == 200   # third charged call; the 304 was free
+    assert gh.get("/repos/bench/r100-1").status_code == 403
+    assert gh.get("/_stats").json()["rate_limited"] == 1
+
+
+def test_fake_mistral_answers_review_json():
+    llm = TestClient(mistral_app())
+    body = {"model": "m", "messages": [{"role": "user", "content": "- `src/a.py` (10 bytes)\n"}]}
+    content = llm.post("/v1/chat/completions", json=body).json()["choices"][0]["message"]["content"]
+    assert '"files_found": ["src/a.py"]' in content
+    assert llm.post("/v1/chat/completions", json={**body, "stream": True}).text.endswith("data: [DONE]\n\n")
@@ -0,0 +1,66 @@
+import asyncio
+
+from app.services.blob_cache import BlobCache
+
+
+def test_memory_lru_evicts_least_recent():
+    cache = BlobCache(None, memory_bytes=10, disk_bytes=0)
+    cache.put("a", "aaaa")
+    cache.put("b", "bbbb")
+    assert cache.get("a") == "aaaa"   # a is now most recent
+    cache.put("c", "cccc")            # over 10 chars: evicts b
+
+    assert cache.get("b") is None
+    assert cache.get("c") == "cccc"
+    stats = cache.stats()
+    assert stats["memory_evictions"] == 1
+    assert stats["memory_hits"] == 2
+    assert stats["misses"] == 1
+
+
+def test_disk_tier_survives_memory_eviction_and_restart(tmp_path):
+    cache = BlobCache(str(tmp_path), memory_bytes=5, disk_bytes=1000)
+    cache.put("a1", "hello")
+    cache.put("b2", "world")          # pushes a1 out of memory
+
+    assert cache.get("a1") == "hello"
+    assert cache.stats()["disk_hits"] == 1
+
+    reopened = BlobCache(str(tmp_path), memory_bytes=5, disk_bytes=1000)
+    assert reopened.stats()["disk_entries"] == 0   # the index is built on first disk access
+    assert reopened.get("b2") == "world"
+    assert reopened.stats()["disk_entries"] == 2
+
+
+def test_disk_tier_is_bounded(tmp_path):
+    cache = BlobCache(str(tmp_path), memory_bytes=0, disk_bytes=12)
+    cache.put("a1", "aaaaa")
+    cache.put("b2", "bbbbb")
+    cache.put("c3", "ccccc")          # 15 bytes > 12: evicts a1 from disk
+
+    stats = cache.stats()
+    assert stats["disk_evictions"] == 1
+    assert stats["disk_bytes"] == 10
+    assert cache.get("a1") is None
+    assert not (tmp_path / "a1" / "a1").exists()
+
+
+def test_async_access_uses_worker_threads(tmp_path, monkeypatch):
+    cache = BlobCache(str(tmp_path), memory_bytes=5, disk_bytes=1000)
+    offloaded = []
+    to_thread = asyncio.to_thread
+
+    async def spy(fn, *args):
+        offloaded.append(fn.__name__)
+        return await to_thread(fn, *args)
+
+    monkeypatch.setattr(asyncio, "to_thread", spy)
+
+    async def go():
+        await cache.aput("a1", "hello")
+        await cache.aput("b2", "world")     # a1 only on disk now
+        return await cache.aget("a1"), await cache.aget("b2")
+
+    assert asyncio.run(go()) == ("hello", "world")
+    assert offloaded == ["_write_disk", "_write_disk", "_get_disk", "_get_disk"]
+    assert (tmp_path / "a1" / "a1").read_text() == "hello"
@@ -0,0 +1,131 @@
+import json
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+import app.services.ai_service as ai
+from app.main import app
+from app.services.ai_service import MISTRAL_MODEL
+from app.services.findings_store import FindingsStore
+from app.services.github_service import RepoTarget
+from app.services.packer import RepoFile
+from app.services.result_cache import ResultCache
+
+client = TestClient(app)
+
+FILES = [RepoFile(f"src/m{i}.py", 20, f"value = {i}\n", f"s{i}") for i in range(6)]
+BODY = {"assignment_description": "x", "github_repo_url": "https://github.com/o/r",
+        "candidate_level": "Mid", "mode": "cascade"}
+
+
+def _setup(monkeypatch, triage):
+    calls = {"triage": [], "review": []}
+
+    async def fake_resolve_repo(url):
+        return RepoTarget("o", "r", "HEAD", "abc")
+    async def fake_fetch_repo_files(url, target=None, **caps):
+        return FILES
+    async def fake_triage(assignment_description, repo_contents, candidate_level):
+        calls["triage"].append(repo_contents)
+        return triage()
+    async def fake_review(assignment_description, repo_contents, candidate_level, model="default"):
+        calls["review"].append((model, repo_contents))
+        return json.dumps({"files_found": [], "rating_out_of_5": 3, "summary": "s", "findings": [],
+                           "conclusion": "c"})
+    monkeypatch.setattr("app.routes.resolve_repo", fake_resolve_repo)
+    monkeypatch.setattr("app.routes.fetch_repo_files", fake_fetch_repo_files)
+    monkeypatch.setattr("app.routes.triage_files", fake_triage)
+    monkeypatch.setattr("app.routes.generate_review", fake_review)
+    monkeypatch.setattr("app.routes.result_cache", ResultCache(ttl=60, max_entries=8))
+    return calls
+
+
+def test_cascade_reviews_only_flagged_files(monkeypatch):
+    risks = {"src/m1.py": 0.9, "src/m4.py": 0.7}
+    calls = _setup(monkeypatch, lambda: json.dumps({"files": [
+        {"file": f.path, "risk": risks.get(f.path, 0.1), "reason": f"why {f.path}"} for f in FILES]}))
+
+    body = client.post("/review", json=BODY).json()
+
+    assert len(calls["triage"]) == 1 and len(calls["review"]) == 1
+    model, prompt = calls["review"][0]
+    notes, files = prompt.split("# Repository Files")
+    assert "- `src/m1.py`" in files and "- `src/m4.py`" in files and "- `src/m0.py`" not in files
+    assert "- `src/m0.py` (risk 0.10): why src/m0.py" in notes and "src/m1.py" not in notes
+    assert model == body["cascade"]["review_model"]
+    assert body["cascade"]["flagged"] == ["src/m1.py", "src/m4.py"]
+    assert body["cascade"]["triaged_files"] == 6 and body["cascade"]["fallback"] is None
+
+
+def test_cascade_falls_back_to_a_full_review(monkeypatch):
+    calls = _setup(monkeypatch, lambda: "not json")
+
+    body = client.post("/review", json=BODY).json()
+
+    _, prompt = calls["review"][0]
+    assert "# Triage Notes" not in prompt
+    assert all(f"- `{f.path}`" in prompt for f in FILES)
+    assert body["cascade"]["fallback"] == "triage failed"
+
+    calls = _setup(monkeypatch, lambda: json.dumps({"files": [{"file": f.path, "risk": 0.8} for f in FILES]}))
+    body = client.post("/review", json=BODY).json()
+    assert body["cascade"]["fallback"] == "most files flagged" and body["cascade"]["flagged"] == []
+
+
+def test_models_report_usage_per_tier(monkeypatch):
+    async def complete_async(model, messages, **kwargs):
+        text = (json.dumps({"files": [{"file": "src/m2.py", "risk": 0.9, "reason": "r"}]})
+                if "triaging" in messages[0]["content"] else
+                json.dumps({"files_found": [], "rating_out_of_5": 3, "summary": "s", "findings": [],
+                            "conclusion": "c"}))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+                               usage=SimpleNamespace(prompt_tokens=len(messages[1]["content"]), completion_tokens=7))
+    _setup(monkeypatch, lambda: None)
+    monkeypatch.setattr("app.routes.triage_files", ai.triage_files)
+    monkeypatch.setattr("app.routes.generate_review", ai.generate_review)
+    monkeypatch.setattr(ai, "_client", SimpleNamespace(chat=SimpleNamespace(complete_async=complete_async)))
+
+    body = client.post("/review", json=BODY).json()
+
+    tiers = {m["tier"]: m for m in body["models"]}
+    assert set(tiers) == {"triage", "review"}
+    assert tiers["triage"]["model"] == body["cascade"]["triage_model"]
+    assert tiers["review"]["calls"] == 1 and tiers["review"]["completion_tokens"] == 7
+    assert tiers["triage"]["prompt_tokens"] > 0 and tiers["triage"]["latency_ms"] >= 0
+
+
+def test_cascade_reports_files_nobody_saw_as_dropped(monkeypatch):
+    calls = _setup(monkeypatch, lambda: json.dumps({"files": [{"file": "src/m1.py", "risk": 0.9, "reason": "r"}]}))
+    monkeypatch.setattr("app.routes.fetch_repo_files",
+                        lambda url, target=None, **caps: _async(FILES + [RepoFile("src/z.py", 99, None)]))
+
+    body = client.post("/review", json={**BODY, "max_tokens": 12}).json()
+
+    triaged = [line.split("`")[1] for line in calls["triage"][0].splitlines() if line.startswith("- `")]
+    assert len(triaged) < len(FILES)
+    assert body["truncated"] is True
+    assert body["packing"]["dropped"] == [f.path for f in FILES if f.path not in triaged] + ["src/z.py"]
+    assert body["cascade"]["flagged"] == ["src/m1.py"]
+
+
+async def _async(value):
+    return value
+
+
+def test_cascade_findings_are_stored_under_the_review_model(monkeypatch):
+    calls = _setup(monkeypatch, lambda: json.dumps({"files": [{"file": "src/m1.py", "risk": 0.9, "reason": "r"}]}))
+    async def fake_review(assignment_description, repo_contents, candidate_level, model="default"):
+        calls["review"].append((model, repo_contents))
+        return json.dumps({"files_found": ["src/m1.py"], "rating_out_of_5": 3, "summary": "s", "conclusion": "c",
+                           "findings": [{"file": "src/m1.py", "line": 1, "severity": "high", "issue": "i",
+                                         "suggestion": "s"}]})
+    store = FindingsStore(max_entries=8)
+    monkeypatch.setattr("app.routes.generate_review", fake_review)
+    monkeypatch.setattr("app.routes.findings_store", store)
+    monkeypatch.setattr("app.routes.CASCADE_REVIEW_MODEL", "large-model")
+
+    client.post("/review", json=BODY)
+
+    assert calls["review"][0][0] == "large-model"
+    assert store.get("s1", store.context("x", "Mid", "large-model"))[0]["issue"] == "i"
+    assert store.get("s1", store.context("x", "Mid", MISTRAL_MODEL)) is None
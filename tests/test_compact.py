@@ -0,0 +1,70 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.compact import compact_files, skip_reason, strip_text
+from app.services.github_service import RepoTarget
+from app.services.packer import RepoFile
+from app.services.result_cache import ResultCache
+
+client = TestClient(app)
+
+BANNER = "".join(f"# Copyright 2024 Example Corp. Licensed under the Apache License {i}\n" for i in range(12))
+SOURCE = "#!/usr/bin/env python\n" + BANNER + "import os   \n\n\n\ndef run():    \n    return os.getcwd()\n"
+
+
+def test_strip_keeps_line_numbers():
+    out = strip_text(SOURCE)
+
+    assert out.count("\n") == SOURCE.count("\n")
+    assert out.splitlines()[1] == "(license header, lines 2-13, omitted)"
+    assert out.splitlines()[13] == "import os" and out.splitlines()[17] == "def run():"
+    assert "Copyright" not in out and len(out) < len(SOURCE) / 3
+    assert strip_text("# see LICENSE\nx = 1\n") == "# see LICENSE\nx = 1\n"   # not a banner
+
+
+def test_skip_reason_detects_unreviewable_files():
+    assert skip_reason("package-lock.json", '{"lockfileVersion": 3}') == "lockfile"
+    assert skip_reason("web/vendor.min.js", "var a=1;") == "minified"
+    assert skip_reason("web/app.js", "var a=1;" * 500) == "minified"
+    assert skip_reason("api/types_pb2.py", "# Generated by the protocol buffer compiler.  DO NOT EDIT!\n") == "generated"
+    assert skip_reason("README.md", "Generated by create-app.\n" + "long prose " * 200) is None
+    assert skip_reason("src/app.js", "const a = 1;\nconst b = 2;\n") is None
+
+
+def test_review_reports_compaction_and_prompt_skips_noise(monkeypatch):
+    files = [
+        RepoFile("src/app.py", len(SOURCE), SOURCE, "blob1"),
+        RepoFile("vendor/copy/app.py", len(SOURCE), SOURCE, "blob1"),
+        RepoFile("static/app.min.js", 4000, "var a=1;" * 500, "blob2"),
+        RepoFile("package-lock.json", 30, '{"lockfileVersion": 3}', "blob3"),
+    ]
+    prompts = []
+
+    async def fake_resolve_repo(url):
+        return RepoTarget("o", "r", "HEAD", "abc")
+    async def fake_fetch_repo_files(url, target=None, **caps):
+        return files
+    async def fake_generate_review(assignment_description, repo_contents, candidate_level):
+        prompts.append(repo_contents)
+        return json.dumps({"files_found": ["src/app.py"], "rating_out_of_5": 4, "summary": "s",
+                           "findings": [{"file": "src/app.py", "line": 18, "severity": "low",
+                                         "issue": "i", "suggestion": "s"}], "conclusion": "c"})
+    monkeypatch.setattr("app.routes.resolve_repo", fake_resolve_repo)
+    monkeypatch.setattr("app.routes.fetch_repo_files", fake_fetch_repo_files)
+    monkeypatch.setattr("app.routes.generate_review", fake_generate_review)
+    monkeypatch.setattr("app.routes.result_cache", ResultCache(ttl=60, max_entries=8))
+
+    body = client.post("/review", json={"assignment_description": "x", "github_repo_url": "https://github.com/o/r",
+                                        "candidate_level": "Mid"}).json()
+
+    assert body["compaction"]["duplicates"] == {"src/app.py": ["vendor/copy/app.py"]}
+    assert body["compaction"]["skipped"] == {"static/app.min.js": "minified", "package-lock.json": "lockfile"}
+    assert body["compaction"]["stripped_files"] == 1
+    assert body["compaction"]["tokens_saved"] > body["compaction"]["tokens_after"] > 0
+    assert body["packing"]["included"] == ["src/app.py"]
+    assert "identical at `vendor/copy/app.py`" in prompts[0] and "var a=1" not in prompts[0]
+
+    kept, report = compact_files(files[:1])
+    assert kept[0].sha == "blob1" and report.duplicates == {}
@@ -0,0 +1,131 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app.services.github_service as gh
+from app.main import app
+from app.services.blob_cache import BlobCache
+from app.services.diff import render_patch
+from app.services.findings_store import FindingsStore
+from app.services.github_service import RepoTarget
+from app.services.packer import RepoFile
+from app.services.result_cache import ResultCache
+
+client = TestClient(app)
+
+
+def test_parse_repo_understands_pr_and_compare_urls():
+    assert gh._parse_repo("https://github.com/o/r/tree/feature/x") == gh.RepoUrl("o", "r", "feature/x")
+    assert gh._parse_repo("https://github.com/o/r/pull/42/files") == gh.RepoUrl("o", "r", "HEAD", pull=42)
+    assert gh._parse_repo("https://github.com/o/r/compare/main...dev") == gh.RepoUrl("o", "r", "dev", base="main")
+    assert gh.is_diff_url("https://github.com/o/r/pull/42")
+    assert not gh.is_diff_url("https://github.com/o/r.git")
+
+
+def test_render_patch_numbers_new_side_lines():
+    patch = "@@ -10,3 +10,4 @@ def f():\n ctx\n-old\n+new\n+more\n ctx2"
+    lines = render_patch(patch).splitlines()
+    assert lines[0].startswith("@@ -10,3 +10,4 @@")
+    assert lines[1:] == ["    10 | ctx", "-      | old", "+   11 | new", "+   12 | more", "    13 | ctx2"]
+
+
+@pytest.mark.asyncio
+async def test_fetch_diff_for_pull_request(monkeypatch):
+    def handler(request: httpx.Request):
+        url = str(request.url)
+        if "/pulls/7" in url:
+            return httpx.Response(200, json={"base": {"sha": "b1"}, "head": {"sha": "h1"}})
+        if "/compare/b1...h1" in url:
+            return httpx.Response(200, json={"files": [
+                {"filename": "src/a.py", "status": "modified", "sha": "a2", "patch": "@@ -1 +1 @@\n-x\n+y"},
+                {"filename": "src/gone.py", "status": "removed", "sha": None},
+                {"filename": "node_modules/x.js", "status": "added", "sha": "n1", "patch": "+z"},
+            ]})
+        if "/git/trees/h1" in url:
+            return httpx.Response(200, json={"tree": [
+                {"path": "src/a.py", "type": "blob", "size": 5, "sha": "a2"},
+                {"path": "src/b.py", "type": "blob", "size": 5, "sha": "bbb"},
+            ]})
+        return httpx.Response(200, json={"id": 1})
+
+    monkeypatch.setattr(gh, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(gh, "blob_cache", BlobCache(None, 1_000_000, 0))
+    monkeypatch.setattr(gh, "_etags", gh.OrderedDict())
+
+    target = await gh.resolve_diff("https://github.com/o/r/pull/7")
+    changed, unchanged = await gh.fetch_diff(target)
+
+    assert target == gh.DiffTarget("o", "r", "b1", "h1")
+    assert [f.path for f in changed] == ["src/a.py"]
+    assert [(f.path, f.sha, f.content) for f in unchanged] == [("src/b.py", "bbb", None)]
+
+
+def test_diff_review_reuses_findings_for_unchanged_blobs(monkeypatch):
+    prompts = []
+
+    async def fake_resolve_repo(url):
+        return RepoTarget("o", "r", "HEAD", "base")
+    async def fake_fetch_repo_files(url, target=None, **caps):
+        return [RepoFile("src/a.py", 6, "x = 1\n", "a1"), RepoFile("src/b.py", 6, "y = 2\n", "b1")]
+    async def fake_resolve_diff(url, base_ref=None):
+        assert base_ref == "main"
+        return gh.DiffTarget("o", "r", "base", "head")
+    async def fake_fetch_diff(target):
+        changed = [gh.DiffFile("src/a.py", "modified", "a2", 1, 1, "@@ -1 +1 @@\n-x = 1\n+x = 3")]
+        return changed, [RepoFile("src/b.py", 6, None, "b1")]
+    async def fake_generate_review(assignment_description, repo_contents, candidate_level):
+        prompts.append(repo_contents)
+        return json.dumps({"files_found": ["src/a.py", "src/b.py"], "rating_out_of_5": 3, "summary": "s",
+                           "conclusion": "c", "findings": [
+                               {"file": "src/b.py", "line": 1, "severity": "low", "issue": "Name", "suggestion": "s"}]})
+
+    monkeypatch.setattr("app.routes.resolve_repo", fake_resolve_repo)
+    monkeypatch.setattr("app.routes.fetch_repo_files", fake_fetch_repo_files)
+    monkeypatch.setattr("app.routes.resolve_diff", fake_resolve_diff)
+    monkeypatch.setattr("app.routes.fetch_diff", fake_fetch_diff)
+    monkeypatch.setattr("app.routes.generate_review", fake_generate_review)
+    monkeypatch.setattr("app.routes.result_cache", ResultCache(ttl=60, max_entries=8))
+    monkeypatch.setattr("app.routes.findings_store", FindingsStore(max_entries=8))
+
+    body = {"assignment_description": "x", "github_repo_url": "https://github.com/o/r", "candidate_level": "Mid"}
+    assert client.post("/review", json=body).status_code == 200
+    diff = client.post("/review", json={**body, "base_ref": "main"}).json()
+
+    assert "+    1 | x = 3" in prompts[-1]
+    assert "src/b.py" not in prompts[-1]
+    assert diff["diff"]["changed_files"] == ["src/a.py"]
+    assert diff["diff"]["reused_files"] == ["src/b.py"]
+    assert diff["diff"]["reused_findings"] == 1
+    assert [f["file"] for f in diff["findings"]].count("src/b.py") == 2   # one from the model, one carried over
+
+
+def test_sqlite_findings_store_works_off_the_event_loop(tmp_path):
+    on_loop = []
+
+    def loop_running():
+        try:
+            asyncio.get_running_loop()
+            return True
+        except RuntimeError:
+            return False
+
+    class Store(FindingsStore):
+        def get_many(self, shas, context):
+            on_loop.append(loop_running())
+            return super().get_many(shas, context)
+
+        def put_many(self, context, by_sha):
+            on_loop.append(loop_running())
+            super().put_many(context, by_sha)
+
+    path = str(tmp_path / "findings.sqlite3")
+
+    async def go():
+        await Store(max_entries=8, path=path).aput_many("ctx", {"b1": [{"issue": "x"}]})
+        return await Store(max_entries=8, path=path).aget_many(["b1", "b2"], "ctx")   # fresh memory tier
+
+    assert asyncio.run(go()) == {"b1": [{"issue": "x"}]}
+    assert on_loop == [False, False]
@@ -0,0 +1,79 @@
+import time
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.services.github_ratelimit import RateLimitedTransport, TokenPool
+
+API = "https://api.github.com/repos/o/r"
+
+
+def _client(pool, handler):
+    return httpx.AsyncClient(transport=RateLimitedTransport(httpx.MockTransport(handler), pool, retries=2))
+
+
+@pytest.mark.asyncio
+async def test_rotates_to_token_with_most_budget_left():
+    reset = str(int(time.time()) + 3600)
+    remaining = {"token aaaa": 10, "token bbbb": 4000}
+    used = []
+
+    def handler(request):
+        auth = request.headers["Authorization"]
+        used.append(auth)
+        remaining[auth] -= 1
+        return httpx.Response(200, json={}, headers={
+            "X-RateLimit-Limit": "5000", "X-RateLimit-Remaining": str(remaining[auth]), "X-RateLimit-Reset": reset,
+        })
+
+    pool = TokenPool(["aaaa", "bbbb"])
+    async with _client(pool, handler) as client:
+        for _ in range(4):
+            await client.get(API)
+
+    # the first two calls discover both budgets, then traffic sticks to the fuller token
+    assert used[2:] == ["token bbbb", "token bbbb"]
+    stats = pool.stats()
+    assert [t["token"] for t in stats["tokens"]] == ["...aaaa", "...bbbb"]
+    assert stats["tokens"][1]["remaining"] == 3997
+
+
+@pytest.mark.asyncio
+async def test_secondary_limit_is_retried_after_waiting():
+    calls = []
+
+    def handler(request):
+        calls.append(request.headers.get("Authorization"))
+        if len(calls) == 1:
+            return httpx.Response(403, json={"message": "secondary rate limit"}, headers={"Retry-After": "0"})
+        return httpx.Response(200, json={"ok": True})
+
+    pool = TokenPool([])
+    async with _client(pool, handler) as client:
+        r = await client.get(API)
+
+    assert r.status_code == 200
+    assert calls == [None, None]
+    assert pool.stats()["rate_limited"] == 1
+
+
+@pytest.mark.asyncio
+async def test_exhausted_pool_queues_then_fails_past_max_wait():
+    reset = int(time.time()) + 3600
+
+    def handler(request):
+        return httpx.Response(403, json={}, headers={
+            "X-RateLimit-Limit": "60", "X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(reset),
+        })
+
+    pool = TokenPool(["tok1"], max_wait=5)
+    async with _client(pool, handler) as client:
+        with pytest.raises(HTTPException) as exc:
+            await client.get(API)
+    assert exc.value.status_code == 429
+    assert int(exc.value.headers["Retry-After"]) > 3000
+
+    # a raw download on another host is not counted against the API budget
+    async with _client(pool, lambda r: httpx.Response(200, text="x")) as client:
+        assert (await client.get("https://raw.githubusercontent.com/o/r/x")).status_code == 200
@@ -1,35 +1,36 @@
+import asyncio
 import base64
-import json
+import io
+import tarfile
 
-import app.services.github_service as gh
-from app.config import PREVIEW_LINES, MAX_FILE_BYTES
+import httpx
+import pytest
+from fastapi import HTTPException
 
+import app.services.github_service as gh
+from app.services import ingest
+from app.services.blob_cache import BlobCache
+from app.config import PREVIEW_LINES, MAX_FILE_BYTES, MAX_FILES
 
-class FakeResp:
-    def __init__(self, status=200, data=None, text=None):
-        self.status_code = status
-        self._data = data
-        self._text = text
 
-    def json(self):
-        return self._data
+def _b64(text: str) -> str:
+    return base64.b64encode(text.encode("utf-8")).decode("utf-8")
 
-    @property
-    def text(self):
-        return self._text if self._text is not None else json.dumps(self._data or {})
 
-    def raise_for_status(self):
-        if self.status_code >= 400:
-            raise RuntimeError(f"http {self.status_code}")
+def _use_handler(monkeypatch, handler):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(gh, "_client", client)
+    monkeypatch.setattr(gh, "blob_cache", BlobCache(None, 1_000_000, 0))
+    monkeypatch.setattr(gh, "_etags", gh.OrderedDict())
+    monkeypatch.setattr(gh, "_trees", gh.OrderedDict())
+    monkeypatch.setattr(gh, "_matchers", gh.OrderedDict())
+    return client
 
 
-def test_fetch_repo_prioritizes_code_and_applies_caps(monkeypatch):
+@pytest.mark.asyncio
+async def test_fetch_repo_prioritizes_code_and_applies_caps(monkeypatch):
     """Tree has code + meta + ignored dirs + oversize; ensure only expected make it in."""
 
-    def fake_get_repo(url, headers=None, timeout=None):
-        assert "/repos/" in url
-        return FakeResp(200, {"id": 1})
-
     tree = [
         {"path": "node_modules/lib.js", "type": "blob", "size": 10},                # ignored dir
         {"path": "src/app.py", "type": "blob", "size": 50},                         # code (allowed)
@@ -38,56 +39,237 @@ def test_fetch_repo_prioritizes_code_and_applies_caps(monkeypatch):
         {"path": ".github/workflows/test.yml", "type": "blob", "size": 50},         # secondary
     ]
 
-    def fake_get_tree(url, headers=None, timeout=None):
-        assert "/git/trees/" in url
-        return FakeResp(200, {"tree": tree})
-
-    def fake_session_get(self, url, timeout=None):
+    def handler(request: httpx.Request):
+        url = str(request.url)
+        if "/commits/" in url:
+            return httpx.Response(200, text="abc123")
+        if "/git/trees/" in url:
+            return httpx.Response(200, json={"tree": tree})
         if "src/app.py" in url:
             content = "print('hello')\n" * (PREVIEW_LINES + 5)  # longer than preview
-            b64 = base64.b64encode(content.encode("utf-8")).decode("utf-8")
-            return FakeResp(200, {"encoding": "base64", "content": b64, "size": len(content)})
-
+            return httpx.Response(200, json={"encoding": "base64", "content": _b64(content), "size": len(content)})
         if "README.md" in url or "test.yml" in url:
-            b64_small = base64.b64encode(b"hello").decode("utf-8")
-            return FakeResp(200, {"encoding": "base64", "content": b64_small, "size": 5})
-
-        return FakeResp(404, {})
+            return httpx.Response(200, json={"encoding": "base64", "content": _b64("hello"), "size": 5})
+        if "/contents/" in url:
+            return httpx.Response(404, json={})
+        return httpx.Response(200, json={"id": 1})
 
-    def _router_get(url, headers=None, timeout=None):
-        if "/repos/" in url and "/git/trees/" not in url:
-            return fake_get_repo(url, headers, timeout)
-        return fake_get_tree(url, headers, timeout)
+    _use_handler(monkeypatch, handler)
 
-    monkeypatch.setattr("requests.get", _router_get)
-    monkeypatch.setattr("requests.Session.get", fake_session_get)
-
-    out = gh.fetch_repo_and_generate_message("https://github.com/owner/repo")
+    out = await ingest.fetch_repo_and_generate_message("https://github.com/owner/repo")
 
     assert "- `src/app.py`" in out
     assert "node_modules" not in out
     assert "binary.bin" not in out
     assert out.index("`src/app.py`") < out.index("`README.md`")
 
-    # Check preview size (ignore possible leading blank line)
+    # Small files fit the context budget and are sent whole (ignore possible leading blank line)
     blocks = out.split("```")
     assert len(blocks) >= 3
     snippet = blocks[1]
     lines = [ln for ln in snippet.splitlines() if ln.strip() != ""]
-    assert len(lines) <= PREVIEW_LINES
+    assert len(lines) == PREVIEW_LINES + 5
+
+
+@pytest.mark.asyncio
+async def test_fetch_repo_downloads_in_parallel_and_keeps_order(monkeypatch):
+    """Files are fetched concurrently but the caps and ordering still apply."""
+    tree = [{"path": f"src/m{i:03d}.py", "type": "blob", "size": 10} for i in range(MAX_FILES + 10)]
+    in_flight, peak = 0, 0
+
+    async def handler(request: httpx.Request):
+        nonlocal in_flight, peak
+        url = str(request.url)
+        if "/commits/" in url:
+            return httpx.Response(200, text="abc123")
+        if "/git/trees/" in url:
+            return httpx.Response(200, json={"tree": tree})
+        if "/contents/" in url:
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            name = url.split("/contents/")[1].split("?")[0]   # distinct content, so compaction keeps every file
+            return httpx.Response(200, json={"encoding": "base64", "content": _b64(f"x = '{name}'\n"), "size": 6})
+        return httpx.Response(200, json={"id": 1})
+
+    _use_handler(monkeypatch, handler)
+    monkeypatch.setattr(gh, "INGEST_MODE", "contents")
+
+    out = await ingest.fetch_repo_and_generate_message("https://github.com/owner/repo")
 
+    assert peak > 1
+    assert peak <= gh.FETCH_CONCURRENCY
+    assert out.count("- `src/") == MAX_FILES
+    assert out.index("`src/m000.py`") < out.index("`src/m001.py`")
+    assert f"src/m{MAX_FILES:03d}.py" not in out
+    assert "*(truncated:" in out
 
-def test_fetch_repo_404(monkeypatch):
-    def fake_get(url, headers=None, timeout=None):
-        if "/repos/" in url and "/git/trees/" not in url:
-            return FakeResp(404, {})
-        return FakeResp(200, {"tree": []})
 
-    monkeypatch.setattr("requests.get", fake_get)
+@pytest.mark.asyncio
+async def test_fetch_repo_404(monkeypatch):
+    def handler(request: httpx.Request):
+        if "/commits/" in str(request.url):
+            return httpx.Response(200, text="abc123")
+        if "/git/trees/" in str(request.url):
+            return httpx.Response(200, json={"tree": []})
+        return httpx.Response(404, json={})
+
+    _use_handler(monkeypatch, handler)
 
     try:
-        gh.fetch_repo_and_generate_message("https://github.com/owner/missing")
+        await ingest.fetch_repo_and_generate_message("https://github.com/owner/missing")
         assert False, "expected HTTPException for missing repo"
     except Exception as e:
         assert "Repository not found" in str(e) or "404" in str(e)
- 
+
+
+class _ChunkedStream(httpx.AsyncByteStream):
+    def __init__(self, data, size=1024):
+        self._data, self._size = data, size
+
+    async def __aiter__(self):
+        for i in range(0, len(self._data), self._size):
+            yield self._data[i:i + self._size]
+
+
+def _tarball(files, root="owner-repo-abc123"):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz", format=tarfile.PAX_FORMAT) as tar:
+        for path, text in files.items():
+            data = text.encode("utf-8")
+            info = tarfile.TarInfo(f"{root}/{path}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+@pytest.mark.asyncio
+async def test_fetch_repo_uses_single_tarball_request(monkeypatch):
+    """Many eligible files: one streamed archive request replaces per-file Contents calls."""
+    long_path = "src/" + "deep/" * 30 + "mod.py"   # > 100 chars, needs a pax header
+    files = {f"src/m{i:02d}.py": f"x = {i}\n" for i in range(20)}
+    files[long_path] = "y = 1\n"
+    files["node_modules/lib.js"] = "ignored()\n"
+    files["README.md"] = "hello\n"
+    tree = [{"path": p, "type": "blob", "size": len(t)} for p, t in files.items()]
+    archive = _tarball(files)
+    calls = []
+
+    def handler(request: httpx.Request):
+        url = str(request.url)
+        calls.append(url)
+        if "/commits/" in url:
+            return httpx.Response(200, text="abc123")
+        if "/git/trees/" in url:
+            return httpx.Response(200, json={"tree": tree})
+        if "/tarball/" in url:
+            return httpx.Response(200, stream=_ChunkedStream(archive))
+        if "/contents/" in url:
+            return httpx.Response(500, json={})
+        return httpx.Response(200, json={"id": 1})
+
+    _use_handler(monkeypatch, handler)
+    monkeypatch.setattr(gh, "INGEST_MODE", "auto")
+
+    out = await ingest.fetch_repo_and_generate_message("https://github.com/owner/repo")
+
+    assert not any("/contents/" in c for c in calls)
+    assert sum("/tarball/" in c for c in calls) == 1
+    assert f"- `{long_path}`" in out
+    assert "x = 7" in out
+    assert "node_modules" not in out
+    assert out.index("`src/m19.py`") < out.index("`README.md`")
+
+
+def test_tar_stream_reader_handles_small_chunks():
+    archive = _tarball({"a.py": "a = 1\n", "b.bin": "\0" * 2000, "c.py": "c = 3\n"})
+    reader = gh.TarStreamReader(lambda path, size: path.endswith(".py"))
+    got = []
+    for i in range(0, len(archive), 7):
+        got.extend(reader.feed(archive[i:i + 7]))
+    assert got == [("a.py", b"a = 1\n"), ("c.py", b"c = 3\n")]
+    assert reader.done
+
+
+@pytest.mark.asyncio
+async def test_fetch_repo_reuses_cached_blobs(monkeypatch):
+    """Unchanged blobs (same SHA) are served from the cache on re-review."""
+    tree = [
+        {"path": "src/a.py", "type": "blob", "size": 6, "sha": "aaa"},
+        {"path": "src/b.py", "type": "blob", "size": 6, "sha": "bbb"},
+    ]
+    fetched = []
+
+    def handler(request: httpx.Request):
+        url = str(request.url)
+        if "/commits/" in url:
+            return httpx.Response(200, text="abc123")
+        if "/git/trees/" in url:
+            return httpx.Response(200, json={"tree": tree})
+        if "/contents/" in url:
+            fetched.append(request.url.path)
+            return httpx.Response(200, json={"encoding": "base64", "content": _b64("x = 1\n"), "size": 6})
+        return httpx.Response(200, json={"id": 1})
+
+    _use_handler(monkeypatch, handler)
+    monkeypatch.setattr(gh, "INGEST_MODE", "contents")
+
+    first = await ingest.fetch_repo_and_generate_message("https://github.com/owner/repo")
+    tree[1]["sha"] = "ccc"  # b.py changed upstream
+    second = await ingest.fetch_repo_and_generate_message("https://github.com/owner/repo")
+
+    assert first == second
+    assert len(fetched) == 3
+    assert fetched[-1].endswith("src/b.py")
+    assert gh.blob_cache.stats()["memory_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_resolve_repo_revalidates_with_etags(monkeypatch):
+    """Meta and commit lookups send If-None-Match and reuse the cached body on 304."""
+    seen = []
+
+    def handler(request: httpx.Request):
+        url = str(request.url)
+        seen.append(request.headers.get("If-None-Match"))
+        etag = '"c1"' if "/commits/" in url else '"m1"'
+        if request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304)
+        if "/commits/" in url:
+            assert request.headers["Accept"] == "application/vnd.github.sha"
+            return httpx.Response(200, text="deadbeef", headers={"ETag": etag})
+        return httpx.Response(200, json={"id": 1}, headers={"ETag": etag})
+
+    _use_handler(monkeypatch, handler)
+
+    first = await gh.resolve_repo("https://github.com/owner/repo/tree/main")
+    second = await gh.resolve_repo("https://github.com/owner/repo/tree/main")
+
+    assert first == second == gh.RepoTarget("owner", "repo", "main", "deadbeef")
+    assert seen == [None, None, '"m1"', '"c1"']
+
+
+@pytest.mark.asyncio
+async def test_resolve_repo_handles_subdirectory_and_slashed_branch_urls(monkeypatch):
+    refs = {"main": "sha-main", "feature/x": "sha-feature"}
+    asked = []
+
+    def handler(request: httpx.Request):
+        url = str(request.url)
+        if "/commits/" in url:
+            ref = url.split("/commits/", 1)[1]
+            asked.append(ref)
+            return httpx.Response(200, text=refs[ref]) if ref in refs else httpx.Response(404)
+        return httpx.Response(200, json={"id": 1})
+    _use_handler(monkeypatch, handler)
+
+    target = await gh.resolve_repo("https://github.com/o/r/tree/main/src/app")
+    assert (target.ref, target.sha) == ("main", "sha-main") and asked == ["main"]
+
+    target = await gh.resolve_repo("https://github.com/o/r/tree/feature/x")
+    assert (target.ref, target.sha) == ("feature/x", "sha-feature")
+
+    with pytest.raises(HTTPException) as e:
+        await gh.resolve_repo("https://github.com/o/r/tree/gone/src")
+    assert e.value.status_code == 404
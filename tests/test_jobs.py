@@ -0,0 +1,184 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models import ReviewJob, ReviewJobRequest, ReviewRequest, ReviewResponse
+from app.services.github_service import RepoTarget
+from app.services.jobs import JobManager, MemoryJobStore, SQLiteJobStore
+from app.services.packer import RepoFile
+from app.services.result_cache import ResultCache
+
+
+def _request(**kw):
+    return ReviewJobRequest(assignment_description="x", github_repo_url="https://github.com/o/r",
+                            candidate_level="Junior", **kw)
+
+
+def _response():
+    return ReviewResponse(files_found=["a.py"], rating_out_of_5=4, summary="ok", findings=[], conclusion="c")
+
+
+async def _wait(manager, job_id, timeout=2.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        job = await manager.get(job_id)
+        if job.status not in ("queued", "running"):
+            return job
+        await asyncio.sleep(0.005)
+    raise AssertionError("job did not finish")
+
+
+@pytest.mark.asyncio
+async def test_job_runs_and_reports_stages():
+    async def runner(request, progress):
+        for stage in ("resolve", "fetch", "review", "parse"):
+            progress(stage)
+            await asyncio.sleep(0)
+        return _response()
+
+    manager = JobManager(MemoryJobStore(), workers=2, queue_size=4)
+    await manager.start(runner)
+    try:
+        job = manager.submit(_request())
+        assert job.status == "queued"
+        done = await _wait(manager, job.id)
+    finally:
+        await manager.stop()
+
+    assert done.status == "succeeded"
+    assert done.result.rating_out_of_5 == 4
+    assert [(s.name, s.status) for s in done.stages] == [
+        ("resolve", "done"), ("fetch", "done"), ("triage", "skipped"), ("review", "done"), ("parse", "done")]
+
+
+@pytest.mark.asyncio
+async def test_cascade_job_shows_triage_running():
+    seen = {}
+
+    async def runner(request, progress):
+        for stage in ("resolve", "fetch", "triage", "review", "parse"):
+            progress(stage)
+            seen[stage] = [s.status for s in manager.store.get(job.id).stages]
+            await asyncio.sleep(0)
+        return _response()
+
+    manager = JobManager(MemoryJobStore(), workers=1, queue_size=4)
+    await manager.start(runner)
+    try:
+        job = manager.submit(_request())
+        done = await _wait(manager, job.id)
+    finally:
+        await manager.stop()
+
+    assert seen["triage"] == ["done", "done", "running", "pending", "pending"]
+    assert [s.status for s in done.stages] == ["done"] * 5
+
+
+@pytest.mark.asyncio
+async def test_queue_full_cancel_and_deadline():
+    release = asyncio.Event()
+
+    async def runner(request, progress):
+        progress("fetch")
+        await release.wait()
+        return _response()
+
+    manager = JobManager(MemoryJobStore(), workers=1, queue_size=1)
+    await manager.start(runner)
+    try:
+        running = manager.submit(_request())
+        await asyncio.sleep(0.01)               # worker picks it up
+        queued = manager.submit(_request(deadline_seconds=1))
+        with pytest.raises(HTTPException) as exc:
+            manager.submit(_request())
+        assert exc.value.status_code == 503
+
+        assert (await manager.cancel(queued.id)).status == "cancelled"
+        await manager.cancel(running.id)
+        cancelled = await _wait(manager, running.id)
+        assert cancelled.status == "cancelled"
+        assert cancelled.stages[1].status == "failed"
+
+        slow = manager.submit(_request(deadline_seconds=1))
+        (await manager.get(slow.id)).deadline_at = time.time() + 0.05
+        timed_out = await _wait(manager, slow.id)
+        assert timed_out.status == "failed"
+        assert "Deadline" in timed_out.error
+    finally:
+        await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_requeues_after_restart(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+
+    async def never(request, progress):
+        await asyncio.Event().wait()
+
+    first = JobManager(SQLiteJobStore(path), workers=0, queue_size=4)
+    await first.start(never)
+    job = first.submit(_request())
+    await first.stop()
+
+    async def runner(request, progress):
+        return _response()
+
+    second = JobManager(SQLiteJobStore(path), workers=1, queue_size=4)
+    await second.start(runner)
+    try:
+        done = await _wait(second, job.id)
+    finally:
+        await second.stop()
+    assert done.status == "succeeded"
+    assert done.request.github_repo_url == "https://github.com/o/r"
+
+
+def test_reviews_endpoint_runs_job(monkeypatch):
+    async def fake_resolve_repo(url: str) -> RepoTarget:
+        return RepoTarget("o", "r", "HEAD", "abc123")
+    async def fake_fetch_repo_files(url: str, target=None, **caps):
+        return [RepoFile("a.py", 6, "x = 1\n")]
+    async def fake_generate_review(*args, **kwargs) -> str:
+        return '{"files_found":["a.py"],"rating_out_of_5":5,"summary":"s","findings":[],"conclusion":"c"}'
+    monkeypatch.setattr("app.routes.resolve_repo", fake_resolve_repo)
+    monkeypatch.setattr("app.routes.fetch_repo_files", fake_fetch_repo_files)
+    monkeypatch.setattr("app.routes.generate_review", fake_generate_review)
+    monkeypatch.setattr("app.routes.result_cache", ResultCache(ttl=60, max_entries=8))
+
+    with TestClient(app) as client:
+        resp = client.post("/reviews", json={
+            "assignment_description": "x",
+            "github_repo_url": "https://github.com/o/r",
+            "candidate_level": "Mid",
+        })
+        assert resp.status_code == 202
+        job_id = resp.json()["id"]
+
+        for _ in range(200):
+            body = client.get(f"/reviews/{job_id}").json()
+            if body["status"] == "succeeded":
+                break
+            time.sleep(0.01)
+        assert body["status"] == "succeeded"
+        assert body["result"]["rating_out_of_5"] == 5
+        assert client.get("/reviews/missing").status_code == 404
+
+
+def test_sqlite_store_saves_without_waiting_for_a_commit(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    store = SQLiteJobStore(path)
+    job = ReviewJob(id="j1", stages=[], created_at=1.0, updated_at=1.0, deadline_at=2.0,
+                    request=ReviewRequest(**_request().model_dump(include=set(ReviewRequest.model_fields))))
+
+    with store._db_lock:                  # the writer is busy with SQLite
+        store.save(job)
+        job.status = "running"
+        store.save(job)
+        assert store.get("j1").status == "running"   # queued saves are visible straight away
+    store.close()
+
+    assert SQLiteJobStore(path).get("j1").status == "running"
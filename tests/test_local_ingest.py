@@ -0,0 +1,168 @@
+import asyncio
+import base64
+import os
+import subprocess
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app.services.github_service as gh
+import app.services.local_repo as local
+from app.main import app
+from app.services import ingest
+from app.services.blob_cache import BlobCache
+
+client = TestClient(app)
+
+FILES = {
+    "src/app.py": "def main():\n    return 1\n",
+    "src/util.js": "export const x = 1;\n",
+    "README.md": "# Demo\n",
+    "node_modules/dep/index.js": "module.exports = 1;\n",
+    "data.bin": "\x00\x01",
+}
+
+
+def _write(root, files):
+    for path, text in files.items():
+        full = root / path
+        full.parent.mkdir(parents=True, exist_ok=True)
+        full.write_text(text)
+
+
+def _git(cwd, *args):
+    subprocess.run(["git", "-c", "user.email=t@t", "-c", "user.name=t", *args], cwd=cwd, check=True,
+                   capture_output=True)
+
+
+@pytest.fixture
+def roots(tmp_path, monkeypatch):
+    monkeypatch.setattr(local, "LOCAL_REPO_ROOTS", [str(tmp_path / "repos")])
+    monkeypatch.setattr(local, "LOCAL_CLONE_DIR", str(tmp_path / "clones"))
+    monkeypatch.setattr(local, "_walked", local.OrderedDict())
+    (tmp_path / "repos").mkdir()
+    return tmp_path
+
+
+@pytest.mark.asyncio
+async def test_local_directory_renders_the_same_prompt_as_github(roots, monkeypatch):
+    repo = roots / "repos" / "demo"
+    _write(repo, FILES)
+
+    def handler(request: httpx.Request):
+        url = str(request.url)
+        if "/commits/" in url:
+            return httpx.Response(200, text="abc123")
+        if "/git/trees/" in url:
+            return httpx.Response(200, json={"tree": [
+                {"path": p, "type": "blob", "size": len(t), "sha": None} for p, t in sorted(FILES.items())]})
+        if "/contents/" in url:
+            text = FILES[url.split("/contents/")[1].split("?")[0]]
+            return httpx.Response(200, json={"encoding": "base64", "size": len(text),
+                                             "content": base64.b64encode(text.encode()).decode()})
+        return httpx.Response(200, json={"id": 1})
+
+    monkeypatch.setattr(gh, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(gh, "blob_cache", BlobCache(None, 1_000_000, 0))
+    monkeypatch.setattr(gh, "_etags", gh.OrderedDict())
+    monkeypatch.setattr(gh, "_trees", gh.OrderedDict())
+    monkeypatch.setattr(gh, "INGEST_MODE", "contents")
+
+    from_github = await ingest.fetch_repo_and_generate_message("https://github.com/o/demo")
+    from_disk = await ingest.fetch_repo_and_generate_message(f"file://{repo}")
+
+    assert from_disk == from_github
+    assert "node_modules" not in from_disk and "`src/app.py`" in from_disk
+
+    target = await ingest.resolve_repo(f"file://{repo}")
+    assert target.sha.startswith("dir-")
+    (repo / "src" / "app.py").write_text("def main():\n    return 2  # edited\n")
+    assert (await ingest.resolve_repo(f"file://{repo}")).sha != target.sha
+
+
+@pytest.mark.asyncio
+async def test_bare_repo_is_pinned_and_cloned_once(roots):
+    work = roots / "work"
+    _write(work, {"src/app.py": "v = 1\n", "node_modules/x.js": "x\n"})
+    _git(work, "init", "-q")
+    _git(work, "add", "-A")
+    _git(work, "commit", "-qm", "one")
+    _write(work, {"src/app.py": "v = 2\n", ".gitignore": "secret.py\n", "secret.py": "key = 1\n"})
+    _git(work, "add", "-A")
+    _git(work, "commit", "-qm", "two")
+    _git(roots, "clone", "-q", "--bare", str(work), str(roots / "repos" / "mirror.git"))
+
+    url = f"file://{roots / 'repos' / 'mirror.git'}"
+    head = await ingest.resolve_repo(url)
+    files = await ingest.fetch_repo_files(url, head)
+    again = await ingest.fetch_repo_files(url, head)
+
+    assert [(f.path, f.content) for f in files if f.code] == [("src/app.py", "v = 2\n")]
+    assert files[0].sha == subprocess.run(["git", "rev-parse", "HEAD:src/app.py"], cwd=work,
+                                          capture_output=True, text=True).stdout.strip()
+    assert again == files
+    assert len(os.listdir(roots / "clones")) == 1
+
+    old = await ingest.fetch_repo_files(url + "?ref=HEAD~1")
+    assert [f.content for f in old if f.path == "src/app.py"] == ["v = 1\n"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_checkouts_clone_once_and_release_the_lock(roots, monkeypatch):
+    work = roots / "repos" / "work"
+    _write(work, {"src/app.py": "v = 1\n"})
+    _git(work, "init", "-q")
+    _git(work, "add", "-A")
+    _git(work, "commit", "-qm", "one")
+    sha = subprocess.run(["git", "rev-parse", "HEAD"], cwd=work, capture_output=True, text=True).stdout.strip()
+    inits = []
+    git = local._git
+
+    async def counting_git(*args, **kw):
+        if args[0] == "init":
+            inits.append(kw["cwd"])
+        return await git(*args, **kw)
+    monkeypatch.setattr(local, "_git", counting_git)
+
+    dests = await asyncio.gather(*(local._checkout(str(work), sha) for _ in range(3)))
+    assert len(set(dests)) == 1 and len(inits) == 1
+    assert await local._checkout(str(work), sha) == dests[0]    # cache hit
+    assert local._clone_locks == {}
+    assert os.listdir(roots / "clones") == [os.path.basename(dests[0])]   # no staging dirs left
+
+
+def test_local_paths_outside_roots_are_refused(roots):
+    body = {"assignment_description": "x", "candidate_level": "Mid", "github_repo_url": "file:///etc"}
+    r = client.post("/review", json=body)
+    assert r.status_code == 403
+
+    body["github_repo_url"] = f"file://{roots / 'repos'}"
+    body["base_ref"] = "main"
+    assert client.post("/review", json=body).status_code == 422
+
+
+def test_register_backend_rejects_incomplete_backends(monkeypatch):
+    monkeypatch.setattr(ingest, "_backends", list(ingest._backends))
+
+    class NoFetch(ingest.IngestBackend):
+        name = "nofetch"
+
+        def handles(self, url):
+            return url.startswith("nofetch://")
+
+        def repo_key(self, url):
+            return "o", "r"
+
+        async def resolve(self, url):
+            raise NotImplementedError
+
+    with pytest.raises(TypeError):
+        ingest.register_backend(NoFetch)
+
+    @ingest.register_backend
+    class Complete(NoFetch):
+        async def fetch_files(self, url, target, max_files, max_bytes, budget=None):
+            return []
+
+    assert isinstance(ingest.backend_for("nofetch://x"), Complete)
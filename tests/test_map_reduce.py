@@ -0,0 +1,97 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.github_service import RepoTarget
+from app.services.packer import RepoFile, shard_files, estimate_tokens
+from app.services.reduce import merge_reviews
+from app.services.result_cache import ResultCache
+
+client = TestClient(app)
+
+
+def _file(path, n_lines):
+    text = f"name = {path!r}\n" + "".join(f"value_{i} = {i}\n" for i in range(n_lines))   # distinct blobs
+    return RepoFile(path, len(text), text)
+
+
+def test_shard_files_respects_budget_and_ceilings():
+    files = [_file(f"src/m{i}.py", 50) for i in range(10)]
+    per_file = estimate_tokens(files[0].content)
+
+    shards = shard_files(files, budget=per_file * 3, max_shards=3, max_tokens=10 ** 6)
+
+    assert len(shards) == 3
+    assert all(s.tokens <= per_file * 3 for s in shards)
+    assert [f.path for f in shards[0].files] == ["src/m0.py", "src/m1.py", "src/m2.py"]
+    assert shards[0].dropped == ["src/m9.py"]
+
+    capped = shard_files(files, budget=per_file * 3, max_shards=3, max_tokens=per_file * 4)
+    assert sum(len(s.files) for s in capped) == 4
+
+
+def test_merge_reviews_dedupes_findings_and_weights_rating():
+    a = {"files_found": ["a.py"], "rating_out_of_5": 2, "summary": "A", "conclusion": "fix",
+         "findings": [{"file": "a.py", "line": 3, "severity": "low", "issue": "SQL injection!", "suggestion": "x"}]}
+    b = {"files_found": ["a.py", "b.py"], "rating_out_of_5": 5, "summary": "B", "conclusion": "fix",
+         "findings": [{"file": "a.py", "line": 3, "severity": "high", "issue": "sql injection", "suggestion": "y"},
+                      {"file": "b.py", "line": 1, "severity": "medium", "issue": "naming", "suggestion": "z"}]}
+
+    merged = merge_reviews([(a, 300), (b, 100)])
+
+    assert merged["files_found"] == ["a.py", "b.py"]
+    assert merged["rating_out_of_5"] == 3       # (2*300 + 5*100) / 400 = 2.75
+    assert [f["severity"] for f in merged["findings"]] == ["high", "medium"]
+    assert merged["summary"] == "A\nB"
+    assert merged["conclusion"] == "fix"
+
+
+def test_merge_reviews_tolerates_non_numeric_lines_and_ratings():
+    a = {"rating_out_of_5": "4/5",
+         "findings": [{"file": "a.py", "line": "n/a", "severity": "low", "issue": "naming", "suggestion": "x"},
+                      {"file": "a.py", "line": "12-14", "severity": "high", "issue": "leak", "suggestion": "y"}]}
+    b = {"rating_out_of_5": "great",
+         "findings": [{"file": "a.py", "line": 12, "severity": "medium", "issue": "Leak", "suggestion": "z"}]}
+
+    merged = merge_reviews([(a, 100), (b, 100)])
+
+    assert merged["rating_out_of_5"] == 4       # "great" carries no rating
+    assert [(f["line"], f["severity"]) for f in merged["findings"]] == [("12-14", "high"), ("n/a", "low")]
+
+
+def test_review_map_reduce_over_shards(monkeypatch):
+    files = [_file(f"src/m{i}.py", 200) for i in range(6)]
+    prompts = []
+
+    async def fake_resolve_repo(url: str) -> RepoTarget:
+        return RepoTarget("o", "big", "HEAD", "abc")
+    async def fake_fetch_repo_files(url: str, target=None, **caps):
+        return files
+    async def fake_generate_review(assignment_description, repo_contents, candidate_level) -> str:
+        prompts.append(repo_contents)
+        paths = [line.split("`")[1] for line in repo_contents.splitlines() if line.startswith("- `")]
+        return json.dumps({
+            "files_found": paths, "rating_out_of_5": 4, "summary": f"part {len(prompts)}", "conclusion": "ok",
+            "findings": [{"file": "src/m0.py", "line": 1, "severity": "medium", "issue": "Shared", "suggestion": "s"}],
+        })
+    monkeypatch.setattr("app.routes.resolve_repo", fake_resolve_repo)
+    monkeypatch.setattr("app.routes.fetch_repo_files", fake_fetch_repo_files)
+    monkeypatch.setattr("app.routes.generate_review", fake_generate_review)
+    monkeypatch.setattr("app.routes.result_cache", ResultCache(ttl=60, max_entries=8))
+    monkeypatch.setattr("app.routes.context_budget", lambda model: estimate_tokens(files[0].content) * 2)
+
+    body = client.post("/review", json={
+        "assignment_description": "x", "github_repo_url": "https://github.com/o/big",
+        "candidate_level": "Senior", "mode": "auto", "max_shards": 2,
+    }).json()
+
+    assert len(prompts) == 2
+    assert all(p.startswith("(Part ") for p in prompts)
+    assert body["shards"] == 2
+    assert body["included_files"] == 4
+    assert body["packing"]["dropped"] == ["src/m4.py", "src/m5.py"]
+    assert body["truncated"] is True
+    assert len(body["findings"]) == 1
+    assert body["rating_out_of_5"] == 4
+    assert body["files_found"] == [f"src/m{i}.py" for i in range(4)]
@@ -0,0 +1,50 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import metrics
+from app.services.github_service import RepoTarget
+from app.services.packer import RepoFile
+from app.services.result_cache import ResultCache
+
+client = TestClient(app)
+
+
+def test_histogram_renders_cumulative_buckets():
+    h = metrics.Histogram("test_latency_seconds", "test", ("stage",), buckets=(0.1, 1))
+    metrics._registry.remove(h)
+    h.observe(0.05, stage="a")
+    h.observe(0.5, stage="a")
+    h.observe(5, stage="a")
+
+    lines = h.render()
+    assert 'test_latency_seconds_bucket{stage="a",le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{stage="a",le="1"} 2' in lines
+    assert 'test_latency_seconds_bucket{stage="a",le="+Inf"} 3' in lines
+    assert 'test_latency_seconds_count{stage="a"} 3' in lines
+
+
+def test_review_reports_stage_timings_and_metrics(monkeypatch):
+    async def fake_resolve_repo(url):
+        return RepoTarget("o", "r", "HEAD", "abc")
+    async def fake_fetch_repo_files(url, target=None, **caps):
+        return [RepoFile("a.py", 6, "x = 1\n")]
+    async def fake_generate_review(*args, **kwargs):
+        return "not json"
+    monkeypatch.setattr("app.routes.resolve_repo", fake_resolve_repo)
+    monkeypatch.setattr("app.routes.fetch_repo_files", fake_fetch_repo_files)
+    monkeypatch.setattr("app.routes.generate_review", fake_generate_review)
+    monkeypatch.setattr("app.routes.result_cache", ResultCache(ttl=60, max_entries=8))
+    monkeypatch.setattr("app.main.SERVER_TIMING", True)
+    failed_before = metrics.PARSE_RESULTS.value(outcome="failed")
+
+    resp = client.post("/review", json={"assignment_description": "x", "github_repo_url": "https://github.com/o/r",
+                                        "candidate_level": "Mid"})
+
+    stages = [part.split(";")[0] for part in resp.headers["Server-Timing"].split(", ")]
+    assert stages == ["compact", "pack", "prompt", "parse"]
+    assert metrics.PARSE_RESULTS.value(outcome="failed") == failed_before + 1
+
+    text = client.get("/metrics").text
+    assert 'codereviewer_stage_seconds_count{stage="parse"}' in text
+    assert 'codereviewer_http_request_seconds_count{method="POST",route="/review",status="200"}' in text
+    assert 'codereviewer_component_stat{component="review_cache",field="misses"}' in text
@@ -0,0 +1,49 @@
+from app.config import PREVIEW_LINES
+from app.services.packer import RepoFile, pack_files, render_pack, estimate_tokens
+
+
+def _file(path, n_lines, code=True):
+    text = "".join(f"line_{i} = {i}\n" for i in range(n_lines))
+    return RepoFile(path, len(text), text, code=code)
+
+
+def test_small_files_whole_large_files_trimmed_and_reported():
+    small = _file("src/small.py", 10)
+    big = _file("src/big.py", 2000)
+    readme = _file("README.md", 5, code=False)
+    budget = estimate_tokens(small.content) + estimate_tokens(readme.content) + 400
+
+    pack = pack_files([big, small, readme], budget)
+
+    by_path = {f.path: f for f in pack.files}
+    assert by_path["src/small.py"].text == small.content
+    assert not by_path["src/small.py"].trimmed
+    assert by_path["src/big.py"].trimmed
+    assert by_path["src/big.py"].text.count("\n") == PREVIEW_LINES - 1
+    assert pack.trimmed == ["src/big.py"]
+    assert pack.dropped == []
+    assert not pack.truncated
+    assert pack.tokens <= budget
+    assert [f.path for f in pack.files] == ["src/big.py", "src/small.py", "README.md"]  # ingestion order kept
+
+
+def test_budget_prefers_code_and_reports_dropped():
+    code = _file("src/app.py", 40)
+    docs = _file("docs/guide.md", 40, code=False)
+    unfetched = RepoFile("src/later.py", 100, None)
+
+    pack = pack_files([docs, code, unfetched], estimate_tokens(code.content) + 5)
+
+    assert [f.path for f in pack.files] == ["src/app.py"]
+    assert pack.dropped == ["docs/guide.md", "src/later.py"]
+    assert pack.truncated
+    out = render_pack(pack)
+    assert "- `src/app.py`" in out
+    assert "*(truncated: 2 more files not included)*" in out
+
+
+def test_trimmed_file_upgraded_when_budget_allows():
+    big = _file("src/big.py", 300)
+    pack = pack_files([big], estimate_tokens(big.content))
+    assert not pack.files[0].trimmed
+    assert pack.total_bytes == big.size
@@ -0,0 +1,112 @@
+import json
+import re
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app.services.github_service as gh
+from app.config import PREVIEW_LINES, PREVIEW_MAX_CHARS
+from app.main import app
+from app.services.blob_cache import BlobCache
+from app.services.packer import RepoFile, _head, pack_files, render_pack
+from app.services.result_cache import ResultCache
+
+BIG = "".join(f"line_{i:05d} = compute({i})  # a fairly long synthetic source line\n" for i in range(1800))
+FILES = {
+    "src/big.py": BIG,                                                   # ~100 KB, preview only
+    "src/mid.py": "".join(f"m{i} = {i}\n" for i in range(300)),          # trimmed but fits whole
+    "src/small.py": "x = 1\n",
+}
+
+
+def _use_raw_github(monkeypatch, files, sent):
+    def handler(request: httpx.Request):
+        url = str(request.url)
+        if "/git/trees/" in url:
+            return httpx.Response(200, json={"tree": [
+                {"path": p, "type": "blob", "size": len(t), "sha": f"sha-{p}"} for p, t in sorted(files.items())]})
+        if "/contents/" in url:
+            assert request.headers["accept"] == "application/vnd.github.raw"
+            data = files[url.split("/contents/")[1].split("?")[0]].encode()
+            m = re.match(r"bytes=(\d+)-(\d*)", request.headers.get("range", ""))
+            if not m:
+                sent.append(len(data))
+                return httpx.Response(200, content=data)
+            start = int(m.group(1))
+            end = min(int(m.group(2)) if m.group(2) else len(data) - 1, len(data) - 1)
+            if start >= len(data):
+                return httpx.Response(416)
+
+            async def chunks(body=data[start:end + 1]):
+                for i in range(0, len(body), 1024):   # counts only what the client actually reads
+                    sent.append(len(body[i:i + 1024]))
+                    yield body[i:i + 1024]
+            return httpx.Response(206, content=chunks(),
+                                  headers={"Content-Range": f"bytes {start}-{end}/{len(data)}"})
+        return httpx.Response(200, json={"id": 1})
+
+    monkeypatch.setattr(gh, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(gh, "blob_cache", BlobCache(None, 1_000_000, 0))
+    monkeypatch.setattr(gh, "_trees", gh.OrderedDict())
+    monkeypatch.setattr(gh, "_matchers", gh.OrderedDict())
+    monkeypatch.setattr(gh, "INGEST_MODE", "contents")
+
+
+@pytest.mark.asyncio
+async def test_preview_download_stops_once_the_preview_is_known(monkeypatch):
+    sent = []
+    _use_raw_github(monkeypatch, FILES, sent)
+    sem = gh.asyncio.Semaphore(1)
+
+    text, raw, complete = await gh._download_preview(gh._client, sem, "o", "r", "abc", "src/big.py")
+
+    assert not complete
+    assert len(raw) == sum(sent) < PREVIEW_MAX_CHARS + 1024   # stopped early, not the whole 100 KB
+    assert _head(text, PREVIEW_LINES, PREVIEW_MAX_CHARS) == _head(BIG, PREVIEW_LINES, PREVIEW_MAX_CHARS)
+
+    text, _, complete = await gh._download_preview(gh._client, sem, "o", "r", "abc", "src/small.py")
+    assert complete and text == "x = 1\n"
+
+
+@pytest.mark.asyncio
+async def test_budgeted_fetch_packs_like_full_downloads(monkeypatch):
+    sent = []
+    _use_raw_github(monkeypatch, FILES, sent)
+    budget = 3000
+
+    files = await gh.fetch_repo_files("https://github.com/o/r", gh.RepoTarget("o", "r", "HEAD", "abc"),
+                                      budget=budget)
+    by_path = {f.path: f for f in files}
+
+    assert by_path["src/big.py"].partial and by_path["src/big.py"].size == len(BIG)
+    # mid.py was cut off after its preview, then completed with a second ranged request
+    assert not by_path["src/mid.py"].partial and by_path["src/mid.py"].content == FILES["src/mid.py"]
+    assert sum(sent) < len(BIG) // 2
+
+    full = [RepoFile(f.path, f.size, FILES[f.path], f.sha, f.code) for f in files]
+    assert render_pack(pack_files(files, budget)) == render_pack(pack_files(full, budget))
+
+
+def test_default_review_mode_uses_the_preview_path(monkeypatch):
+    caps = []
+
+    async def fake_resolve_repo(url):
+        return gh.RepoTarget("o", "r", "HEAD", "abc")
+    async def fake_fetch_repo_files(url, target=None, **kw):
+        caps.append(kw)
+        return [RepoFile("a.py", 6, "x = 1\n")]
+    async def fake_generate_review(*args, **kwargs):
+        return json.dumps({"files_found": ["a.py"], "rating_out_of_5": 4, "summary": "s", "findings": [],
+                           "conclusion": "c"})
+    monkeypatch.setattr("app.routes.resolve_repo", fake_resolve_repo)
+    monkeypatch.setattr("app.routes.fetch_repo_files", fake_fetch_repo_files)
+    monkeypatch.setattr("app.routes.generate_review", fake_generate_review)
+    monkeypatch.setattr("app.routes.result_cache", ResultCache(ttl=60, max_entries=8))
+
+    r = TestClient(app).post("/review", json={"assignment_description": "x", "candidate_level": "Mid",
+                                              "github_repo_url": "https://github.com/o/r"})
+
+    assert r.status_code == 200
+    assert caps[0].get("budget")                  # previews on: single-pack fetch, not the map-reduce file cap
+    assert "max_files" not in caps[0]
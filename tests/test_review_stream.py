@@ -0,0 +1,116 @@
+import json
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.github_service import RepoTarget
+from app.services.json_stream import ReviewStreamParser
+from app.services.packer import RepoFile
+from app.services.result_cache import ResultCache
+
+client = TestClient(app)
+
+REVIEW = {
+    "files_found": ["a.py"], "rating_out_of_5": 4, "summary": "Solid {overall}",
+    "findings": [
+        {"file": "a.py", "line": 1, "severity": "high", "issue": "Uses \"eval\" on input }", "suggestion": "ast"},
+        {"file": "a.py", "line": 9, "severity": "low", "issue": "Naming [x]", "suggestion": "rename"},
+    ],
+    "conclusion": "Hire",
+}
+
+
+def _events(text):
+    out = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        out.append((lines["event"], json.loads(lines["data"])))
+    return out
+
+
+def test_parser_emits_each_finding_when_it_closes():
+    text = "```json\n" + json.dumps(REVIEW) + "\n```"
+    parser = ReviewStreamParser()
+    seen = []
+    for i in range(0, len(text), 5):
+        batch = parser.feed(text[i:i + 5])
+        if batch and not seen:
+            # the first finding is out before the second one has been generated
+            assert '"line": 9' not in parser.text
+        seen.extend(batch)
+    assert seen == REVIEW["findings"]
+    assert parser.result() == REVIEW
+
+
+def test_review_stream_sends_findings_then_closing_events(monkeypatch):
+    async def fake_resolve_repo(url):
+        return RepoTarget("o", "r", "HEAD", "abc")
+    async def fake_fetch_repo_files(url, target=None, **caps):
+        return [RepoFile("a.py", 6, "x = 1\n", "a1")]
+    async def fake_stream_review(assignment_description, repo_contents, candidate_level):
+        text = json.dumps(REVIEW)
+        for i in range(0, len(text), 16):
+            yield text[i:i + 16]
+    monkeypatch.setattr("app.routes.resolve_repo", fake_resolve_repo)
+    monkeypatch.setattr("app.routes.fetch_repo_files", fake_fetch_repo_files)
+    monkeypatch.setattr("app.routes.stream_review", fake_stream_review)
+    monkeypatch.setattr("app.routes.result_cache", ResultCache(ttl=60, max_entries=8))
+
+    body = {"assignment_description": "x", "github_repo_url": "https://github.com/o/r", "candidate_level": "Mid"}
+    resp = client.post("/review/stream", json=body)
+    events = _events(resp.text)
+
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    assert [e for e, _ in events] == ["finding", "finding", "summary", "rating", "conclusion", "done"]
+    assert events[0][1]["severity"] == "high"
+    assert events[3][1] == {"rating_out_of_5": 4}
+    assert events[-1][1]["findings"] == REVIEW["findings"]
+
+    # the finished review is cached and replayed without another model call
+    monkeypatch.setattr("app.routes.stream_review", None)
+    assert _events(client.post("/review/stream", json=body).text) == events
+
+
+def test_review_stream_drops_out_of_schema_findings(monkeypatch):
+    review = {**REVIEW, "findings": REVIEW["findings"] + [
+        {"file": "a.py", "line": 3, "severity": "critical", "issue": "x", "suggestion": "y"}]}
+
+    async def fake_resolve_repo(url):
+        return RepoTarget("o", "r", "HEAD", "abc")
+    async def fake_fetch_repo_files(url, target=None, **caps):
+        return [RepoFile("a.py", 6, "x = 1\n", "a1")]
+    async def fake_stream_review(assignment_description, repo_contents, candidate_level):
+        yield json.dumps(review)
+    monkeypatch.setattr("app.routes.resolve_repo", fake_resolve_repo)
+    monkeypatch.setattr("app.routes.fetch_repo_files", fake_fetch_repo_files)
+    monkeypatch.setattr("app.routes.stream_review", fake_stream_review)
+    monkeypatch.setattr("app.routes.result_cache", ResultCache(ttl=60, max_entries=8))
+
+    body = {"assignment_description": "x", "github_repo_url": "https://github.com/o/r", "candidate_level": "Mid"}
+    events = _events(client.post("/review/stream", json=body).text)
+
+    assert [e for e, _ in events] == ["finding", "finding", "summary", "rating", "conclusion", "done"]
+    assert events[-1][1]["findings"] == REVIEW["findings"]
+
+    review["rating_out_of_5"] = "4/5"
+    monkeypatch.setattr("app.routes.result_cache", ResultCache(ttl=60, max_entries=8))
+    events = _events(client.post("/review/stream", json=body).text)
+    assert [e for e, _ in events][-3:] == ["rating", "conclusion", "done"]
+    assert events[-3][1] == {"rating_out_of_5": 4}
+
+
+def test_review_stream_maps_github_failures_to_502(monkeypatch):
+    async def fake_resolve_repo(url):
+        return RepoTarget("o", "r", "HEAD", "abc")
+    async def fake_fetch_repo_files(url, target=None, **caps):
+        raise httpx.ConnectError("GitHub unreachable")
+    monkeypatch.setattr("app.routes.resolve_repo", fake_resolve_repo)
+    monkeypatch.setattr("app.routes.fetch_repo_files", fake_fetch_repo_files)
+    monkeypatch.setattr("app.routes.result_cache", ResultCache(ttl=60, max_entries=8))
+
+    r = client.post("/review/stream", json={"assignment_description": "x", "candidate_level": "Mid",
+                                            "github_repo_url": "https://github.com/o/r"})
+
+    assert r.status_code == 502
+    assert r.json()["detail"] == "GitHub unreachable"
@@ -1,11 +1,14 @@
 from fastapi.testclient import TestClient
 from app.main import app
+from app.services.github_service import RepoTarget
+from app.services.packer import RepoFile
+from app.services.result_cache import ResultCache
 
 client = TestClient(app)
 
 def test_review_endpoint_json(monkeypatch):
-    def fake_fetch_repo_and_generate_message(url: str) -> str:
-        return "# Repository Files\n- `README.md`\n```hello```"
+    async def fake_fetch_repo_files(url: str, target=None, **caps):
+        return [RepoFile("README.md", 5, "hello", code=False)]
     async def fake_generate_review(*args, **kwargs) -> str:
         return (
             '{"files_found":["README.md"],'
@@ -14,8 +17,12 @@ def test_review_endpoint_json(monkeypatch):
             '"findings":[{"file":"README.md","line":1,"severity":"low","issue":"Minor typo","suggestion":"Fix typo"}],'
             '"conclusion":"Ready to proceed."}'
         )
-    monkeypatch.setattr("app.routes.fetch_repo_and_generate_message", fake_fetch_repo_and_generate_message)
+    async def fake_resolve_repo(url: str) -> RepoTarget:
+        return RepoTarget("octocat", "Hello-World", "HEAD", "abc123")
+    monkeypatch.setattr("app.routes.resolve_repo", fake_resolve_repo)
+    monkeypatch.setattr("app.routes.fetch_repo_files", fake_fetch_repo_files)
     monkeypatch.setattr("app.routes.generate_review", fake_generate_review)
+    monkeypatch.setattr("app.routes.result_cache", ResultCache(ttl=60, max_entries=8))
 
     resp = client.post("/review", json={
         "assignment_description": "Test",
@@ -27,4 +34,45 @@ def test_review_endpoint_json(monkeypatch):
     assert data["files_found"] == ["README.md"]
     assert data["rating_out_of_5"] == 4
     assert data["findings"][0]["severity"] == "low"
+    assert data["included_files"] == 1
+    assert data["total_bytes"] == 5
+    assert data["truncated"] is False
 
+
+
+def test_review_cached_per_commit_and_invalidated(monkeypatch):
+    calls = {"llm": 0}
+    sha = {"value": "abc123"}
+
+    async def fake_resolve_repo(url: str) -> RepoTarget:
+        return RepoTarget("octocat", "Hello-World", "main", sha["value"])
+    async def fake_fetch_repo_files(url: str, target=None, **caps):
+        return [RepoFile("a.py", 6, "x = 1\n")]
+    async def fake_generate_review(*args, **kwargs) -> str:
+        calls["llm"] += 1
+        return '{"files_found":["a.py"],"rating_out_of_5":3,"summary":"s","findings":[],"conclusion":"c"}'
+    monkeypatch.setattr("app.routes.resolve_repo", fake_resolve_repo)
+    monkeypatch.setattr("app.routes.fetch_repo_files", fake_fetch_repo_files)
+    monkeypatch.setattr("app.routes.generate_review", fake_generate_review)
+    monkeypatch.setattr("app.routes.result_cache", ResultCache(ttl=60, max_entries=8))
+
+    body = {
+        "assignment_description": "Test",
+        "github_repo_url": "https://github.com/octocat/Hello-World/tree/main",
+        "candidate_level": "Junior",
+    }
+    assert client.post("/review", json=body).status_code == 200
+    assert client.post("/review", json=body).json()["rating_out_of_5"] == 3
+    assert calls["llm"] == 1
+
+    client.post("/review", json={**body, "candidate_level": "Senior"})
+    assert calls["llm"] == 2
+
+    sha["value"] = "def456"   # new push: different commit, fresh review
+    client.post("/review", json=body)
+    assert calls["llm"] == 3
+
+    resp = client.delete("/review/cache", params={"github_repo_url": "https://github.com/octocat/Hello-World"})
+    assert resp.json()["invalidated"] == 3
+    client.post("/review", json=body)
+    assert calls["llm"] == 4
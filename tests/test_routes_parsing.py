@@ -1,18 +1,28 @@
+import asyncio
 import json
+
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
 from app.main import app
+from app.services.github_service import RepoTarget
+from app.services.packer import RepoFile
+from app.services.result_cache import ResultCache
 
 client = TestClient(app)
 
 
-def _set_mocks(monkeypatch, ai_text, repo_contents="# Repository Files\n- `x`"):
-    def fake_fetch_repo_and_generate_message(url: str) -> str:
-        # Include "truncated" keyword optionally to test flag
-        return repo_contents
+def _set_mocks(monkeypatch, ai_text, files=None):
+    async def fake_fetch_repo_files(url: str, target=None, **caps):
+        # files with content=None were never fetched, so the review is truncated
+        return files if files is not None else [RepoFile("x", 1, "x")]
     async def fake_generate_review(*args, **kwargs) -> str:
         return ai_text
-    monkeypatch.setattr("app.routes.fetch_repo_and_generate_message", fake_fetch_repo_and_generate_message)
+    async def fake_resolve_repo(url: str) -> RepoTarget:
+        return RepoTarget("o", "r", "HEAD", "abc123")
+    monkeypatch.setattr("app.routes.resolve_repo", fake_resolve_repo)
+    monkeypatch.setattr("app.routes.fetch_repo_files", fake_fetch_repo_files)
     monkeypatch.setattr("app.routes.generate_review", fake_generate_review)
+    monkeypatch.setattr("app.routes.result_cache", ResultCache(ttl=60, max_entries=8))
 
 
 def test_route_parses_plain_json(monkeypatch):
@@ -42,11 +52,99 @@ def test_route_parses_fenced_json(monkeypatch):
 def test_route_parses_double_encoded_json_and_sets_truncated(monkeypatch):
     inner = {"files_found": ["b.py"], "rating_out_of_5": 4, "summary": "ok", "findings": [], "conclusion": "x"}
     double_encoded = json.dumps(json.dumps(inner))  # JSON string
-    repo_contents = "# Repository Files\n- `x`\n*(truncated: 10 files, 1000 bytes; limits reached)*"
-    _set_mocks(monkeypatch, double_encoded, repo_contents=repo_contents)
+    files = [RepoFile("b.py", 6, "b = 1\n"), RepoFile("c.py", 6, None), RepoFile("d.py", 6, None)]
+    _set_mocks(monkeypatch, double_encoded, files=files)
     r = client.post("/review", json={"assignment_description":"x", "github_repo_url":"https://github.com/o/r", "candidate_level":"Junior"})
     body = r.json()
     assert body["truncated"] is True
     assert body["included_files"] == 1
+    assert body["packing"]["dropped"] == ["c.py", "d.py"]
     assert "(Note: analysis truncated" in body["summary"]
 
+
+def test_route_not_truncated_just_because_text_mentions_it(monkeypatch):
+    data = {"files_found": ["t.py"], "rating_out_of_5": 3, "summary": "ok", "findings": [], "conclusion": "x"}
+    _set_mocks(monkeypatch, json.dumps(data), files=[RepoFile("t.py", 20, "# truncated on purpose\n")])
+    body = client.post("/review", json={"assignment_description":"x", "github_repo_url":"https://github.com/o/r", "candidate_level":"Junior"}).json()
+    assert body["truncated"] is False
+    assert body["summary"] == "ok"
+
+
+def test_review_batch_streams_ndjson_and_overlaps_stages(monkeypatch):
+    events = []
+
+    async def fake_resolve_repo(url: str) -> RepoTarget:
+        if url.endswith("/missing"):
+            raise HTTPException(status_code=404, detail="Repository not found")
+        return RepoTarget("o", url.rsplit("/", 1)[1], "HEAD", "sha-" + url[-1])
+    async def fake_fetch_repo_files(url: str, target=None, **caps):
+        events.append(("fetch", target.repo))
+        await asyncio.sleep(0.01)
+        return [RepoFile(f"{target.repo}.py", 6, "x = 1\n")]
+    async def fake_generate_review(assignment_description, repo_contents, candidate_level) -> str:
+        name = repo_contents.split("`")[1]
+        events.append(("llm-start", name))
+        await asyncio.sleep(0.05)
+        events.append(("llm-end", name))
+        return json.dumps({"files_found": [name], "rating_out_of_5": 3, "summary": "s", "findings": [], "conclusion": "c"})
+    monkeypatch.setattr("app.routes.resolve_repo", fake_resolve_repo)
+    monkeypatch.setattr("app.routes.fetch_repo_files", fake_fetch_repo_files)
+    monkeypatch.setattr("app.routes.generate_review", fake_generate_review)
+    monkeypatch.setattr("app.routes.result_cache", ResultCache(ttl=60, max_entries=8))
+    monkeypatch.setattr("app.routes.BATCH_FETCH_CONCURRENCY", 1)
+
+    urls = ["https://github.com/o/r1", "https://github.com/o/missing", "https://github.com/o/r2"]
+    r = client.post("/review/batch", json={
+        "assignment_description": "x", "candidate_level": "Junior", "github_repo_urls": urls,
+    })
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    items = [json.loads(line) for line in r.text.splitlines()]
+
+    assert sorted(i["index"] for i in items) == [0, 1, 2]
+    by_index = {i["index"]: i for i in items}
+    assert by_index[1]["status"] == "error" and by_index[1]["status_code"] == 404
+    assert by_index[0]["result"]["files_found"] == ["r1.py"]
+    assert by_index[2]["status"] == "ok"
+    # the second repo is ingested while the first one is still with the LLM
+    assert events.index(("fetch", "r2")) < events.index(("llm-end", "r1.py"))
+
+
+def test_review_batch_reports_errors_per_repo(monkeypatch):
+    async def fake_resolve_repo(url: str) -> RepoTarget:
+        if url.endswith("/bad"):
+            raise HTTPException(status_code=404, detail="Repository not found")
+        return RepoTarget("o", url.rsplit("/", 1)[1], "HEAD", "sha-" + url[-1])
+    async def fake_fetch_repo_files(url: str, target=None, **caps):
+        return [RepoFile(f"{target.repo}.py", 6, "x = 1\n")]
+    async def fake_generate_review(assignment_description, repo_contents, candidate_level) -> str:
+        name = repo_contents.split("`")[1]
+        return json.dumps({"files_found": [name], "rating_out_of_5": "3/5", "summary": "s", "conclusion": "c",
+                           "findings": []})
+    monkeypatch.setattr("app.routes.resolve_repo", fake_resolve_repo)
+    monkeypatch.setattr("app.routes.fetch_repo_files", fake_fetch_repo_files)
+    monkeypatch.setattr("app.routes.generate_review", fake_generate_review)
+    monkeypatch.setattr("app.routes.result_cache", ResultCache(ttl=60, max_entries=8))
+
+    urls = ["https://github.com/o/r1", "https://github.com/o/bad", "https://github.com/o/r2"]
+    r = client.post("/review/batch", json={
+        "assignment_description": "x", "candidate_level": "Junior", "github_repo_urls": urls,
+    })
+    by_index = {i["index"]: i for i in map(json.loads, r.text.splitlines())}
+
+    assert sorted(by_index) == [0, 1, 2]
+    assert by_index[1]["status"] == "error" and by_index[1]["status_code"] == 404
+    assert by_index[0]["status"] == by_index[2]["status"] == "ok"
+    assert by_index[0]["result"]["rating_out_of_5"] == 3
+
+
+def test_route_coerces_loose_model_fields(monkeypatch):
+    for rating, expected in (("4/5", 4), ("three", 0), (3.6, 4), (9, 5)):
+        data = {"files_found": "a.py", "rating_out_of_5": rating, "summary": "ok", "conclusion": "x",
+                "findings": {"file": "a.py"}}
+        _set_mocks(monkeypatch, json.dumps(data))
+        r = client.post("/review", json={"assignment_description": "x", "github_repo_url": "https://github.com/o/r",
+                                         "candidate_level": "Junior"})
+        assert r.status_code == 200
+        body = r.json()
+        assert (body["rating_out_of_5"], body["files_found"], body["findings"]) == (expected, [], [])
@@ -5,7 +5,7 @@ import app.services.ai_service as ai
 
 
 class FakeChat:
-    def complete(self, **kwargs):
+    async def complete_async(self, **kwargs):
         # Return a structure that matches what ai_service expects
         payload = {
             "files_found": [],
@@ -33,7 +33,7 @@ class FakeResponse:
 
 class FakeClient:
     def __init__(self):
-        # mimic the real API: client.chat.complete(...)
+        # mimic the real API: await client.chat.complete_async(...)
         self.chat = FakeChat()
 
 
@@ -47,3 +47,50 @@ async def test_generate_review_strips_fences_and_returns_string(monkeypatch):
     # should be valid JSON string (fences removed in ai_service)
     json.loads(out)
 
+
+
+class FlakyChat(FakeChat):
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    async def complete_async(self, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            err = RuntimeError("rate limited")
+            err.status_code = 429
+            raise err
+        return await super().complete_async(**kwargs)
+
+
+@pytest.mark.asyncio
+async def test_generate_review_retries_rate_limits(monkeypatch):
+    client = FakeClient()
+    client.chat = FlakyChat(failures=2)
+    monkeypatch.setattr(ai, "_client", client)
+    monkeypatch.setattr(ai, "LLM_BACKOFF_BASE", 0.001)
+
+    out = await ai.generate_review("a", "b", "Junior")
+
+    assert client.chat.calls == 3
+    json.loads(out)
+
+
+@pytest.mark.asyncio
+async def test_generate_review_does_not_retry_client_errors(monkeypatch):
+    class BadRequestChat(FakeChat):
+        calls = 0
+
+        async def complete_async(self, **kwargs):
+            BadRequestChat.calls += 1
+            err = RuntimeError("bad request")
+            err.status_code = 400
+            raise err
+
+    client = FakeClient()
+    client.chat = BadRequestChat()
+    monkeypatch.setattr(ai, "_client", client)
+
+    with pytest.raises(RuntimeError):
+        await ai.generate_review("a", "b", "Junior")
+    assert BadRequestChat.calls == 1
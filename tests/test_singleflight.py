@@ -0,0 +1,112 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.main import app
+from app.services.github_service import RepoTarget
+from app.services.packer import RepoFile
+from app.services.result_cache import ResultCache
+from app.services.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_run():
+    flight, calls = SingleFlight("test"), 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "result"
+
+    results = await asyncio.gather(*(flight.do("k", work) for _ in range(5)))
+
+    assert results == ["result"] * 5
+    assert calls == 1
+    assert flight.stats() == {"leaders": 1, "coalesced": 4, "leader_failures": 0, "follower_retries": 0,
+                              "in_flight": 0}
+
+
+@pytest.mark.asyncio
+async def test_leader_failure_does_not_poison_followers():
+    flight, calls = SingleFlight("test"), 0
+
+    async def flaky():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.02)
+        if calls == 1:
+            raise RuntimeError("GitHub hiccup")
+        return "ok"
+
+    results = await asyncio.gather(*(flight.do("k", flaky) for _ in range(3)), return_exceptions=True)
+
+    assert isinstance(results[0], RuntimeError)
+    assert results[1:] == ["ok", "ok"]
+    assert calls == 2                                    # one follower retried, the other joined it
+    assert flight.stats()["follower_retries"] == 2
+
+    async def missing():
+        await asyncio.sleep(0.02)
+        raise HTTPException(status_code=404, detail="Repository not found")
+
+    results = await asyncio.gather(*(flight.do("m", missing) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(r, HTTPException) and r.status_code == 404 for r in results)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_keeps_work_running_for_followers():
+    flight = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return 42
+
+    leader = asyncio.create_task(flight.do("k", work))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.do("k", work))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    assert await follower == 42
+    assert leader.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_identical_reviews_share_ingestion_and_completion(monkeypatch):
+    fetches, completions = 0, 0
+
+    async def fake_resolve_repo(url):
+        return RepoTarget("o", "r", "HEAD", "abc123")
+    async def slow_fetch(repo_url, target, max_files, max_bytes, budget=None):
+        nonlocal fetches
+        fetches += 1
+        await asyncio.sleep(0.05)
+        return [RepoFile("a.py", 6, "x = 1\n", "s1")]
+    async def slow_review(**kwargs):
+        nonlocal completions
+        completions += 1
+        await asyncio.sleep(0.05)
+        return json.dumps({"files_found": ["a.py"], "rating_out_of_5": 4, "summary": "s",
+                           "findings": [], "conclusion": "c"})
+
+    import app.services.ingest as ingest
+    monkeypatch.setattr(ingest.GitHubBackend, "resolve", lambda self, url: fake_resolve_repo(url))
+    monkeypatch.setattr(ingest.GitHubBackend, "fetch_files", lambda self, *a: slow_fetch(*a))
+    monkeypatch.setattr("app.routes.generate_review", slow_review)
+    monkeypatch.setattr("app.routes.result_cache", ResultCache(ttl=60, max_entries=8))
+
+    body = {"assignment_description": "x", "github_repo_url": "https://github.com/o/r", "candidate_level": "Mid"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as api:
+        before = (await api.get("/cache/stats")).json()["coalescing"]
+        responses = await asyncio.gather(*(api.post("/review", json=body) for _ in range(4)))
+        after = (await api.get("/cache/stats")).json()["coalescing"]
+
+    assert [r.status_code for r in responses] == [200] * 4
+    assert fetches == 1 and completions == 1
+    assert after["ingest"]["coalesced"] - before["ingest"]["coalesced"] >= 3
+    assert after["review"]["coalesced"] - before["review"]["coalesced"] == 3
@@ -0,0 +1,61 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.services import ai_service, github_service, warmup
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _python(code, **env):
+    return subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True,
+                          env={**os.environ, "PYTHONPATH": ROOT, **env}).stdout
+
+
+def test_import_defers_sdk_and_logs_through_a_queue(tmp_path):
+    log = tmp_path / "app.log"
+    out = _python(
+        "import sys, logging, logging.handlers, app.main\n"
+        "print('mistralai' in sys.modules)\n"
+        "print([type(h).__name__ for h in logging.getLogger().handlers])\n"
+        "logging.getLogger('t').info('hello from the queue')\n",
+        LOG_FILE=str(log))
+
+    assert out.splitlines() == ["False", "['QueueHandler']"]
+    assert "t - INFO - hello from the queue" in log.read_text()   # flushed by the listener at exit
+
+
+@pytest.mark.asyncio
+async def test_readiness_follows_warmup(monkeypatch):
+    monkeypatch.setattr(warmup, "_stats", {**warmup._stats, "ready": 0, "first_request_seconds": 0.0})
+    warmed = []
+
+    async def prewarm(connect=False):
+        warmed.append(connect)
+    monkeypatch.setattr(ai_service, "prewarm", prewarm)
+    monkeypatch.setattr(github_service, "prewarm", prewarm)
+    client = TestClient(main.app)
+
+    assert client.get("/ready").status_code == 503
+    await warmup.run()
+    r = client.get("/ready")
+
+    assert r.status_code == 200 and r.json()["status"] == "ready"
+    assert warmed == [False, False]
+    assert r.json()["import_seconds"] > 0 and r.json()["first_request_seconds"] == 0.0
+    client.get("/cache/stats")
+    assert 'component="startup",field="first_request_seconds"' in client.get("/metrics").text
+    assert warmup.stats()["first_request_seconds"] > 0
+
+
+def test_lifespan_waits_for_warmup_unless_fast_startup(monkeypatch):
+    monkeypatch.setattr(warmup, "_stats", {**warmup._stats, "ready": 0})
+    monkeypatch.setattr(main, "FAST_STARTUP", False)
+
+    with TestClient(main.app) as client:
+        assert client.get("/ready").status_code == 200
+    assert not warmup.is_ready()   # stopping takes the worker out of rotation
@@ -0,0 +1,110 @@
+import base64
+import json
+
+import httpx
+import pytest
+
+import app.services.github_service as gh
+from app.services.blob_cache import BlobCache
+from app.services.pathmatch import PathMatcher, default_patterns, vendored_patterns
+from app.services.tree import TreeStreamParser
+from app.config import IGNORE_DIRS
+
+
+def _b64(text: str) -> str:
+    return base64.b64encode(text.encode("utf-8")).decode("utf-8")
+
+
+def test_path_matcher_follows_gitignore_rules():
+    m = PathMatcher(default_patterns(IGNORE_DIRS) + ["*.min.js", "/out/", "docs/**/*.md", "# comment", ""])
+    assert m.ignored("node_modules/a.js")
+    assert m.ignored("packages/web/node_modules/lib/index.js")   # nested ignored dir
+    assert m.ignored("static/app.min.js")
+    assert m.ignored("out/gen.py") and not m.ignored("src/out/gen.py")
+    assert m.ignored("docs/a/b/page.md") and not m.ignored("src/page.md")
+    assert not m.ignored("src/app.py")
+
+    negated = PathMatcher(["*.py", "!keep.py"])
+    assert negated.ignored("src/x.py")
+    assert not negated.ignored("src/keep.py")
+
+
+def test_vendored_patterns_from_gitattributes():
+    attrs = "# vendored\nthird_party/** linguist-vendored\ngen/*.py linguist-generated=true\nthird_party/ours/** -linguist-vendored\n"
+    m = PathMatcher(vendored_patterns(attrs))
+    assert m.ignored("third_party/lib/x.py")
+    assert m.ignored("gen/api.py")
+    assert not m.ignored("third_party/ours/y.py")
+    assert not m.ignored("src/z.py")
+
+
+def test_tree_stream_parser_handles_split_chunks():
+    body = json.dumps({"sha": "s", "tree": [
+        {"path": "src", "type": "tree", "sha": "t1"},
+        {"path": "src/ünï.py", "type": "blob", "size": 12, "sha": "b1"},
+        {"path": "README.md", "type": "blob", "size": 3, "sha": "b2"},
+    ], "truncated": True}, ensure_ascii=False).encode("utf-8")
+    parser = TreeStreamParser()
+    for i in range(0, len(body), 7):
+        parser.feed(body[i:i + 7])
+    tree = parser.close()
+
+    assert tree.paths == ["src/ünï.py", "README.md"]
+    assert list(tree.sizes) == [12, 3]
+    assert tree.dirs == [("src", "t1")]
+    assert tree.truncated
+
+    with pytest.raises(ValueError):
+        broken = TreeStreamParser()
+        broken.feed(body[:len(body) // 2])
+        broken.close()
+
+
+@pytest.mark.asyncio
+async def test_truncated_tree_is_walked_and_repo_rules_apply(monkeypatch):
+    listed = []
+    subtrees = {
+        "t-src": [{"path": "app.py", "type": "blob", "size": 10, "sha": "b-app"},
+                  {"path": "gen/api.py", "type": "blob", "size": 10, "sha": "b-gen"},
+                  {"path": "secret.py", "type": "blob", "size": 10, "sha": "b-secret"}],
+        "t-lib": [{"path": "util.py", "type": "blob", "size": 10, "sha": "b-util"}],
+    }
+    files = {".gitignore": "secret.py\n", ".gitattributes": "src/gen/** linguist-generated\n",
+             "src/app.py": "print(1)\n", "lib/util.py": "x = 1\n"}
+
+    def handler(request: httpx.Request):
+        url = str(request.url)
+        if "/commits/" in url:
+            return httpx.Response(200, text="abc123")
+        if "/git/trees/" in url:
+            sha = request.url.path.rsplit("/", 1)[1]
+            listed.append(sha)
+            if sha == "abc123" and "recursive" in url:
+                return httpx.Response(200, json={"tree": [], "truncated": True})
+            if sha == "abc123":
+                return httpx.Response(200, json={"tree": [
+                    {"path": ".gitignore", "type": "blob", "size": 10, "sha": "b-gi"},
+                    {"path": ".gitattributes", "type": "blob", "size": 40, "sha": "b-ga"},
+                    {"path": "src", "type": "tree", "sha": "t-src"},
+                    {"path": "lib", "type": "tree", "sha": "t-lib"},
+                    {"path": "node_modules", "type": "tree", "sha": "t-nm"},
+                ], "truncated": False})
+            return httpx.Response(200, json={"tree": subtrees[sha], "truncated": False})
+        if "/contents/" in url:
+            path = url.split("/contents/")[1].split("?")[0]
+            return httpx.Response(200, json={"encoding": "base64", "content": _b64(files[path]), "size": 10})
+        return httpx.Response(200, json={"id": 1})
+
+    monkeypatch.setattr(gh, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(gh, "blob_cache", BlobCache(None, 1_000_000, 0))
+    monkeypatch.setattr(gh, "_etags", gh.OrderedDict())
+    monkeypatch.setattr(gh, "_trees", gh.OrderedDict())
+    monkeypatch.setattr(gh, "_matchers", gh.OrderedDict())
+    monkeypatch.setattr(gh, "INGEST_MODE", "contents")
+
+    out = await gh.fetch_repo_files("https://github.com/owner/repo")
+
+    code = [f.path for f in out if f.code]
+    assert sorted(code) == ["lib/util.py", "src/app.py"]
+    assert "t-nm" not in listed            # ignored directories are never listed
+    assert not any("secret" in f.path or "/gen/" in f.path for f in out)